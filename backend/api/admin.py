@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Patient, Room, Inventory, Cost, RiskAssessmentHistory, InventoryUsage
+from .models import Patient, Room, Inventory, Cost, RiskAssessmentHistory, InventoryUsage, InventoryUsageDaily, DashboardCounter, DashboardCounterSnapshot, ImportJob
 
 # Register your models here.
 admin.site.register(Patient)
@@ -8,3 +8,7 @@ admin.site.register(Inventory)
 admin.site.register(Cost)
 admin.site.register(RiskAssessmentHistory)
 admin.site.register(InventoryUsage)
+admin.site.register(InventoryUsageDaily)
+admin.site.register(DashboardCounter)
+admin.site.register(DashboardCounterSnapshot)
+admin.site.register(ImportJob)
@@ -0,0 +1,128 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+from .executor import InferenceUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row scoring requests into one vectorized call.
+
+    Callers submit a row and block on the returned Future for at most
+    `timeout` seconds. A background thread takes the first waiting row, keeps
+    collecting for up to `max_wait_ms` (or until `max_batch_size` rows are
+    queued), then hands the batch to a pool of `max_concurrent_batches`
+    threads that score it with `score_batch(loaded, matrix)` and give each
+    caller its own row of the result. The collector goes straight back to
+    collecting, so a slow batch (e.g. one waiting on the process-pool
+    executor) does not hold up the next. Rows are grouped by model snapshot,
+    so a model swap mid-batch never mixes versions.
+    """
+
+    def __init__(self, score_batch, max_wait_ms=5, max_batch_size=64, max_concurrent_batches=4, timeout=10):
+        self.score_batch = score_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_concurrent_batches = max_concurrent_batches
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._dispatcher = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._worker_pid = None
+        self.batches = 0
+        self.rows = 0
+
+    def submit(self, loaded, row):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((loaded, np.asarray(row, dtype=float), future))
+        return future
+
+    def predict_proba(self, loaded, row):
+        try:
+            return self.submit(loaded, row).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise InferenceUnavailable(f"Risk scoring timed out after {self.timeout}s.")
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch_size': self.rows / self.batches if self.batches else 0.0,
+            'max_wait_ms': self.max_wait * 1000,
+            'max_batch_size': self.max_batch_size,
+            'max_concurrent_batches': self.max_concurrent_batches,
+        }
+
+    def _ensure_worker(self):
+        # Threads don't survive fork, so each worker process starts its own
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._dispatcher = ThreadPoolExecutor(
+                    max_workers=self.max_concurrent_batches, thread_name_prefix='risk-micro-batch',
+                )
+                threading.Thread(target=self._run, name='risk-micro-batcher', daemon=True).start()
+                self._worker_pid = os.getpid()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = {}
+            for loaded, row, future in batch:
+                groups.setdefault(id(loaded), (loaded, []))[1].append((row, future))
+            for loaded, items in groups.values():
+                try:
+                    scored = self._dispatcher.submit(self.score_batch, loaded, np.vstack([row for row, _ in items]))
+                except Exception as e:
+                    self._resolve(items, error=e)
+                    continue
+                scored.add_done_callback(lambda scored, items=items: self._resolve(items, scored))
+
+    def _resolve(self, items, scored=None, error=None):
+        # Runs as a done-callback, where an exception would be logged and lost:
+        # every caller's future must end up resolved one way or the other
+        if error is None:
+            error = scored.exception()
+        if error is None:
+            try:
+                probabilities = scored.result()
+                if len(probabilities) != len(items):
+                    raise ValueError(f"Scored {len(probabilities)} rows for a batch of {len(items)}.")
+                for (_, future), proba in zip(items, probabilities):
+                    future.set_result(proba)
+            except Exception as e:
+                error = e
+            else:
+                with self._stats_lock:
+                    self.batches += 1
+                    self.rows += len(items)
+                return
+        logger.error("Coalesced risk scoring failed", exc_info=error)
+        for _, future in items:
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,3 @@
+# Risk score bands shared by scoring, the dashboard counters and the histograms
+HIGH_RISK_THRESHOLD = 0.7
+MEDIUM_RISK_THRESHOLD = 0.4
@@ -0,0 +1,200 @@
+"""
+Dashboard counters kept up to date as rows are written.
+
+Every tracked instance contributes 0 or 1 to a handful of named counters
+(see `contribution`). The signal handlers in api.signals read what a row
+contributes as stored just before it is saved, and apply the difference
+after the save or delete. Each adjustment is atomic on its own and joins the
+writer's transaction when the writer has opened one. A counter row that does
+not exist yet is computed from scratch the first time it is needed, and
+`reconcile_counters` (run by `manage.py reconcile_dashboard_counters`)
+corrects any drift left behind by bulk writes that bypass signals.
+`reconcile_usage_rollup` does the same for the InventoryUsageDaily rollup.
+"""
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .constants import HIGH_RISK_THRESHOLD
+from .models import (
+    DashboardCounter, DashboardCounterSnapshot, Inventory, InventoryUsage, InventoryUsageDaily, Patient,
+    RiskAssessmentHistory,
+)
+from .scheduling import day_window
+from .versioning import bump_versions
+
+APPOINTMENTS_PREFIX = 'appointments:'
+SNAPSHOT_COUNTERS = ('patients', 'high_risk_assessments', 'inventory_items', 'inventory_exhausted')
+COUNTER_QUERIES = {
+    'patients': lambda: Patient.objects.count(),
+    'high_risk_assessments': lambda: RiskAssessmentHistory.objects.filter(risk_score__gt=HIGH_RISK_THRESHOLD).count(),
+    'inventory_items': lambda: Inventory.objects.count(),
+    'inventory_exhausted': lambda: Inventory.objects.filter(available_stock=0).count(),
+}
+TRACKED_FIELDS = {
+    Patient: ('appointment_at',),
+    RiskAssessmentHistory: ('risk_score',),
+    Inventory: ('available_stock',),
+}
+
+
+def counter_model(name):
+    """The model whose rows a counter counts, so its version can be bumped when the counter changes."""
+    if name.startswith(APPOINTMENTS_PREFIX) or name == 'patients':
+        return Patient
+    if name == 'high_risk_assessments':
+        return RiskAssessmentHistory
+    return Inventory
+
+
+def appointments_counter(day):
+    return f'{APPOINTMENTS_PREFIX}{day:%Y-%m-%d}'
+
+
+def compute_counter(name):
+    if name.startswith(APPOINTMENTS_PREFIX):
+        start, end = day_window(date.fromisoformat(name[len(APPOINTMENTS_PREFIX):]))
+        return Patient.objects.filter(appointment_at__gte=start, appointment_at__lt=end).count()
+    return COUNTER_QUERIES[name]()
+
+
+def contribution(instance):
+    """{counter name: 0 or 1} for one saved instance, or None if its fields were not loaded."""
+    fields = TRACKED_FIELDS[type(instance)]
+    if instance.get_deferred_fields().intersection(fields):
+        return None
+    if isinstance(instance, Patient):
+        counts = {'patients': 1}
+        if instance.appointment_at is not None:
+            counts[appointments_counter(timezone.localtime(instance.appointment_at))] = 1
+        return counts
+    if isinstance(instance, RiskAssessmentHistory):
+        high = instance.risk_score is not None and instance.risk_score > HIGH_RISK_THRESHOLD
+        return {'high_risk_assessments': int(high)}
+    return {'inventory_items': 1, 'inventory_exhausted': int(instance.available_stock == 0)}
+
+
+def contribution_delta(old, new):
+    names = set(old) | set(new)
+    return {name: new.get(name, 0) - old.get(name, 0) for name in names}
+
+
+def adjust_counters(deltas):
+    """Add each delta to its counter; counters not stored yet are computed instead."""
+    with transaction.atomic():
+        for name, delta in deltas.items():
+            if not delta:
+                continue
+            if DashboardCounter.objects.filter(name=name).update(value=F('value') + delta):
+                continue
+            try:
+                # Computed after the write, so the value already includes this change
+                with transaction.atomic():
+                    DashboardCounter.objects.create(name=name, value=compute_counter(name))
+            except IntegrityError:
+                DashboardCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def forget_counters(model):
+    """Drop the counters a model feeds so they are recomputed on next use."""
+    if model is Patient:
+        DashboardCounter.objects.filter(name__startswith=APPOINTMENTS_PREFIX).delete()
+    names = {
+        Patient: ['patients'],
+        RiskAssessmentHistory: ['high_risk_assessments'],
+        Inventory: ['inventory_items', 'inventory_exhausted'],
+    }[model]
+    DashboardCounter.objects.filter(name__in=names).delete()
+
+
+def counter_values(names):
+    """{name: value} in one query once stored; missing counters are computed and stored."""
+    values = dict(DashboardCounter.objects.filter(name__in=names).values_list('name', 'value'))
+    for name in set(names) - set(values):
+        values[name] = compute_counter(name)
+        DashboardCounter.objects.bulk_create([DashboardCounter(name=name, value=values[name])], ignore_conflicts=True)
+    return values
+
+
+def reconcile_counters():
+    """
+    Recompute every stored counter (appointments in one grouped query) and
+    correct the ones that drifted. Returns {name: (stored, actual)} for those.
+    """
+    actual = {name: query() for name, query in COUNTER_QUERIES.items()}
+    appointments = (
+        Patient.objects.filter(appointment_at__isnull=False)
+        .annotate(day=TruncDate('appointment_at'))
+        .values('day').annotate(total=Count('id')).order_by()
+    )
+    actual.update({appointments_counter(row['day']): row['total'] for row in appointments})
+    stored = dict(DashboardCounter.objects.values_list('name', 'value'))
+    for name in stored:
+        actual.setdefault(name, 0)
+    drift = {name: (stored.get(name), value) for name, value in actual.items() if stored.get(name) != value}
+    with transaction.atomic():
+        for name, (_, value) in drift.items():
+            DashboardCounter.objects.update_or_create(name=name, defaults={'value': value})
+        if drift:
+            # Views that served the drifted values must not answer 304 to clients holding them
+            bump_versions(*{counter_model(name) for name in drift})
+    return drift
+
+
+def reconcile_usage_rollup():
+    """
+    Rebuild the daily usage rollup from InventoryUsage in one grouped query and
+    correct the rows that drifted. Returns {(inventory id, date): (stored, actual)} for those.
+    """
+    totals = (
+        InventoryUsage.objects.filter(used__gt=0)
+        .annotate(day=TruncDate('timestamp'))
+        .values('inventory_id', 'day').annotate(total=Sum('used')).order_by()
+    )
+    actual = {(row['inventory_id'], row['day']): row['total'] for row in totals}
+    stored = {
+        (inventory_id, day): used
+        for inventory_id, day, used in InventoryUsageDaily.objects.values_list('inventory_id', 'date', 'used')
+    }
+    drift = {
+        key: (stored.get(key), actual.get(key, 0))
+        for key in set(stored) | set(actual) if stored.get(key, 0) != actual.get(key, 0)
+    }
+    with transaction.atomic():
+        for (inventory_id, day), (_, used) in drift.items():
+            InventoryUsageDaily.objects.update_or_create(inventory_id=inventory_id, date=day, defaults={'used': used})
+        if drift:
+            bump_versions(InventoryUsage)
+    return drift
+
+
+def record_snapshot(day=None):
+    """Store the current value of each snapshot counter under `day`; a day's first snapshot wins."""
+    day = day or timezone.localdate()
+    values = counter_values(SNAPSHOT_COUNTERS)
+    DashboardCounterSnapshot.objects.bulk_create(
+        [DashboardCounterSnapshot(name=name, date=day, value=values[name]) for name in SNAPSHOT_COUNTERS],
+        ignore_conflicts=True,
+    )
+
+
+def ensure_daily_snapshot():
+    # The cache only saves a query per request; the unique constraint keeps it idempotent
+    today = timezone.localdate()
+    if cache.add(f'dashboard-snapshot:{today}', True, timeout=24 * 60 * 60):
+        record_snapshot(today)
+
+
+def snapshot_values(day, max_age=7):
+    """Latest snapshot value of each counter taken on `day` or up to `max_age` days before."""
+    values = {}
+    rows = DashboardCounterSnapshot.objects.filter(
+        date__lte=day, date__gte=day - timedelta(days=max_age)
+    ).order_by('date').values_list('name', 'value')
+    for name, value in rows:
+        values[name] = value
+    return values
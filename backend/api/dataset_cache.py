@@ -0,0 +1,157 @@
+"""
+Columnar on-disk cache of the source spreadsheets.
+
+Parsing an .xlsx workbook means unzipping and walking its XML, which dwarfs
+the cost of the import itself. The first read of a workbook stores each
+column as a .npy file under DATASET_CACHE_DIR, in a directory named after the
+workbook's content hash; later reads memory-map those columns instead of
+parsing again. Numeric, boolean and datetime columns map straight into the
+DataFrame; text columns are stored as fixed-width unicode plus a null mask
+and decoded on load, so text columns come back as strings whether or not the
+cache was warm. Column labels are stored with their type (and the columns
+index with its dtype), so an integer header comes back as an integer rather
+than a string. Writing a new version of a workbook sheet deletes the entries
+for its older versions.
+
+As with the model registry, a file is only re-hashed when its size or mtime
+changes, and a touched-but-unchanged file keeps its cached columns.
+"""
+import json
+import os
+import shutil
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .model_registry import file_sha256
+
+MANIFEST = 'manifest.json'
+
+_lock = threading.Lock()
+# Resolved path -> (mtime_ns, size, content hash), so unchanged files aren't re-hashed
+_versions = {}
+
+
+def _content_version(path):
+    stat = os.stat(path)
+    known = _versions.get(path)
+    if known and known[:2] == (stat.st_mtime_ns, stat.st_size):
+        return known[2]
+    version = file_sha256(path)[:16]
+    with _lock:
+        _versions[path] = (stat.st_mtime_ns, stat.st_size, version)
+    return version
+
+
+def _encode_label(label):
+    # Header cells read from Excel are strings, numbers, booleans or datetimes
+    if isinstance(label, (bool, np.bool_)):
+        return {'name': bool(label), 'type': 'bool'}
+    if isinstance(label, (int, np.integer)):
+        return {'name': int(label), 'type': 'int'}
+    if isinstance(label, (float, np.floating)):
+        return {'name': repr(float(label)), 'type': 'float'}
+    if isinstance(label, (date, np.datetime64)):
+        return {'name': pd.Timestamp(label).isoformat(), 'type': 'datetime'}
+    return {'name': str(label)}
+
+
+def _decode_label(spec):
+    kind = spec.get('type')
+    if kind == 'float':
+        return float(spec['name'])
+    if kind == 'datetime':
+        return pd.Timestamp(spec['name'])
+    return spec['name']
+
+
+def _is_native(series):
+    return series.dtype.kind in 'biufM' and getattr(series.dtype, 'tz', None) is None
+
+
+def _write_entry(df, entry_dir, source):
+    tmp_dir = f'{entry_dir}.{os.getpid()}.{threading.get_ident()}.tmp'
+    os.makedirs(tmp_dir)
+    columns = []
+    for i, (name, series) in enumerate(df.items()):
+        spec = {**_encode_label(name), 'file': f'{i}.npy'}
+        if _is_native(series):
+            np.save(os.path.join(tmp_dir, spec['file']), series.to_numpy())
+        else:
+            missing = series.isna().to_numpy()
+            text = series.astype(str).to_numpy(dtype=str)
+            text[missing] = ''
+            np.save(os.path.join(tmp_dir, spec['file']), text)
+            np.save(os.path.join(tmp_dir, f'{i}.mask.npy'), missing)
+            spec['text'] = True
+        columns.append(spec)
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+        json.dump({
+            'source': source, 'rows': len(df), 'columns': columns, 'columns_dtype': str(df.columns.dtype),
+        }, f, indent=2)
+    try:
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Another process cached the same version first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _evict_stale(cache_dir, entry_dir, path, sheet_name):
+    suffix = f'-{sheet_name}'
+    for name in os.listdir(cache_dir):
+        stale_dir = os.path.join(cache_dir, name)
+        if not name.endswith(suffix) or stale_dir == entry_dir:
+            continue
+        try:
+            with open(os.path.join(stale_dir, MANIFEST)) as f:
+                source = json.load(f)['source']
+        except (OSError, ValueError, KeyError):
+            continue
+        if source['path'] == path:
+            # Readers that still map the old columns keep them until they let go
+            shutil.rmtree(stale_dir, ignore_errors=True)
+
+
+def _read_entry(entry_dir):
+    with open(os.path.join(entry_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+    data = []
+    for spec in manifest['columns']:
+        # Copy-on-write mapping: pages are shared until a caller writes, and writes never reach the file
+        values = np.load(os.path.join(entry_dir, spec['file']), mmap_mode='c')
+        if spec.get('text'):
+            missing = np.load(os.path.join(entry_dir, spec['file'].replace('.npy', '.mask.npy')))
+            values = pd.Series(values, dtype='str').mask(missing)
+        data.append(values)
+    # Built by position, so duplicate labels survive the round trip
+    labels = pd.Index([_decode_label(spec) for spec in manifest['columns']], dtype=manifest.get('columns_dtype'))
+    # copy=False keeps numeric columns as views of the mapped files
+    df = pd.DataFrame(dict(enumerate(data)), copy=False)
+    df.columns = labels
+    return df
+
+
+def read_dataset(path, sheet_name=0):
+    """
+    DataFrame of one sheet of the workbook at `path`, parsed at most once per
+    content version. Without DATASET_CACHE_DIR this is plain pd.read_excel.
+    """
+    cache_dir = settings.DATASET_CACHE_DIR
+    if not cache_dir:
+        return pd.read_excel(path, sheet_name=sheet_name)
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    version = _content_version(path)
+    entry_dir = os.path.join(cache_dir, f'{version}-{sheet_name}')
+    if not os.path.exists(os.path.join(entry_dir, MANIFEST)):
+        df = pd.read_excel(path, sheet_name=sheet_name)
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_entry(df, entry_dir, {
+            'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': version,
+        })
+        _evict_stale(cache_dir, entry_dir, path, sheet_name)
+    # Read back even on a miss, so callers get the same dtypes either way
+    return _read_entry(entry_dir)
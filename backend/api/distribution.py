@@ -0,0 +1,76 @@
+"""
+Risk score histograms computed in one conditional aggregate.
+
+Bins are closed on the right, (lower, upper], with the first bin also
+including its lower edge, which matches the risk bands used everywhere else
+(high is risk_score > 0.7, low is risk_score <= 0.4).
+"""
+import math
+from datetime import timedelta
+
+from django.db.models import Count, Q
+
+from .constants import HIGH_RISK_THRESHOLD, MEDIUM_RISK_THRESHOLD
+from .models import RiskAssessmentHistory
+from .trends import day_start
+
+RISK_BAND_EDGES = (0.0, MEDIUM_RISK_THRESHOLD, HIGH_RISK_THRESHOLD, 1.0)
+MAX_BINS = 100
+
+
+def parse_edges(value):
+    """Bin edges from a comma-separated string; raises ValueError unless finite and strictly increasing."""
+    edges = [float(edge) for edge in value.split(',') if edge.strip()]
+    if len(edges) < 2:
+        raise ValueError("edges needs at least two values.")
+    if not all(math.isfinite(edge) for edge in edges):
+        raise ValueError("edges must be finite numbers.")
+    if len(edges) - 1 > MAX_BINS:
+        raise ValueError(f"edges allows at most {MAX_BINS} bins.")
+    if any(lower >= upper for lower, upper in zip(edges, edges[1:])):
+        raise ValueError("edges must be strictly increasing.")
+    return edges
+
+
+def filter_assessments(queryset, region=None, screening_type=None, start=None, end=None):
+    """Narrow a RiskAssessmentHistory queryset; `start` and `end` are inclusive dates."""
+    if region:
+        queryset = queryset.filter(region=region)
+    if screening_type:
+        queryset = queryset.filter(screening_type=screening_type)
+    if start:
+        queryset = queryset.filter(timestamp__gte=day_start(start))
+    if end:
+        queryset = queryset.filter(timestamp__lt=day_start(end + timedelta(days=1)))
+    return queryset
+
+
+def risk_histogram(edges, queryset=None):
+    """[{'lower', 'upper', 'count'}, ...] for consecutive edge pairs, from a single query."""
+    if queryset is None:
+        queryset = RiskAssessmentHistory.objects.all()
+    aggregates = {}
+    for i, (lower, upper) in enumerate(zip(edges, edges[1:])):
+        in_bin = Q(risk_score__gte=lower) if i == 0 else Q(risk_score__gt=lower)
+        aggregates[f'bin_{i}'] = Count('id', filter=in_bin & Q(risk_score__lte=upper))
+    counts = queryset.aggregate(**aggregates)
+    return [
+        {'lower': lower, 'upper': upper, 'count': counts[f'bin_{i}']}
+        for i, (lower, upper) in enumerate(zip(edges, edges[1:]))
+    ]
+
+
+def risk_level_filter(risk_level):
+    """Q for assessments whose score falls in the 'low', 'medium' or 'high' band."""
+    bands = dict(zip(('low', 'medium', 'high'), zip(RISK_BAND_EDGES, RISK_BAND_EDGES[1:])))
+    if risk_level not in bands:
+        raise ValueError("risk_level must be one of low, medium, high.")
+    lower, upper = bands[risk_level]
+    in_band = Q(risk_score__gte=lower) if risk_level == 'low' else Q(risk_score__gt=lower)
+    return in_band & Q(risk_score__lte=upper)
+
+
+def risk_band_counts(queryset=None):
+    """{'low', 'medium', 'high'} assessment counts, in one query."""
+    low, medium, high = risk_histogram(RISK_BAND_EDGES, queryset)
+    return {'high': high['count'], 'medium': medium['count'], 'low': low['count']}
@@ -0,0 +1,107 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceUnavailable(Exception):
+    """The executor is saturated or did not answer in time."""
+
+
+def _init_worker():
+    # Spawned workers start from a clean interpreter: set up Django, then load
+    # the model once so the first real request doesn't pay for the unpickle
+    import django
+    django.setup()
+    from .model_registry import registry
+    registry.get()
+
+
+def _ping(barrier=None):
+    if barrier is not None:
+        # Held until every worker is running a ping, so no process can take two
+        barrier.wait(timeout=60)
+    return os.getpid()
+
+
+def _predict_proba(version, matrix):
+    from .model_registry import registry
+    loaded = registry.get()
+    if loaded is None or loaded.version != version:
+        # The web process already switched models; catch up before scoring
+        loaded = registry.reload()
+    if loaded is None:
+        raise RuntimeError("Risk model is not available.")
+    return loaded.model.predict_proba(matrix)
+
+
+class InferenceExecutor:
+    """
+    Runs model inference in a pool of pre-warmed worker processes.
+
+    Request threads only pickle the feature matrix across and wait, so
+    CPU-bound scoring no longer holds the web process's GIL. At most
+    `max_pending` calls may be queued or running; beyond that, and for calls
+    that take longer than `timeout` seconds, InferenceUnavailable is raised
+    so the view can shed load instead of piling up threads.
+    """
+
+    def __init__(self, workers=2, timeout=10, max_pending=64, queue_timeout=0.5):
+        self.workers = workers
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def pool(self):
+        # A pool inherited through fork is unusable in the child; start a fresh one per process
+        if self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool_pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                    )
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def warm(self):
+        """Start every worker and wait until each has loaded the model. Returns their pids."""
+        pool = self.pool()
+        # The pool reuses idle workers rather than starting new ones, so pings
+        # only reach every process if they all wait for each other
+        with multiprocessing.get_context('spawn').Manager() as manager:
+            barrier = manager.Barrier(self.workers)
+            pids = {future.result() for future in [pool.submit(_ping, barrier) for _ in range(self.workers)]}
+        logger.info("Inference executor ready with %d worker(s)", len(pids))
+        return pids
+
+    def predict_proba(self, loaded, matrix):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise InferenceUnavailable("Risk scoring is at capacity, please retry.")
+        try:
+            future = self.pool().submit(_predict_proba, loaded.version, matrix)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot frees when the worker is done, not when this caller stops
+        # waiting, so timed-out calls still count against max_pending
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Only cancels a call still queued; a running one keeps its slot until it finishes
+            future.cancel()
+            raise InferenceUnavailable(f"Risk scoring timed out after {self.timeout}s.")
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._pool_pid = None
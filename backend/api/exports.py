@@ -0,0 +1,60 @@
+"""
+Streaming exports of RiskAssessmentHistory.
+
+Rows are read with .values_list().iterator(chunk_size), so no model instances
+are built and only one chunk is held at a time, and each chunk is encoded and
+yielded as soon as it arrives. Memory stays flat however many rows match, and
+the header goes out before the first query finishes.
+"""
+import csv
+import io
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import RiskAssessmentHistory
+
+EXPORT_FIELDS = (
+    *(field.attname for field in RiskAssessmentHistory._meta.concrete_fields),
+    'patient__name',
+)
+# Column names as in the JSON list endpoint
+EXPORT_COLUMNS = tuple(
+    {'patient_id': 'patient', 'patient__name': 'patient_name'}.get(field, field) for field in EXPORT_FIELDS
+)
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _chunks(queryset, chunk_size):
+    chunk = []
+    for row in queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def csv_stream(queryset, chunk_size=None):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for chunk in _chunks(queryset, chunk_size or settings.EXPORT_CHUNK_SIZE):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def ndjson_stream(queryset, chunk_size=None):
+    encoder = DjangoJSONEncoder()
+    for chunk in _chunks(queryset, chunk_size or settings.EXPORT_CHUNK_SIZE):
+        yield ''.join(encoder.encode(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in chunk)
+
+
+EXPORT_STREAMS = {'csv': csv_stream, 'ndjson': ndjson_stream}
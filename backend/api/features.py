@@ -0,0 +1,203 @@
+"""
+Feature pipeline shared by the serving views and the offline training command.
+
+The column schema below is the single source of truth for the model input
+order. Rows arrive as request payloads, RiskAssessmentHistory values_list
+tuples or spreadsheet columns, and all of them become a float matrix in one
+NumPy pass, with the derived columns filled the same way everywhere.
+"""
+import hashlib
+import json
+import math
+from collections import namedtuple
+
+import numpy as np
+from django.db.models import OuterRef, Subquery
+
+from .models import Patient, RiskAssessmentHistory
+
+FeatureColumn = namedtuple('FeatureColumn', ['name', 'kind'])
+
+SCHEMA_VERSION = 1
+FEATURE_SCHEMA = (
+    FeatureColumn('age', 'int'),
+    FeatureColumn('sexual_partners', 'int'),
+    FeatureColumn('first_sexual_age', 'int'),
+    FeatureColumn('years_sexually_active', 'int'),
+    FeatureColumn('hpv_positive', 'bool'),
+    FeatureColumn('abnormal_pap', 'bool'),
+    FeatureColumn('smoking', 'bool'),
+    FeatureColumn('stds_history', 'bool'),
+    FeatureColumn('insurance', 'bool'),
+    FeatureColumn('total_risk_score', 'int'),
+)
+FEATURE_COLUMNS = tuple(column.name for column in FEATURE_SCHEMA)
+COLUMN_INDEX = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+# 75th percentile of sexual partners in the training sheet, as used by the notebook
+HIGH_SEXUAL_RISK_PARTNERS = 3
+EARLY_SEXUAL_DEBUT_AGE = 18
+RISK_FACTOR_COLUMNS = ('hpv_positive', 'abnormal_pap', 'smoking', 'stds_history')
+
+
+class FeatureSchemaError(ValueError):
+    pass
+
+
+def schema_fingerprint():
+    payload = json.dumps([SCHEMA_VERSION, FEATURE_SCHEMA]).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def schema_metadata():
+    """What the training command stores next to a model so serving can verify it."""
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'schema_fingerprint': schema_fingerprint(),
+        'columns': list(FEATURE_COLUMNS),
+    }
+
+
+def check_model_schema(model, metadata=None):
+    """Raise FeatureSchemaError unless `model` was trained on FEATURE_SCHEMA."""
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is not None and n_features != len(FEATURE_COLUMNS):
+        raise FeatureSchemaError(f"Model expects {n_features} features, schema has {len(FEATURE_COLUMNS)}.")
+    feature_names = getattr(model, 'feature_names_in_', None)
+    if feature_names is not None and tuple(feature_names) != FEATURE_COLUMNS:
+        raise FeatureSchemaError(f"Model columns {list(feature_names)} do not match the feature schema.")
+    if metadata and metadata.get('schema_fingerprint') != schema_fingerprint():
+        raise FeatureSchemaError(
+            f"Model was trained on feature schema v{metadata.get('schema_version')}, serving v{SCHEMA_VERSION}."
+        )
+
+
+def complete_derived(matrix):
+    """Fill missing derived columns (NaN) from the raw ones, in place, as training does."""
+    age = matrix[:, COLUMN_INDEX['age']]
+    first_sexual_age = matrix[:, COLUMN_INDEX['first_sexual_age']]
+    years = matrix[:, COLUMN_INDEX['years_sexually_active']]
+    missing = np.isnan(years)
+    years[missing] = np.clip(age - first_sexual_age, 0, None)[missing]
+
+    total = matrix[:, COLUMN_INDEX['total_risk_score']]
+    missing = np.isnan(total)
+    if missing.any():
+        factors = np.nan_to_num(matrix[:, [COLUMN_INDEX[name] for name in RISK_FACTOR_COLUMNS]]).sum(axis=1)
+        with np.errstate(invalid='ignore'):
+            factors += matrix[:, COLUMN_INDEX['sexual_partners']] > HIGH_SEXUAL_RISK_PARTNERS
+            factors += first_sexual_age < EARLY_SEXUAL_DEBUT_AGE
+        total[missing] = factors[missing]
+    return matrix
+
+
+def feature_value_error(column, value):
+    """Why `value` is not a valid value of `column`, or None if it is (None means missing)."""
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return f"{column.name} must be a number."
+    if math.isinf(number):
+        return f"{column.name} must be finite."
+    if column.kind == 'bool':
+        # Stored in a BooleanField, which only takes these spellings of 0/1
+        if number not in (0, 1) or isinstance(value, str) and value not in ('0', '1'):
+            return f"{column.name} must be 0 or 1."
+    elif column.kind == 'int':
+        # Stored in a PositiveIntegerField, which casts strings with int()
+        if not number.is_integer() or number < 0 or isinstance(value, str) and not value.strip().isdigit():
+            return f"{column.name} must be a non-negative integer."
+    return None
+
+
+def feature_row_error(features):
+    """Why `features` is not one feature vector in schema order, or None if it is."""
+    if not isinstance(features, (list, tuple)) or len(features) != len(FEATURE_COLUMNS):
+        return f"Expected a list of {len(FEATURE_COLUMNS)} features."
+    for column, value in zip(FEATURE_SCHEMA, features):
+        error = feature_value_error(column, value)
+        if error:
+            return error
+    return None
+
+
+def to_matrix(rows):
+    """
+    Float matrix in schema order from feature vectors (lists, tuples or a
+    values_list result). None becomes NaN and derived columns are completed.
+    """
+    matrix = np.array(rows, dtype=float)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    if matrix.size == 0:
+        return matrix.reshape(0, len(FEATURE_COLUMNS))
+    if matrix.shape[1] != len(FEATURE_COLUMNS):
+        raise FeatureSchemaError(f"Expected {len(FEATURE_COLUMNS)} features, got {matrix.shape[1]}.")
+    return complete_derived(matrix)
+
+
+def queryset_matrix(queryset, *extra_fields):
+    """
+    One values_list query over a RiskAssessmentHistory queryset, straight into
+    (extra field columns, feature matrix).
+    """
+    rows = list(queryset.values_list(*extra_fields, *FEATURE_COLUMNS))
+    n_extra = len(extra_fields)
+    extras = [[row[i] for row in rows] for i in range(n_extra)]
+    return extras, to_matrix([row[n_extra:] for row in rows])
+
+
+def latest_assessments(patient_ids):
+    """Each patient's most recent RiskAssessmentHistory row, as one queryset."""
+    latest = RiskAssessmentHistory.objects.filter(
+        patient=OuterRef('pk')
+    ).order_by('-timestamp', '-id').values('id')[:1]
+    latest_ids = Patient.objects.filter(id__in=patient_ids).annotate(
+        latest_id=Subquery(latest)
+    ).values('latest_id')
+    return RiskAssessmentHistory.objects.filter(id__in=latest_ids)
+
+
+def latest_patient_features(patient_ids):
+    """
+    Feature vectors from each patient's most recent risk assessment, as
+    {patient_id: [features]}. Patients without an assessment are omitted.
+    Runs a single query regardless of how many patients are requested.
+    """
+    rows = latest_assessments(patient_ids).values_list('patient_id', *FEATURE_COLUMNS)
+    return {row[0]: list(row[1:]) for row in rows}
+
+
+def latest_patient_matrix(patient_ids):
+    """(patient ids, feature matrix) for the patients' latest assessments, in one query."""
+    (ids,), matrix = queryset_matrix(latest_assessments(patient_ids), 'patient_id')
+    return ids, matrix
+
+
+def _flag(series, positive):
+    return series.astype(str).str.strip().str.upper().isin(positive).astype(float)
+
+
+def sheet_matrix(df):
+    """
+    Feature matrix from the 'Cervical Cancer Datasets' sheet layout, using
+    vectorized column operations and the same derived-column rules as serving.
+    """
+    import pandas as pd
+
+    columns = {
+        'age': pd.to_numeric(df['Age'], errors='coerce'),
+        'sexual_partners': pd.to_numeric(df['Sexual Partners'], errors='coerce'),
+        'first_sexual_age': pd.to_numeric(df['First Sexual Activity Age'], errors='coerce'),
+        'years_sexually_active': np.nan,
+        'hpv_positive': _flag(df['HPV Test Result'], {'POSITIVE', 'Y'}),
+        'abnormal_pap': _flag(df['Pap Smear Result'], {'ABNORMAL', 'Y'}),
+        'smoking': _flag(df['Smoking Status'], {'Y', 'YES'}),
+        'stds_history': _flag(df['STDs History'], {'Y', 'YES'}),
+        'insurance': _flag(df['Insrance Covered'], {'Y', 'YES'}),
+        'total_risk_score': np.nan,
+    }
+    frame = pd.DataFrame(columns, index=df.index)[list(FEATURE_COLUMNS)]
+    return to_matrix(frame.to_numpy(dtype=float))
@@ -0,0 +1,167 @@
+"""
+Background spreadsheet imports.
+
+An upload is stored and recorded as a pending ImportJob, and the request
+returns at once. The job is then parsed and loaded off the request path, by
+`manage.py run_import_jobs` in a separate worker process (IMPORT_JOB_RUNNER =
+'command', the default). That keeps pandas parsing from competing with
+requests for the GIL, a stuck worker can be killed and restarted, and jobs
+left pending across a deploy are picked up when it comes back; the command
+also fails jobs stuck in 'running'. For development without a worker,
+IMPORT_JOB_RUNNER = 'thread' runs jobs in a small thread pool in the web
+process instead.
+
+Jobs load chunk by chunk, committing each chunk, so the progress written
+between chunks is visible to clients polling /api/imports/<id>/. A job that
+fails part way can simply be uploaded again, since rows are upserted.
+
+The uploaded file is deleted once its job succeeds, fails or is failed as
+stalled. Any finished job whose file survived (e.g. a worker killed between
+finishing and cleaning up) has it removed by `purge_finished_uploads`, which
+the command runs on every poll.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .importers import MAX_REPORTED_ERRORS, SheetError, import_sheet, read_sheet
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def _executor():
+    # A pool inherited through fork has no threads in the child; start one per process
+    global _pool, _pool_pid
+    if _pool_pid != os.getpid():
+        with _lock:
+            if _pool_pid != os.getpid():
+                _pool = ThreadPoolExecutor(max_workers=settings.IMPORT_JOB_WORKERS, thread_name_prefix='import-job')
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _run_in_thread(job_id):
+    try:
+        run_import_job(job_id)
+    finally:
+        # Worker threads open their own connection; don't leave it behind
+        connection.close()
+
+
+def enqueue(job):
+    """Start `job` once the transaction that created it commits (thread runner only)."""
+    if settings.IMPORT_JOB_RUNNER == 'thread':
+        transaction.on_commit(lambda: _executor().submit(_run_in_thread, job.pk))
+
+
+def run_import_job(job_id):
+    """
+    Parse and load one pending job, recording progress as it goes. Returns
+    False if the job was already claimed by another worker.
+    """
+    claimed = ImportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        return False
+    job = ImportJob.objects.get(pk=job_id)
+    errors = []
+    start = time.perf_counter()
+
+    def progress(rows_done, created):
+        elapsed = time.perf_counter() - start
+        ImportJob.objects.filter(pk=job_id).update(
+            rows_processed=rows_done,
+            created=created,
+            updated=rows_done - created,
+            rows_per_sec=round(rows_done / elapsed, 1) if elapsed else None,
+        )
+
+    try:
+        with job.file.open('rb') as file:
+            df = read_sheet(file, job.original_name or job.file.name)
+        ImportJob.objects.filter(pk=job_id).update(rows_total=len(df))
+        result = import_sheet(job.kind, df, progress=progress, errors=errors, atomic=False)
+    except SheetError as exc:
+        _finish(job_id, 'failed', errors=errors + [{'row': None, 'error': str(exc)}])
+    except Exception as exc:
+        logger.exception("Import job %s failed", job_id)
+        _finish(job_id, 'failed', errors=errors + [{'row': None, 'error': f'Could not import file: {exc}'}])
+    else:
+        _finish(
+            job_id, 'succeeded',
+            errors=errors[:MAX_REPORTED_ERRORS],
+            rows_processed=len(df),
+            created=result['created'],
+            updated=result['updated'],
+            skipped=len(df) - result['rows'],
+            rows_per_sec=result['rows_per_sec'],
+        )
+    discard_upload(job)
+    return True
+
+
+def _finish(job_id, status, **fields):
+    # A job already failed as stalled keeps that outcome
+    ImportJob.objects.filter(pk=job_id, status='running').update(status=status, finished_at=timezone.now(), **fields)
+
+
+def discard_upload(job):
+    """Delete a job's stored upload and clear the reference to it."""
+    if not job.file:
+        return
+    try:
+        job.file.storage.delete(job.file.name)
+    except OSError:
+        logger.exception("Could not delete upload %s of import job %s", job.file.name, job.pk)
+        return
+    ImportJob.objects.filter(pk=job.pk).update(file='')
+
+
+def purge_finished_uploads():
+    """Delete the uploads of every finished job that still has one. Returns how many."""
+    finished = ImportJob.objects.filter(status__in=['succeeded', 'failed']).exclude(file='').only('pk', 'file')
+    purged = 0
+    for job in finished:
+        discard_upload(job)
+        purged += 1
+    return purged
+
+
+def fail_stalled_jobs(timeout=None):
+    """Mark jobs running for longer than `timeout` seconds as failed and delete their uploads. Returns how many."""
+    timeout = timeout or settings.IMPORT_JOB_TIMEOUT
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stalled = list(ImportJob.objects.filter(status='running', started_at__lt=cutoff).only('pk', 'file'))
+    if not stalled:
+        return 0
+    failed = ImportJob.objects.filter(pk__in=[job.pk for job in stalled], status='running').update(
+        status='failed',
+        finished_at=timezone.now(),
+        errors=[{'row': None, 'error': f'Import did not finish within {timeout} seconds.'}],
+    )
+    for job in stalled:
+        discard_upload(job)
+    return failed
+
+
+def run_pending_jobs(limit=None):
+    """Run pending jobs oldest first, one at a time. Returns how many were run."""
+    ran = 0
+    pending = ImportJob.objects.filter(status='pending').order_by('created_at').values_list('pk', flat=True)
+    for job_id in list(pending[:limit] if limit else pending):
+        close_old_connections()
+        ran += run_import_job(job_id)
+    return ran
@@ -0,0 +1,248 @@
+"""
+Spreadsheet imports as bulk upserts.
+
+Each sheet is normalized column-wise with pandas (no per-row Python), reduced
+to one row per natural key, and written with chunked
+bulk_create(update_conflicts=True) inside a single transaction. Existing keys
+are looked up once per chunk so the created/updated split can be reported.
+
+`sync_inventory` instead makes the Inventory table mirror a sheet: each row's
+fingerprint is compared with the one stored when it was last applied, and
+only the inserts, updates and deletes that differ are written.
+"""
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from .counters import forget_counters
+from .models import Cost, Inventory, InventoryUsage, InventoryUsageDaily
+from .versioning import bump_versions
+
+INVENTORY_KEY = ('name', 'region')
+COST_KEY = ('treatment', 'facility')
+# Rows reported individually per import; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+class SheetError(ValueError):
+    """The sheet as a whole cannot be imported (e.g. a required column is missing)."""
+
+
+def _require(df, *alternatives):
+    if not any(column in df for column in alternatives):
+        raise SheetError(f"Missing column: {' or '.join(alternatives)}.")
+
+
+def _report_blank(frame, key, label, errors):
+    if errors is None:
+        return
+    for index in frame.index[frame[key] == ''][:MAX_REPORTED_ERRORS - len(errors)]:
+        # Spreadsheet row number: 1-based, after the header row
+        errors.append({'row': int(index) + 2, 'error': f'Missing {label}.'})
+
+
+def _text(df, *columns):
+    """First non-blank value across `columns`, stripped, '' when missing."""
+    result = pd.Series('', index=df.index, dtype='object')
+    for column in reversed(columns):
+        if column in df:
+            values = df[column].astype('string').str.strip().fillna('')
+            result = values.where(values != '', result)
+    return result.astype(str)
+
+
+def _number(df, column):
+    if column not in df:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[column], errors='coerce').fillna(0)
+
+
+def row_fingerprints(frame):
+    """16 hex digits per row hashing every column's value (vectorized)."""
+    # Stable for a given pandas version; a change merely makes one sync rewrite every row
+    return pd.util.hash_pandas_object(frame, index=False).map('{:016x}'.format)
+
+
+def normalize_inventory_sheet(df, errors=None):
+    """
+    'Resources Inventory Cost Sheet' rows as Inventory field values, one per
+    (name, region), with each row's fingerprint. Rows without an item are
+    dropped and listed in `errors`.
+    """
+    _require(df, 'Item')
+    stock = _number(df, 'Available Stock').clip(lower=0).astype(int)
+    frame = pd.DataFrame({
+        'name': _text(df, 'Item'),
+        'region': _text(df, 'Region'),
+        'category': _text(df, 'Category'),
+        'available_stock': stock,
+        'total_stock': stock,
+        'unit': '',
+        'status': '',
+        'cost': _number(df, 'Cost (KES)').round(2),
+    })
+    _report_blank(frame, 'name', 'Item', errors)
+    frame = frame[frame['name'] != '']
+    frame = frame.drop_duplicates(list(INVENTORY_KEY), keep='last')
+    return frame.assign(fingerprint=row_fingerprints(frame))
+
+
+def normalize_cost_sheet(df, errors=None):
+    """
+    'Treatment Costs Sheet' rows as Cost field values, one per (treatment,
+    facility). Rows without a service are dropped and listed in `errors`.
+    """
+    _require(df, 'Service', 'Treatment')
+    frame = pd.DataFrame({
+        'treatment': _text(df, 'Service', 'Treatment'),
+        'facility': _text(df, 'Facility'),
+        'cost': _number(df, 'Base Cost (KES)').round(2),
+        'region': _text(df, 'Region'),
+        'category': _text(df, 'Category'),
+        'nhif_covered': _text(df, 'NHIF Covered'),
+        'insurance_copay': _number(df, 'Insurance Copay (KES)').round(2),
+        'out_of_pocket': _number(df, 'Out-of-Pocket (KES)').round(2),
+        'notes': '',
+    })
+    _report_blank(frame, 'treatment', 'Service', errors)
+    frame = frame[frame['treatment'] != '']
+    return frame.drop_duplicates(list(COST_KEY), keep='last')
+
+
+def bulk_upsert(model, frame, unique_fields, chunk_size=None, progress=None, atomic=True):
+    """
+    Insert or update every row of `frame` (columns named after model fields)
+    keyed on `unique_fields`. Returns created/updated counts, the row count,
+    elapsed seconds and rows per second.
+
+    With `atomic`, everything is one transaction; otherwise each chunk
+    commits on its own, so `progress(rows_done, created)`, called after each
+    chunk, can be observed from other connections while the import runs.
+    """
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    update_fields = [column for column in frame.columns if column not in unique_fields]
+    records = frame.to_dict('records')
+    start = time.perf_counter()
+    created = 0
+    with transaction.atomic() if atomic else nullcontext():
+        try:
+            for offset in range(0, len(records), chunk_size):
+                chunk = records[offset:offset + chunk_size]
+                first = unique_fields[0]
+                with transaction.atomic():
+                    existing = set(model.objects.filter(
+                        **{f'{first}__in': {row[first] for row in chunk}}
+                    ).values_list(*unique_fields))
+                    model.objects.bulk_create(
+                        [model(**row) for row in chunk],
+                        update_conflicts=True,
+                        unique_fields=list(unique_fields),
+                        update_fields=update_fields,
+                    )
+                created += sum(1 for row in chunk if tuple(row[field] for field in unique_fields) not in existing)
+                if progress is not None:
+                    progress(offset + len(chunk), created)
+        finally:
+            # bulk_create sends no signals
+            bump_versions(model)
+            if model is Inventory:
+                forget_counters(Inventory)
+    seconds = time.perf_counter() - start
+    return {
+        'created': created,
+        'updated': len(records) - created,
+        'rows': len(records),
+        'seconds': round(seconds, 4),
+        'rows_per_sec': round(len(records) / seconds) if seconds else None,
+    }
+
+
+def delete_inventory(pks, chunk_size):
+    """
+    Delete the items `pks` with their usage history in a few queries per
+    chunk. The per-row delete signals are skipped: callers bump the versions
+    and forget the counters once afterwards.
+    """
+    for offset in range(0, len(pks), chunk_size):
+        chunk = pks[offset:offset + chunk_size]
+        for model in (InventoryUsage, InventoryUsageDaily):
+            queryset = model.objects.filter(inventory_id__in=chunk)
+            queryset._raw_delete(queryset.db)
+        queryset = Inventory.objects.filter(pk__in=chunk)
+        queryset._raw_delete(queryset.db)
+
+
+def sync_inventory(df, chunk_size=None, allow_empty=False):
+    """
+    Make Inventory match the sheet `df` in one transaction: insert new
+    (name, region) keys, update rows whose fingerprint changed, delete items
+    no longer listed, and leave the rest untouched (usage history included).
+    A sheet without any item would delete the whole inventory, so it raises
+    SheetError unless `allow_empty`. Returns the size of each part of the diff.
+    """
+    chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+    start = time.perf_counter()
+    frame = normalize_inventory_sheet(df)
+    if frame.empty and not allow_empty:
+        raise SheetError("The sheet lists no inventory items; syncing it would delete every item.")
+    update_fields = [column for column in frame.columns if column not in INVENTORY_KEY]
+    with transaction.atomic():
+        existing = {
+            (name, region): (pk, fingerprint)
+            for pk, name, region, fingerprint in Inventory.objects.values_list('pk', 'name', 'region', 'fingerprint')
+        }
+        inserts, updates = [], []
+        for row in frame.to_dict('records'):
+            stored = existing.pop((row['name'], row['region']), None)
+            if stored is None:
+                inserts.append(Inventory(**row))
+            elif stored[1] != row['fingerprint']:
+                updates.append(Inventory(pk=stored[0], **row))
+        # Whatever is left in `existing` is no longer in the sheet
+        deletes = [pk for pk, _ in existing.values()]
+        Inventory.objects.bulk_create(inserts, batch_size=chunk_size)
+        Inventory.objects.bulk_update(updates, update_fields, batch_size=chunk_size)
+        delete_inventory(deletes, chunk_size)
+        # None of the bulk writes send signals
+        bump_versions(Inventory, *([InventoryUsage] if deletes else []))
+        forget_counters(Inventory)
+    return {
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'deleted': len(deletes),
+        'unchanged': len(frame) - len(inserts) - len(updates),
+        'rows': len(frame),
+        'seconds': round(time.perf_counter() - start, 4),
+    }
+
+
+Importer = namedtuple('Importer', ['model', 'normalize', 'unique_fields'])
+IMPORTERS = {
+    'inventory': Importer(Inventory, normalize_inventory_sheet, INVENTORY_KEY),
+    'costs': Importer(Cost, normalize_cost_sheet, COST_KEY),
+}
+
+
+def import_sheet(kind, df, progress=None, errors=None, atomic=True):
+    importer = IMPORTERS[kind]
+    frame = importer.normalize(df, errors)
+    return bulk_upsert(importer.model, frame, importer.unique_fields, progress=progress, atomic=atomic)
+
+
+def import_inventory_sheet(df):
+    return import_sheet('inventory', df)
+
+
+def import_cost_sheet(df):
+    return import_sheet('costs', df)
+
+
+def read_sheet(file, name):
+    """DataFrame from an uploaded .csv, .xlsx or .xls file object."""
+    if name.lower().endswith('.csv'):
+        return pd.read_csv(file)
+    return pd.read_excel(file)
@@ -0,0 +1,81 @@
+import numpy as np
+from django.conf import settings
+
+from .coalescer import MicroBatcher
+from .constants import HIGH_RISK_THRESHOLD, MEDIUM_RISK_THRESHOLD
+from .executor import InferenceExecutor
+from .features import to_matrix
+from .model_registry import registry
+from .prediction_cache import PredictionCache
+
+prediction_cache = PredictionCache(
+    maxsize=settings.RISK_PREDICTION_CACHE_SIZE,
+    ttl=settings.RISK_PREDICTION_CACHE_TTL,
+)
+# Entries are keyed by model version already; dropping them on a swap frees the space
+registry.on_change(lambda loaded: prediction_cache.clear())
+
+inference_executor = None
+if settings.RISK_EXECUTOR_ENABLED:
+    inference_executor = InferenceExecutor(
+        workers=settings.RISK_EXECUTOR_WORKERS,
+        timeout=settings.RISK_EXECUTOR_TIMEOUT,
+        max_pending=settings.RISK_EXECUTOR_MAX_PENDING,
+    )
+
+micro_batcher = None
+if settings.RISK_COALESCE_ENABLED:
+    micro_batcher = MicroBatcher(
+        lambda loaded, matrix: model_predict_proba(loaded, matrix),
+        max_wait_ms=settings.RISK_COALESCE_MAX_WAIT_MS,
+        max_batch_size=settings.RISK_COALESCE_MAX_BATCH_SIZE,
+        max_concurrent_batches=settings.RISK_COALESCE_MAX_CONCURRENT_BATCHES,
+        timeout=settings.RISK_EXECUTOR_TIMEOUT,
+    )
+
+
+def model_predict_proba(loaded, matrix):
+    if inference_executor is not None:
+        return inference_executor.predict_proba(loaded, matrix)
+    return loaded.model.predict_proba(matrix)
+
+
+def score_uncached(loaded, matrix):
+    # Lone rows wait briefly to be scored together with concurrent requests
+    if micro_batcher is not None and len(matrix) == 1:
+        return micro_batcher.predict_proba(loaded, matrix[0])[np.newaxis, :]
+    return model_predict_proba(loaded, matrix)
+
+
+def predict_proba(loaded, rows):
+    """Class probabilities from a LoadedModel, served from the prediction cache where possible."""
+    return prediction_cache.predict_proba(loaded, to_matrix(rows), score=lambda matrix: score_uncached(loaded, matrix))
+
+
+def predict_risk_scores(loaded, rows):
+    """Positive-class probabilities for every row, in one predict_proba call."""
+    return predict_proba(loaded, rows)[:, 1]
+
+
+def predict_risk_levels(loaded, rows):
+    # Forest predict() is the argmax of predict_proba, so both share the cache
+    classes = loaded.model.classes_
+    return classes[np.argmax(predict_proba(loaded, rows), axis=1)].astype(int)
+
+
+def risk_band(risk_score):
+    """Map a risk score to (risk_level, recommended_action)."""
+    if risk_score > HIGH_RISK_THRESHOLD:
+        return 'high', "Immediate follow-up and HPV DNA test"
+    if risk_score > MEDIUM_RISK_THRESHOLD:
+        return 'medium', "Pap smear and close monitoring"
+    return 'low', "Routine screening"
+
+
+def prediction_action(risk_level):
+    """Recommended action for a class predicted by PredictView."""
+    if risk_level == 2:
+        return "HPV DNA"
+    if risk_level == 1:
+        return "PAP SMEAR"
+    return "Routine Follow-up"
@@ -0,0 +1,152 @@
+import json
+import platform
+import time
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+
+from api.features import FEATURE_COLUMNS
+from api.inference import prediction_cache
+from api.model_registry import registry
+from api.models import Patient, RiskAssessmentHistory
+
+
+def random_features(rng, n):
+    age = rng.integers(18, 70, n)
+    first_sexual_age = np.minimum(rng.integers(12, 30, n), age)
+    flags = rng.random((n, 5)) < [0.3, 0.2, 0.15, 0.1, 0.5]
+    rows = np.column_stack([
+        age, rng.integers(0, 10, n), first_sexual_age, age - first_sexual_age, flags, flags[:, :4].sum(axis=1),
+    ])
+    return rows.astype(int).tolist()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark /api/predict/ and /api/risk_assessment/ (single and batch) in-process "
+        "through the Django test client against a generated test database, and write "
+        "p50/p95/p99 latency and throughput per batch size as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+        parser.add_argument('--requests', type=int, default=30, help="Timed requests per endpoint and batch size.")
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--with-cache', action='store_true', help="Leave the prediction cache on.")
+        parser.add_argument('--output', default='benchmark-results.json')
+        parser.add_argument('--compare', help="Earlier results file to print p50 deltas against.")
+
+    def handle(self, *args, **options):
+        loaded = registry.get()
+        if loaded is None:
+            raise CommandError("Risk model is not available.")
+        if not options['with_cache']:
+            prediction_cache.maxsize = 0
+        self.rng = np.random.default_rng(options['seed'])
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.generate_data(options['patients'])
+            results = self.run_cases(options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'model_version': loaded.version,
+            'engine': settings.RISK_INFERENCE_ENGINE,
+            'prediction_cache': options['with_cache'],
+            'coalescer': settings.RISK_COALESCE_ENABLED,
+            'executor': settings.RISK_EXECUTOR_ENABLED,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'patients': options['patients'],
+            'requests': options['requests'],
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def generate_data(self, n):
+        patients = Patient.objects.bulk_create([
+            Patient(name=f'Benchmark {i}', age=30, condition='Screening', appointment='', contact='')
+            for i in range(n)
+        ])
+        RiskAssessmentHistory.objects.bulk_create([
+            RiskAssessmentHistory(
+                patient=patient, risk_score=0.5, recommended_action='', **dict(zip(FEATURE_COLUMNS, features))
+            )
+            for patient, features in zip(patients, random_features(self.rng, n))
+        ])
+        self.patient_ids = [patient.id for patient in patients]
+        self.client = Client()
+        self.client.force_login(User.objects.create_user('benchmark', password='benchmark'))
+
+    def payloads(self, endpoint, batch_size):
+        features = random_features(self.rng, batch_size)
+        patient_ids = self.rng.choice(self.patient_ids, batch_size).tolist()
+        if endpoint == 'predict':
+            return '/api/predict/', {'features': features[0]}
+        if endpoint == 'predict_batch':
+            return '/api/predict/batch/', {'features': features}
+        if endpoint == 'risk_assessment':
+            return '/api/risk_assessment/', {'patient_id': patient_ids[0], 'features': features[0]}
+        return '/api/risk_assessment/batch/', {
+            'assessments': [{'patient_id': pid, 'features': row} for pid, row in zip(patient_ids, features)]
+        }
+
+    def run_cases(self, options):
+        cases = [('predict', 1), ('risk_assessment', 1)]
+        for batch_size in options['batch_sizes']:
+            cases += [('predict_batch', batch_size), ('risk_assessment_batch', batch_size)]
+        results = []
+        for endpoint, batch_size in cases:
+            samples = []
+            for i in range(options['warmup'] + options['requests']):
+                url, payload = self.payloads(endpoint, batch_size)
+                start = time.perf_counter()
+                response = self.client.post(url, payload, content_type='application/json')
+                elapsed = time.perf_counter() - start
+                if response.status_code != 200:
+                    raise CommandError(f"{url} returned {response.status_code}: {response.content[:200]!r}")
+                if i >= options['warmup']:
+                    samples.append(elapsed)
+            samples = np.array(samples) * 1000
+            result = {
+                'endpoint': endpoint,
+                'batch_size': batch_size,
+                'p50_ms': float(np.percentile(samples, 50)),
+                'p95_ms': float(np.percentile(samples, 95)),
+                'p99_ms': float(np.percentile(samples, 99)),
+                'mean_ms': float(samples.mean()),
+                'rows_per_sec': float(batch_size * len(samples) / (samples.sum() / 1000)),
+            }
+            results.append(result)
+            self.stdout.write(
+                f"{endpoint:<22} batch={batch_size:<5} p50={result['p50_ms']:8.2f} ms  "
+                f"p95={result['p95_ms']:8.2f} ms  p99={result['p99_ms']:8.2f} ms  "
+                f"{result['rows_per_sec']:10.0f} rows/s"
+            )
+        return results
+
+    def compare(self, path, results):
+        with open(path) as f:
+            baseline = {(r['endpoint'], r['batch_size']): r for r in json.load(f)['results']}
+        self.stdout.write(f"p50 change vs {path}:")
+        for result in results:
+            before = baseline.get((result['endpoint'], result['batch_size']))
+            if before:
+                change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+                self.stdout.write(f"  {result['endpoint']:<22} batch={result['batch_size']:<5} {change:+.1f}%")
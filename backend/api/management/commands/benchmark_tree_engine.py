@@ -0,0 +1,44 @@
+import time
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.tree_engine import CompiledForest
+
+
+class Command(BaseCommand):
+    help = "Compare predict_proba latency of the sklearn forest and the compiled tree engine."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        forest = joblib.load(settings.RISK_MODEL_PATH)
+        start = time.perf_counter()
+        compiled = CompiledForest.from_sklearn(forest)
+        self.stdout.write(f"Compiled {len(forest.estimators_)} trees ({compiled.feature.size} nodes) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        rng = np.random.default_rng(options['seed'])
+        for batch_size in options['batch_sizes']:
+            X = rng.integers(0, 60, size=(batch_size, forest.n_features_in_)).astype(float)
+            max_diff = np.abs(forest.predict_proba(X) - compiled.predict_proba(X)).max()
+            # Keep the total amount of work roughly constant across batch sizes
+            iterations = max(10, options['iterations'] // batch_size)
+            timings = {}
+            for name, predict_proba in (('sklearn', forest.predict_proba), ('compiled', compiled.predict_proba)):
+                samples = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    predict_proba(X)
+                    samples.append(time.perf_counter() - start)
+                timings[name] = np.array(samples) * 1000
+            speedup = np.median(timings['sklearn']) / np.median(timings['compiled'])
+            self.stdout.write(f"batch={batch_size} (max |diff|={max_diff:.2e}, {speedup:.1f}x)")
+            for name, samples in timings.items():
+                self.stdout.write(
+                    f"  {name:<9} p50={np.percentile(samples, 50):.3f} ms  p95={np.percentile(samples, 95):.3f} ms"
+                )
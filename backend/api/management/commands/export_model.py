@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.features import check_model_schema
+from api.model_format import load_compact, write_compact
+from api.model_registry import read_schema_metadata
+from api.tree_engine import CompiledForest
+
+# Runs in a fresh interpreter so import cost and resident memory are attributed fairly
+# (ru_maxrss would carry over the parent's peak through exec, so read current RSS)
+LOAD_PROBE = """
+import json, os, sys, time
+sys.path.insert(0, {backend_dir!r})
+def rss_kb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+before = rss_kb()
+start = time.perf_counter()
+{load}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'rss_kb': rss_kb() - before}}))
+"""
+LOADERS = {
+    'pickle': "import joblib; model = joblib.load({path!r})",
+    'compact': "from api.model_format import load_compact; model = load_compact({path!r})",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the risk forest to the compact .mrf format (api.model_format) and compare "
+        "load time, file size and resident memory against the joblib pickle."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', default=str(settings.RISK_MODEL_PATH))
+        parser.add_argument('--output', help="Defaults to the input path with an .mrf extension.")
+        parser.add_argument('--repeat', type=int, default=3, help="Load measurements per format.")
+
+    def handle(self, *args, **options):
+        source = options['input']
+        output = options['output'] or f'{os.path.splitext(source)[0]}.mrf'
+        forest = joblib.load(source)
+        metadata = read_schema_metadata(source)
+        check_model_schema(forest, metadata)
+        write_compact(CompiledForest.from_sklearn(forest), output, metadata)
+
+        compact = load_compact(output)
+        rng = np.random.default_rng(0)
+        X = rng.integers(0, 60, size=(5000, forest.n_features_in_)).astype(float)
+        X[::7, -1] = np.nan
+        max_diff = np.abs(compact.predict_proba(X) - forest.predict_proba(X)).max()
+        agreement = np.mean(compact.predict(X) == forest.predict(X))
+        self.stdout.write(f"Wrote {output}: max |proba diff| {max_diff:.2e}, class agreement {agreement:.2%}")
+
+        self.stdout.write(f"{'format':<8} {'size':>10} {'load p50':>10} {'rss':>10}")
+        for name, path in (('pickle', source), ('compact', output)):
+            probes = [self.probe(LOADERS[name].format(path=path)) for _ in range(options['repeat'])]
+            seconds = np.median([probe['seconds'] for probe in probes])
+            rss_kb = np.median([probe['rss_kb'] for probe in probes])
+            self.stdout.write(
+                f"{name:<8} {os.path.getsize(path) / 1024:>8.1f}KB {seconds * 1000:>8.1f}ms {rss_kb / 1024:>8.1f}MB"
+            )
+
+    def probe(self, load):
+        code = LOAD_PROBE.format(backend_dir=str(settings.BASE_DIR), load=load)
+        result = subprocess.run([sys.executable, '-W', 'ignore', '-c', code], capture_output=True, text=True, check=True)
+        return json.loads(result.stdout.strip().splitlines()[-1])
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import reconcile_counters, reconcile_usage_rollup, record_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the dashboard counters and the daily usage rollup from the tables, correct "
+        "any drift (e.g. from bulk writes that skip signals) and record today's snapshot. "
+        "Meant to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-snapshot', action='store_true', help="Only reconcile.")
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters()
+        for name, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(f"{name}: {stored} -> {actual}")
+        usage_drift = reconcile_usage_rollup()
+        for (inventory_id, day), (stored, actual) in sorted(usage_drift.items()):
+            self.stdout.write(f"usage {inventory_id} {day}: {stored} -> {actual}")
+        if not options['no_snapshot']:
+            record_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled dashboard counters ({len(drift)} corrected) "
+            f"and usage rollup ({len(usage_drift)} corrected)"
+        ))
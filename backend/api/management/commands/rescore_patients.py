@@ -0,0 +1,90 @@
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.features import latest_patient_matrix
+from api.inference import model_predict_proba, risk_band
+from api.model_registry import registry
+from api.models import Patient
+from api.versioning import bump_versions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Patient.risk_score/risk_level for every patient from their latest "
+        "risk assessment, scoring one chunk of patients per model call."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Chunks scored in parallel threads. Keep at 1 on SQLite, which allows a single writer.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Score without writing results.")
+
+    def handle(self, *args, **options):
+        loaded = registry.get()
+        if loaded is None:
+            raise CommandError("Risk model is not available.")
+        chunk_size = options['chunk_size']
+        self.loaded = loaded
+        self.dry_run = options['dry_run']
+
+        patient_ids = Patient.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=chunk_size)
+        chunks = iter(lambda: list(itertools.islice(patient_ids, chunk_size)), [])
+        start = time.perf_counter()
+        scored = skipped = 0
+        if options['workers'] > 1:
+            # Worker threads fetch features and score; results are written from this
+            # thread so SQLite's single-writer lock is never contended
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(self.score_chunk_in_thread, chunk))
+                    # Bound the chunks in flight so memory stays flat on large tables
+                    if len(pending) >= options['workers'] * 2:
+                        scored, skipped = self.write_chunk(*pending.popleft().result(), scored, skipped)
+                while pending:
+                    scored, skipped = self.write_chunk(*pending.popleft().result(), scored, skipped)
+        else:
+            for chunk in chunks:
+                scored, skipped = self.write_chunk(*self.score_chunk(chunk), scored, skipped)
+
+        elapsed = time.perf_counter() - start
+        rate = (scored + skipped) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescored {scored} patients with model {loaded.version} "
+            f"({skipped} without an assessment skipped) in {elapsed:.2f}s, {rate:.0f} rows/sec"
+            + (" [dry run]" if self.dry_run else "")
+        ))
+
+    def score_chunk(self, patient_ids):
+        ids, matrix = latest_patient_matrix(patient_ids)
+        patients = []
+        if ids:
+            # Straight to the model: a full rescore would only flush the prediction cache
+            risk_scores = model_predict_proba(self.loaded, matrix)[:, 1]
+            for pid, risk_score in zip(ids, risk_scores):
+                risk_level, _ = risk_band(float(risk_score))
+                patients.append(Patient(id=pid, risk_score=float(risk_score), risk_level=risk_level))
+        return patients, len(patient_ids)
+
+    def score_chunk_in_thread(self, patient_ids):
+        try:
+            return self.score_chunk(patient_ids)
+        finally:
+            # Each worker thread opens its own connection
+            connection.close()
+
+    def write_chunk(self, patients, chunk_length, scored, skipped):
+        if patients and not self.dry_run:
+            with transaction.atomic():
+                Patient.objects.bulk_update(patients, ['risk_score', 'risk_level'], batch_size=500)
+                # bulk_update sends no signals; invalidate cached patient lists explicitly
+                bump_versions(Patient)
+        return scored + len(patients), skipped + chunk_length - len(patients)
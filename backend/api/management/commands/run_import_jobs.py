@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.import_jobs import fail_stalled_jobs, purge_finished_uploads, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued spreadsheet import jobs outside the web process (the default "
+        "IMPORT_JOB_RUNNER = 'command'), failing any job stuck past IMPORT_JOB_TIMEOUT "
+        "and deleting the uploads of finished jobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the jobs pending now, then exit.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds between polls for new jobs.")
+
+    def handle(self, *args, **options):
+        while True:
+            stalled = fail_stalled_jobs()
+            if stalled:
+                self.stdout.write(f"Marked {stalled} stalled job(s) failed")
+            purge_finished_uploads()
+            ran = run_pending_jobs()
+            if ran:
+                self.stdout.write(f"Ran {ran} import job(s)")
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,67 @@
+import json
+import os
+
+import joblib
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from api.dataset_cache import read_dataset
+from api.features import schema_metadata, sheet_matrix
+from api.model_registry import schema_metadata_path
+
+DATASET_PATH = settings.DATASETS_DIR / 'Cervical Cancer Datasets_.xlsx'
+HIGH_RISK_ACTIONS = ('COLPOSCOPY', 'BIOPSY', 'CYTOLOGY', 'HPV DNA')
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the risk random forest on the shared feature pipeline (api.features) and "
+        "write it with its schema metadata to --output. Nothing is served until the file "
+        "is promoted by pointing --output (or a copy) at RISK_MODEL_PATH, which serving hot-reloads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', default=str(DATASET_PATH))
+        # No default: overwriting the served model must be an explicit choice
+        parser.add_argument('--output', required=True, help="Where to write the model, e.g. a new file next to RISK_MODEL_PATH.")
+        parser.add_argument('--n-estimators', type=int, default=100)
+        parser.add_argument('--random-state', type=int, default=42)
+
+    def handle(self, *args, **options):
+        df = read_dataset(options['dataset'])
+        X = sheet_matrix(df)
+        y = df['Recommended Action'].str.contains('|'.join(HIGH_RISK_ACTIONS), case=False, na=False).to_numpy(dtype=int)
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, stratify=y, random_state=options['random_state']
+        )
+        model = RandomForestClassifier(
+            n_estimators=options['n_estimators'], class_weight='balanced', random_state=options['random_state']
+        ).fit(X_train, y_train)
+        auc = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+        # Refit on everything for the served model
+        model.fit(X, y)
+
+        output = options['output']
+        metadata = {
+            **schema_metadata(),
+            'trained_at': timezone.now().isoformat(),
+            'dataset': os.path.basename(options['dataset']),
+            'rows': int(len(y)),
+            'positive_rate': float(np.mean(y)),
+            'holdout_auc': float(auc),
+        }
+        # Write the schema first and swap the model in atomically, so the registry
+        # never sees a half-written pickle
+        with open(schema_metadata_path(output), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        tmp_path = f'{output}.{os.getpid()}.tmp'
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, output)
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained on {len(y)} rows (holdout AUC {auc:.3f}); wrote {output}"
+        ))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_usage(apps, schema_editor):
+    InventoryUsage = apps.get_model('api', 'InventoryUsage')
+    InventoryUsageDaily = apps.get_model('api', 'InventoryUsageDaily')
+    totals = (
+        InventoryUsage.objects.filter(used__gt=0)
+        .annotate(date=TruncDate('timestamp'))
+        .values('inventory_id', 'date')
+        .annotate(total=Sum('used'))
+    )
+    InventoryUsageDaily.objects.bulk_create([
+        InventoryUsageDaily(inventory_id=row['inventory_id'], date=row['date'], used=row['total'])
+        for row in totals
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_room_patient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryUsageDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('used', models.IntegerField(default=0)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='api.inventory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='api_invento_date_2f8621_idx')],
+                'constraints': [models.UniqueConstraint(fields=('inventory', 'date'), name='unique_inventory_usage_day')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_usage, migrations.RunPython.noop),
+    ]
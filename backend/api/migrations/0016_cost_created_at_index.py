@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_inventoryusagedaily'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cost',
+            index=models.Index(fields=['created_at'], name='api_cost_created_511a4c_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_dashboard_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='riskassessmenthistory',
+            index=models.Index(fields=['risk_score'], name='api_riskass_risk_sc_f41bc8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riskassessmenthistory',
+            index=models.Index(fields=['timestamp', 'risk_score'], name='api_riskass_timesta_f6a4da_idx'),
+        ),
+    ]
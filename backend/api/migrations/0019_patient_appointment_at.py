@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:45
+
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# A frozen copy of api.scheduling.parse_appointment as of this migration, so
+# later changes to that module can't change what this migration does
+APPOINTMENT_FORMATS = ('%d/%m/%Y %H:%M', '%d/%m/%Y', '%d-%m-%Y %H:%M', '%d-%m-%Y')
+
+
+def parse_appointment(value):
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        for fmt in APPOINTMENT_FORMATS:
+            try:
+                moment = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+    if moment is None:
+        return None
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def parse_existing_appointments(apps, schema_editor):
+    Patient = apps.get_model('api', 'Patient')
+    patients = list(Patient.objects.exclude(appointment='').only('id', 'appointment'))
+    for patient in patients:
+        patient.appointment_at = parse_appointment(patient.appointment)
+    Patient.objects.bulk_update(patients, ['appointment_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_risk_score_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='appointment_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(parse_existing_appointments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_patient_appointment_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['risk_level', 'id'], name='api_patient_risk_le_b1e4a1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['location', 'id'], name='api_patient_locatio_f53e50_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['risk_score', 'id'], name='api_patient_risk_sc_9b237a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['name', 'id'], name='api_patient_name_f9860e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riskassessmenthistory',
+            index=models.Index(fields=['patient', 'timestamp'], name='api_riskass_patient_1dd493_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:52
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+from django.utils import timezone
+
+
+def duplicate_groups(model, fields):
+    """(kept id, [duplicate ids]) per natural key with more than one row; the newest row is kept."""
+    groups = model.objects.values(*fields).annotate(n=Count('id'), keep=Max('id')).filter(n__gt=1)
+    for group in groups:
+        ids = model.objects.filter(**{field: group[field] for field in fields}).values_list('id', flat=True)
+        yield group['keep'], [pk for pk in ids if pk != group['keep']]
+
+
+def dedupe_natural_keys(apps, schema_editor):
+    Cost = apps.get_model('api', 'Cost')
+    Inventory = apps.get_model('api', 'Inventory')
+    InventoryUsage = apps.get_model('api', 'InventoryUsage')
+    InventoryUsageDaily = apps.get_model('api', 'InventoryUsageDaily')
+    for keep, duplicates in duplicate_groups(Cost, ['treatment', 'facility']):
+        Cost.objects.filter(id__in=duplicates).delete()
+    for keep, duplicates in duplicate_groups(Inventory, ['name', 'region']):
+        # Usage history moves to the surviving row; its daily rollup is rebuilt from it
+        InventoryUsage.objects.filter(inventory_id__in=duplicates).update(inventory_id=keep)
+        InventoryUsageDaily.objects.filter(inventory_id__in=duplicates + [keep]).delete()
+        daily = {}
+        for usage in InventoryUsage.objects.filter(inventory_id=keep, used__gt=0):
+            day = timezone.localdate(usage.timestamp)
+            daily[day] = daily.get(day, 0) + usage.used
+        InventoryUsageDaily.objects.bulk_create([
+            InventoryUsageDaily(inventory_id=keep, date=day, used=used) for day, used in daily.items()
+        ])
+        Inventory.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_resource_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_natural_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cost',
+            constraint=models.UniqueConstraint(fields=('treatment', 'facility'), name='unique_cost_treatment_facility'),
+        ),
+        migrations.AddConstraint(
+            model_name='inventory',
+            constraint=models.UniqueConstraint(fields=('name', 'region'), name='unique_inventory_name_region'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_import_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16),
+        ),
+    ]
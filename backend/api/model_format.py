@@ -0,0 +1,111 @@
+"""
+Compact on-disk format for the risk forest (".mrf").
+
+Layout: 8-byte magic, uint32 format version, uint32 header length, a JSON
+header, then the typed node arrays, each aligned to 64 bytes. The header
+records every array's dtype, shape and offset, so loading is a single mmap
+plus zero-copy views and needs nothing beyond NumPy.
+
+Thresholds are stored as float32 without changing any decision: sklearn
+compares float32-cast inputs, so a threshold rounded down to the nearest
+float32 splits every input the same way. They are not floored for integer
+columns, since serving also scores non-integral values there (x = 30.3 falls
+on different sides of 30.5 and 30).
+"""
+import json
+import mmap
+import struct
+
+import numpy as np
+
+from .tree_engine import CompiledForest
+
+MAGIC = b'MRFOREST'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+PREAMBLE = struct.Struct('<8sII')
+
+
+def _index_dtype(n):
+    return np.int16 if n <= np.iinfo(np.int16).max else np.int32
+
+
+def quantize_thresholds(compiled):
+    threshold = compiled.threshold
+    quantized = threshold.astype(np.float32)
+    # astype rounds to nearest; step down wherever that landed above the original
+    above = quantized.astype(np.float64) > threshold
+    quantized[above] = np.nextafter(quantized[above], np.float32(-np.inf))
+    return quantized
+
+
+def write_compact(compiled, path, metadata=None):
+    """Write a CompiledForest to `path`; returns the number of bytes written."""
+    n_nodes = compiled.feature.shape[0]
+    index_dtype = _index_dtype(n_nodes)
+    arrays = {
+        'feature': compiled.feature.astype(_index_dtype(compiled.n_features_in_)),
+        'threshold': quantize_thresholds(compiled),
+        'left': compiled.left.astype(index_dtype),
+        'right': compiled.right.astype(index_dtype),
+        'missing_left': compiled.missing_left.astype(np.bool_),
+        'value': compiled.value.astype(np.float32),
+        'roots': compiled.roots.astype(index_dtype),
+    }
+    header = {
+        'n_features': int(compiled.n_features_in_),
+        'max_depth': int(compiled.max_depth),
+        'classes': compiled.classes_.tolist(),
+        'metadata': metadata or {},
+        'arrays': {},
+    }
+    # Offsets depend on the header size, which depends on the offsets: lay out
+    # relative to the data section and align that section itself
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header_bytes = json.dumps(header).encode()
+    data_start = -(-(PREAMBLE.size + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    with open(path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    return data_start + offset
+
+
+def load_compact(path):
+    """CompiledForest whose arrays are read-only views over a shared mmap of `path`."""
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_length = PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a compact risk model file.")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact model format version {version}.")
+    header = json.loads(buffer[PREAMBLE.size:PREAMBLE.size + header_length])
+    data_start = -(-(PREAMBLE.size + header_length) // ALIGNMENT) * ALIGNMENT
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        arrays[name] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=data_start + spec['offset']
+        ).reshape(spec['shape'])
+    compiled = CompiledForest(
+        feature=arrays['feature'],
+        threshold=arrays['threshold'],
+        left=arrays['left'],
+        right=arrays['right'],
+        missing_left=arrays['missing_left'],
+        value=arrays['value'],
+        roots=arrays['roots'],
+        max_depth=header['max_depth'],
+        classes=np.asarray(header['classes']),
+        n_features=header['n_features'],
+    )
+    compiled.metadata = header['metadata']
+    return compiled
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import joblib
+from django.conf import settings
+from django.utils import timezone
+
+from .features import check_model_schema
+from .model_format import load_compact
+from .tree_engine import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+
+class LoadedModel:
+    """A loaded model file: the estimator plus what identifies it."""
+
+    def __init__(self, model, version, path, mtime_ns, size, engine):
+        self.model = model
+        self.version = version
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.engine = engine
+        self.loaded_at = timezone.now()
+
+    def as_dict(self):
+        return {
+            'version': self.version,
+            'path': str(self.path),
+            'engine': self.engine,
+            'size': self.size,
+            'modified_at': datetime.fromtimestamp(self.mtime_ns / 1e9, tz=dt_timezone.utc),
+            'loaded_at': self.loaded_at,
+        }
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def schema_metadata_path(model_path):
+    return f'{os.path.splitext(model_path)[0]}.schema.json'
+
+
+def read_schema_metadata(model_path):
+    """Feature schema recorded by train_risk_model next to the model, if any."""
+    try:
+        with open(schema_metadata_path(model_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class ModelRegistry:
+    """
+    Loads the risk model lazily and hot-swaps it when the file changes.
+
+    The file is stat'ed at most once per `check_interval` seconds; a changed
+    mtime/size triggers a content hash, and a new hash triggers a reload. The
+    new LoadedModel replaces the old one with a single reference assignment, so
+    requests that already hold the previous snapshot finish on it undisturbed.
+    If a reload fails (e.g. a half-written file) the previous model keeps serving.
+
+    A file that failed to load is not hashed or loaded again until its
+    mtime/size change, and while no model is loaded at all, checks back off
+    exponentially (from `check_interval` up to `max_backoff` seconds) instead
+    of every request blocking on another attempt.
+    """
+
+    def __init__(self, path, engine='sklearn', check_interval=5.0, cache_dir=None, max_backoff=60.0):
+        self.path = path
+        self.engine = engine
+        self.check_interval = check_interval
+        self.cache_dir = cache_dir
+        self.max_backoff = max_backoff
+        self._current = None
+        self._last_check = None
+        self._retry_at = None
+        self._failures = 0
+        self._failed_stat = None
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def get(self):
+        """Current LoadedModel, or None if no model could be loaded."""
+        current = self._current
+        if current is None:
+            due = self._retry_due()
+        else:
+            due = time.monotonic() - self._last_check >= self.check_interval
+        # Requests that find a reload already in progress keep using the current model
+        if due and self._lock.acquire(blocking=current is None):
+            try:
+                # Unless another request loaded the model, or just failed to, while this one waited
+                if current is not None or (self._current is None and self._retry_due()):
+                    self._refresh()
+            finally:
+                self._lock.release()
+        return self._current
+
+    def get_model(self):
+        loaded = self.get()
+        return loaded.model if loaded else None
+
+    def reload(self):
+        """Force a stat/hash check now, regardless of the check interval or backoff."""
+        with self._lock:
+            self._failed_stat = None
+            self._refresh()
+        return self._current
+
+    def on_change(self, callback):
+        """Register callback(loaded_model), called after every model swap."""
+        self._listeners.append(callback)
+
+    def _refresh(self):
+        self._last_check = time.monotonic()
+        current = self._current
+        signature = None
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if current and signature == (current.mtime_ns, current.size):
+                return
+            if signature == self._failed_stat:
+                # Same file that failed last time; wait for it to change
+                self._back_off()
+                return
+            version = file_sha256(self.path)[:16]
+            if current and version == current.version:
+                # Touched but not changed: keep the loaded estimator
+                current.mtime_ns, current.size = signature
+                return
+            loaded = LoadedModel(self._load(version), version, self.path, stat.st_mtime_ns, stat.st_size, self.engine)
+        except Exception:
+            logger.exception("Error loading model from %s", self.path)
+            self._failed_stat = signature
+            self._back_off()
+            return
+        self._current = loaded
+        self._failed_stat = self._retry_at = None
+        self._failures = 0
+        logger.info("Loaded risk model %s (%s engine)", version, self.engine)
+        for callback in self._listeners:
+            callback(loaded)
+
+    def _retry_due(self):
+        return self._retry_at is None or time.monotonic() >= self._retry_at
+
+    def _back_off(self):
+        if self._current is None:
+            delay = min(self.check_interval * 2 ** self._failures, self.max_backoff)
+            self._failures += 1
+            self._retry_at = self._last_check + delay
+
+    def _load(self, version):
+        model = self._load_model(version)
+        # Refuse models trained on a different feature schema; the previous one keeps serving
+        check_model_schema(model, getattr(model, 'metadata', None) or read_schema_metadata(self.path))
+        return model
+
+    def _load_model(self, version):
+        if str(self.path).endswith('.mrf'):
+            # Compact export: already flattened arrays, mapped straight from the file
+            return load_compact(self.path)
+        # Every worker holds a private copy of a pickled estimator: sklearn copies
+        # the tree nodes into its own buffers on unpickle, so mapping the pickle
+        # would not share anything
+        if self.engine != 'compiled':
+            return joblib.load(self.path)
+        # For the compiled engine the flattened arrays are cached to disk once
+        # per model version and every worker maps that file instead
+        if not self.cache_dir:
+            return CompiledForest.from_sklearn(joblib.load(self.path))
+        cache_path = os.path.join(self.cache_dir, f'{version}.compiled.joblib')
+        if not os.path.exists(cache_path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            compiled = CompiledForest.from_sklearn(joblib.load(self.path))
+            tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+            joblib.dump(compiled, tmp_path)
+            os.replace(tmp_path, cache_path)
+        return joblib.load(cache_path, mmap_mode='r')
+
+
+registry = ModelRegistry(
+    settings.RISK_MODEL_PATH,
+    engine=settings.RISK_INFERENCE_ENGINE,
+    check_interval=settings.RISK_MODEL_CHECK_INTERVAL,
+    cache_dir=settings.RISK_MODEL_CACHE_DIR,
+)
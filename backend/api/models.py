@@ -7,6 +7,8 @@ class Patient(models.Model):
     age = models.PositiveIntegerField()
     condition = models.CharField(max_length=100)
     appointment = models.CharField(max_length=20)
+    # Parsed from `appointment` on save (api.scheduling), for range queries
+    appointment_at = models.DateTimeField(null=True, blank=True, db_index=True)
     contact = models.CharField(max_length=50)
     emergency_contact = models.CharField(max_length=100, blank=True, null=True)
     email = models.CharField(max_length=100, blank=True, null=True)
@@ -18,6 +20,15 @@ class Patient(models.Model):
     notes = models.TextField(blank=True, null=True)
     risk_score = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # List filters and keyset ordering (api.pagination); id is the tiebreaker
+            models.Index(fields=['risk_level', 'id']),
+            models.Index(fields=['location', 'id']),
+            models.Index(fields=['risk_score', 'id']),
+            models.Index(fields=['name', 'id']),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.risk_level})"
 
@@ -44,6 +55,14 @@ class Inventory(models.Model):
     unit = models.CharField(max_length=20, blank=True, null=True)
     status = models.CharField(max_length=20, blank=True, null=True)
     cost = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    # Hash of the spreadsheet row last applied to this item, so a sync can skip unchanged rows
+    fingerprint = models.CharField(max_length=16, blank=True, default='', editable=False)
+
+    class Meta:
+        constraints = [
+            # Natural key for spreadsheet upserts (api.importers)
+            models.UniqueConstraint(fields=['name', 'region'], name='unique_inventory_name_region'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.region})"
@@ -61,6 +80,15 @@ class Cost(models.Model):
     out_of_pocket = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)  # Added for cost trends
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+        constraints = [
+            # Natural key for spreadsheet upserts (api.importers)
+            models.UniqueConstraint(fields=['treatment', 'facility'], name='unique_cost_treatment_facility'),
+        ]
+
     def __str__(self):
         return self.treatment
 
@@ -84,6 +112,15 @@ class RiskAssessmentHistory(models.Model):
     cost = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Covering indexes for the histogram: by score alone, and within a date range
+            models.Index(fields=['risk_score']),
+            models.Index(fields=['timestamp', 'risk_score']),
+            # One patient's history, newest first
+            models.Index(fields=['patient', 'timestamp']),
+        ]
+
     def __str__(self):
         return f"{self.patient.name} - {self.recommended_action} ({self.timestamp})"
 
@@ -96,3 +133,87 @@ class InventoryUsage(models.Model):
 
     def __str__(self):
         return f"{self.inventory.name} usage: {self.used} on {self.timestamp}"
+
+# Daily rollup of positive InventoryUsage events, kept up to date by signals
+class InventoryUsageDaily(models.Model):
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name='daily_usage')
+    date = models.DateField()
+    used = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['inventory', 'date'], name='unique_inventory_usage_day'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory.name} used {self.used} on {self.date}"
+
+# Running totals behind the dashboard cards, maintained by api.counters
+class DashboardCounter(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+# Daily copy of the counters, for week-over-week changes
+class DashboardCounterSnapshot(models.Model):
+    name = models.CharField(max_length=50)
+    date = models.DateField()
+    value = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'date'], name='unique_dashboard_counter_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} on {self.date} = {self.value}"
+
+# Write counter per model, behind the ETag/Last-Modified headers (api.versioning)
+class ResourceVersion(models.Model):
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+# Uploaded spreadsheet loaded in the background (api.import_jobs)
+class ImportJob(models.Model):
+    KIND_CHOICES = [
+        ("inventory", "Inventory"),
+        ("costs", "Costs"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    file = models.FileField(upload_to='imports/%Y/%m/')
+    original_name = models.CharField(max_length=255, blank=True)
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    rows_per_sec = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} import {self.pk} ({self.status})"
@@ -0,0 +1,115 @@
+"""
+Opt-in keyset pagination for the list endpoints.
+
+Lists stay unpaginated unless the client sends ?page_size= or ?cursor=, so
+existing callers keep getting plain arrays. A page is fetched with a
+"seek" condition on (ordering field, id) instead of OFFSET, so every page
+costs the same however deep it is, and the ordering field's index serves
+it. Nullable ordering fields sort their nulls last in both directions.
+"""
+import base64
+import json
+from datetime import date, time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetOrderingMixin:
+    """
+    ?ordering=<field> or -<field> over `ordering_fields` for a list view, with
+    the primary key as tiebreaker so the order is total.
+    """
+    ordering_fields = ('id',)
+    default_ordering = 'id'
+
+    def get_ordering(self):
+        ordering = self.request.query_params.get('ordering') or self.default_ordering
+        if ordering.lstrip('-') not in self.ordering_fields:
+            raise ValidationError({'error': f"ordering must be one of {', '.join(self.ordering_fields)} (prefix - to reverse)."})
+        return ordering
+
+    def order_queryset(self, queryset):
+        ordering = self.get_ordering()
+        field, descending = ordering.lstrip('-'), ordering.startswith('-')
+        if field == 'id':
+            return queryset.order_by(ordering)
+        if not queryset.model._meta.get_field(field).null:
+            return queryset.order_by(ordering, '-id' if descending else 'id')
+        # Explicit so pages seek the same way on every database
+        expression = F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+        return queryset.order_by(expression, '-id' if descending else 'id')
+
+
+class KeysetPagination(BasePagination):
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+        try:
+            page_size = int(params.get(self.page_size_query_param, settings.API_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'error': 'page_size must be an integer.'})
+        page_size = max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+        ordering = view.get_ordering()
+        field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        if params.get(self.cursor_query_param):
+            value, pk = self.decode_cursor(params[self.cursor_query_param], ordering, queryset.model)
+            nullable = field != 'id' and queryset.model._meta.get_field(field).null
+            queryset = queryset.filter(self.seek(field, descending, value, pk, nullable))
+
+        rows = list(queryset[:page_size + 1])
+        self.request = request
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            self.next_cursor = self.encode_cursor(ordering, getattr(last, field), last.pk)
+        return rows
+
+    def seek(self, field, descending, value, pk, nullable=True):
+        """Rows strictly after (value, pk) in the view's order."""
+        if field == 'id':
+            return Q(id__lt=pk) if descending else Q(id__gt=pk)
+        after_pk = Q(id__lt=pk) if descending else Q(id__gt=pk)
+        if value is None:
+            # Already in the trailing nulls
+            return Q(**{f'{field}__isnull': True}) & after_pk
+        beyond = Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
+        after = beyond | (Q(**{field: value}) & after_pk)
+        return after | Q(**{f'{field}__isnull': True}) if nullable else after
+
+    def encode_cursor(self, ordering, value, pk):
+        if isinstance(value, (date, time)):
+            # isoformat keeps microseconds; DjangoJSONEncoder would cut them to milliseconds
+            # and the cursor would no longer sit exactly on its row
+            value = value.isoformat()
+        payload = json.dumps({'o': ordering, 'v': value, 'id': pk}, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor, ordering, model):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if payload['o'] != ordering:
+                raise ValueError
+            field = model._meta.pk if ordering.lstrip('-') == 'id' else model._meta.get_field(ordering.lstrip('-'))
+            return field.to_python(payload['v']), int(payload['id'])
+        except (ValueError, TypeError, KeyError, DjangoValidationError):
+            raise ValidationError({'error': 'Invalid cursor.'})
+
+    def get_paginated_response(self, data):
+        next_url = None
+        if self.next_cursor:
+            next_url = replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+        return Response({'next': next_url, 'results': data})
@@ -0,0 +1,80 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def feature_key(row):
+    """Hashable form of a feature vector: 30, 30.0 and True/1 collapse, NaN becomes None."""
+    return tuple(None if math.isnan(value) else value for value in row)
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of class probabilities keyed on (model version, feature vector).
+
+    Entries expire after `ttl` seconds; `maxsize=0` disables caching. Including
+    the model version in the key means a swapped model can never be answered
+    from stale entries, and clear() drops them eagerly so they don't linger.
+    """
+
+    def __init__(self, maxsize=4096, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def predict_proba(self, loaded, matrix, score=None):
+        """
+        loaded.model.predict_proba(matrix), calling the model only for uncached
+        rows. `score(matrix)` replaces the direct model call for those rows.
+        """
+        score = score or loaded.model.predict_proba
+        if not self.maxsize:
+            return score(matrix)
+        keys = [(loaded.version, feature_key(row)) for row in matrix.tolist()]
+        now = time.monotonic()
+        results = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    results[i] = entry[1]
+                else:
+                    missing.append(i)
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            # Score every miss in a single call; duplicate rows within the batch are harmless
+            probabilities = score(matrix[missing])
+            expires_at = time.monotonic() + self.ttl
+            with self._lock:
+                for i, proba in zip(missing, probabilities):
+                    results[i] = proba
+                    self._entries[keys[i]] = (expires_at, proba)
+                    self._entries.move_to_end(keys[i])
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return np.vstack(results)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,60 @@
+"""
+Appointment times.
+
+Patient.appointment stays the free-text value the UI submits (usually a
+datetime-local string such as '2025-07-02T17:17'); Patient.appointment_at is
+the parsed, indexed datetime derived from it on save, and is what schedule
+lookups range-scan.
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .trends import day_start
+
+# Tried after ISO 8601; day-first, as entered locally
+APPOINTMENT_FORMATS = ('%d/%m/%Y %H:%M', '%d/%m/%Y', '%d-%m-%Y %H:%M', '%d-%m-%Y')
+
+
+def parse_appointment(value):
+    """Aware datetime for an appointment string, or None if it cannot be read."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        # Also accepts a bare date, as midnight
+        moment = parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        for fmt in APPOINTMENT_FORMATS:
+            try:
+                moment = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+    if moment is None:
+        return None
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def parse_window_bound(value, end=False):
+    """
+    Datetime for a schedule window bound. A bare date means the start of that
+    day, or for the end bound the start of the next day, so dates are inclusive.
+    Raises ValueError for anything else.
+    """
+    # Dates first: parse_datetime would also accept a bare date, as midnight
+    day = parse_date(value)
+    if day is not None:
+        return day_start(day + timedelta(days=1) if end else day)
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(f"{value!r} is not a date or datetime.")
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def day_window(day):
+    """[start, end) datetimes covering the local calendar day."""
+    return day_start(day), day_start(day + timedelta(days=1))
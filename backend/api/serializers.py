@@ -1,9 +1,12 @@
 from rest_framework import serializers
-from .models import Patient, Room, Inventory, Cost, RiskAssessmentHistory
+from .models import Patient, Room, Inventory, Cost, RiskAssessmentHistory, ImportJob
 from django.contrib.auth.models import User
+from .features import feature_row_error
 
 class PatientSerializer(serializers.ModelSerializer):
     risk_score = serializers.FloatField(read_only=True)
+    # Derived from `appointment` on save
+    appointment_at = serializers.DateTimeField(read_only=True)
     class Meta:
         model = Patient
         fields = '__all__'
@@ -18,8 +21,54 @@ class PatientSerializer(serializers.ModelSerializer):
             'insurance': {'required': False, 'allow_null': True},
         }
 
+class PartialListSerializer(serializers.ListSerializer):
+    """
+    Validates each item on its own instead of failing the whole list:
+    `validated_data` holds (index, data) for the valid items and `row_errors`
+    the errors of the rest.
+    """
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Expected a list of items.']})
+        self.row_errors = []
+        valid = []
+        for index, item in enumerate(data):
+            try:
+                valid.append((index, self.child.run_validation(item)))
+            except serializers.ValidationError as exc:
+                self.row_errors.append({'index': index, 'errors': exc.detail})
+        return valid
+
+class PatientBulkSerializer(PatientSerializer):
+    """One bulk row: patient fields, plus the id of a patient to update and features to score."""
+    id = serializers.IntegerField(required=False, min_value=1)
+    features = serializers.ListField(required=False)
+    region = serializers.CharField(required=False, allow_null=True, allow_blank=True, max_length=100)
+    screening_type = serializers.CharField(required=False, allow_null=True, allow_blank=True, max_length=100)
+
+    class Meta(PatientSerializer.Meta):
+        list_serializer_class = PartialListSerializer
+
+    def validate_features(self, value):
+        error = feature_row_error(value)
+        if error:
+            raise serializers.ValidationError(error)
+        return value
+
+class PatientSummarySerializer(serializers.ModelSerializer):
+    """Patient fields for dashboard lists."""
+    class Meta:
+        model = Patient
+        fields = ('id', 'name', 'age', 'condition', 'risk_level', 'risk_score', 'appointment_at')
+
+class RoomPatientSerializer(serializers.ModelSerializer):
+    """The patient fields a room card shows; the room views load only these."""
+    class Meta:
+        model = Patient
+        fields = ('id', 'name', 'age', 'condition', 'risk_level', 'risk_score')
+
 class RoomSerializer(serializers.ModelSerializer):
-    patient = PatientSerializer(read_only=True)
+    patient = RoomPatientSerializer(read_only=True)
     patient_id = serializers.PrimaryKeyRelatedField(
         queryset=Patient.objects.all(), source='patient', write_only=True, required=False
     )
@@ -55,4 +104,9 @@ class RiskAssessmentHistorySerializer(serializers.ModelSerializer):
     patient_name = serializers.CharField(source='patient.name', read_only=True)
     class Meta:
         model = RiskAssessmentHistory
-        fields = '__all__' 
\ No newline at end of file
+        fields = '__all__' 
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        exclude = ['file']
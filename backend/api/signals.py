@@ -0,0 +1,125 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .counters import TRACKED_FIELDS, adjust_counters, contribution, contribution_delta, forget_counters
+from .models import Cost, Inventory, InventoryUsage, InventoryUsageDaily, Patient, RiskAssessmentHistory, Room
+from .scheduling import parse_appointment
+from .versioning import bump_versions
+
+# Marks a save whose update_fields leave every tracked field alone
+UNCHANGED = object()
+
+
+def add_daily_usage(inventory_id, date, used):
+    """Add `used` to the inventory's rollup row for `date`, creating it if needed."""
+    updated = InventoryUsageDaily.objects.filter(inventory_id=inventory_id, date=date).update(used=F('used') + used)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            InventoryUsageDaily.objects.create(inventory_id=inventory_id, date=date, used=used)
+    except IntegrityError:
+        # Another writer created the row first
+        InventoryUsageDaily.objects.filter(inventory_id=inventory_id, date=date).update(used=F('used') + used)
+
+
+def usage_contribution(inventory_id, timestamp, used):
+    """(inventory id, day, used) a usage row adds to the rollup, or None for restocks."""
+    # Only consumption counts towards the trend; restocks are negative
+    if used is None or used <= 0 or timestamp is None:
+        return None
+    return inventory_id, timezone.localdate(timestamp), used
+
+
+@receiver(pre_save, sender=InventoryUsage)
+def remember_usage_contribution(sender, instance, update_fields=None, **kwargs):
+    # What the row adds to the rollup as stored, so the save can move it
+    if update_fields is not None and not {'inventory', 'inventory_id', 'timestamp', 'used'}.intersection(update_fields):
+        instance._usage_contribution = UNCHANGED
+    elif instance._state.adding:
+        instance._usage_contribution = None
+    else:
+        stored = sender.objects.filter(pk=instance.pk).values_list('inventory_id', 'timestamp', 'used').first()
+        instance._usage_contribution = usage_contribution(*stored) if stored else None
+
+
+@receiver(post_save, sender=InventoryUsage)
+def rollup_usage_saved(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_usage_contribution', UNCHANGED)
+    if old is UNCHANGED:
+        return
+    new = usage_contribution(instance.inventory_id, instance.timestamp, instance.used)
+    if old == new:
+        return
+    with transaction.atomic():
+        if old is not None:
+            add_daily_usage(old[0], old[1], -old[2])
+        if new is not None:
+            add_daily_usage(*new)
+
+
+@receiver(post_delete, sender=InventoryUsage)
+def rollup_usage_deleted(sender, instance, **kwargs):
+    old = usage_contribution(instance.inventory_id, instance.timestamp, instance.used)
+    if old is not None:
+        InventoryUsageDaily.objects.filter(inventory_id=old[0], date=old[1]).update(used=F('used') - old[2])
+
+
+@receiver(pre_save, sender=Patient)
+def parse_appointment_time(sender, instance, update_fields=None, **kwargs):
+    # save(update_fields=[...]) callers that touch `appointment` should list appointment_at too
+    if update_fields is not None and 'appointment' not in update_fields:
+        return
+    if 'appointment' in instance.get_deferred_fields():
+        return
+    instance.appointment_at = parse_appointment(instance.appointment)
+
+
+def remember_contribution(sender, instance, update_fields=None, **kwargs):
+    # What the row adds to the dashboard counters as stored, so the save can apply the difference
+    fields = TRACKED_FIELDS[sender]
+    if update_fields is not None and not set(fields).intersection(update_fields):
+        instance._counter_contribution = UNCHANGED
+    elif instance._state.adding:
+        instance._counter_contribution = {}
+    else:
+        stored = sender.objects.filter(pk=instance.pk).values(*fields).first()
+        instance._counter_contribution = contribution(sender(**stored)) if stored else {}
+
+
+def update_counters_on_save(sender, instance, created, **kwargs):
+    old = {} if created else getattr(instance, '_counter_contribution', None)
+    if old is UNCHANGED:
+        return
+    new = contribution(instance)
+    if old is None or new is None:
+        # Saved from a partially loaded instance: recompute rather than guess
+        forget_counters(sender)
+    else:
+        adjust_counters(contribution_delta(old, new))
+
+
+def update_counters_on_delete(sender, instance, **kwargs):
+    old = contribution(instance)
+    if old is None:
+        forget_counters(sender)
+    else:
+        adjust_counters(contribution_delta(old, {}))
+
+
+for model in TRACKED_FIELDS:
+    pre_save.connect(remember_contribution, sender=model, dispatch_uid=f'counters-pre-save-{model.__name__}')
+    post_save.connect(update_counters_on_save, sender=model, dispatch_uid=f'counters-save-{model.__name__}')
+    post_delete.connect(update_counters_on_delete, sender=model, dispatch_uid=f'counters-delete-{model.__name__}')
+
+
+def bump_version(sender, **kwargs):
+    bump_versions(sender)
+
+
+for model in (Patient, Room, Inventory, InventoryUsage, Cost, RiskAssessmentHistory):
+    post_save.connect(bump_version, sender=model, dispatch_uid=f'version-save-{model.__name__}')
+    post_delete.connect(bump_version, sender=model, dispatch_uid=f'version-delete-{model.__name__}')
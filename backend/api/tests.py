@@ -1,3 +1,1253 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import joblib
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from sklearn.ensemble import RandomForestClassifier
+
+from .coalescer import MicroBatcher
+from .dataset_cache import read_dataset
+from .features import FEATURE_COLUMNS, FeatureSchemaError, feature_row_error, to_matrix
+from .executor import InferenceExecutor, InferenceUnavailable
+from .import_jobs import fail_stalled_jobs, purge_finished_uploads, run_import_job
+from .importers import SheetError, import_cost_sheet, import_inventory_sheet, sync_inventory
+from .model_format import load_compact, quantize_thresholds, write_compact
+from .model_registry import ModelRegistry, registry
+from .counters import counter_values, reconcile_counters, reconcile_usage_rollup
+from .models import (
+    Cost, DashboardCounter, DashboardCounterSnapshot, ImportJob, Inventory, InventoryUsage, InventoryUsageDaily, Patient,
+    RiskAssessmentHistory, Room,
+)
+from .inference import predict_risk_scores, risk_band
+from .prediction_cache import PredictionCache
+from .scheduling import parse_appointment
+from .versioning import bump_versions
+from .tree_engine import CompiledForest
+
+
+class CompiledForestTests(SimpleTestCase):
+    def assert_parity(self, forest, X):
+        compiled = CompiledForest.from_sklearn(forest)
+        np.testing.assert_allclose(compiled.predict_proba(X), forest.predict_proba(X), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(compiled.predict(X), forest.predict(X))
+
+    def test_matches_sklearn_on_fitted_forest(self):
+        rng = np.random.default_rng(0)
+        X = rng.integers(0, 50, size=(400, 6)).astype(float)
+        y = (X[:, 0] + X[:, 3] > 50).astype(int)
+        forest = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+        self.assert_parity(forest, rng.integers(0, 50, size=(200, 6)).astype(float))
+        self.assert_parity(forest, X[:1])
+
+    def test_matches_sklearn_with_missing_values(self):
+        rng = np.random.default_rng(1)
+        X = rng.normal(size=(300, 4))
+        X[rng.random(X.shape) < 0.1] = np.nan
+        y = (np.nan_to_num(X[:, 1]) > 0).astype(int)
+        forest = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+        self.assert_parity(forest, X)
+
+    def test_matches_bundled_risk_model(self):
+        if not os.path.exists(settings.RISK_MODEL_PATH):
+            self.skipTest('random_forest_model.pkl not available')
+        forest = joblib.load(settings.RISK_MODEL_PATH)
+        rng = np.random.default_rng(2)
+        X = rng.integers(0, 60, size=(500, forest.n_features_in_)).astype(float)
+        X[::5, -1] = np.nan
+        self.assert_parity(forest, X)
+
+    def test_rejects_wrong_feature_count(self):
+        forest = RandomForestClassifier(n_estimators=2, random_state=0).fit([[0, 0], [1, 1]], [0, 1])
+        with self.assertRaises(ValueError):
+            CompiledForest.from_sklearn(forest).predict_proba([[1, 2, 3]])
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'model.pkl')
+        rng = np.random.default_rng(0)
+        self.X = rng.integers(0, 10, size=(100, len(FEATURE_COLUMNS))).astype(float)
+        self.forest = RandomForestClassifier(n_estimators=5, random_state=0).fit(self.X, self.X[:, 0] > 4)
+        joblib.dump(self.forest, self.path)
+
+    def test_loads_lazily_and_reloads_changed_file(self):
+        registry = ModelRegistry(self.path, check_interval=0)
+        self.assertIsNone(registry._current)
+        first = registry.get()
+        swaps = []
+        registry.on_change(swaps.append)
+        self.assertIs(registry.get(), first)
+
+        retrained = RandomForestClassifier(n_estimators=7, random_state=1).fit(self.X, self.X[:, 1] > 4)
+        joblib.dump(retrained, self.path)
+        second = registry.get()
+        self.assertNotEqual(second.version, first.version)
+        self.assertEqual(swaps, [second])
+        self.assertEqual(len(second.model.estimators_), 7)
+        # The previous snapshot stays usable for requests already holding it
+        self.assertEqual(len(first.model.estimators_), 5)
+
+    def test_keeps_serving_when_reload_fails(self):
+        registry = ModelRegistry(self.path, check_interval=0)
+        first = registry.get()
+        with open(self.path, 'wb') as f:
+            f.write(b'truncated')
+        with self.assertLogs('api.model_registry', level='ERROR'):
+            self.assertIs(registry.get(), first)
+
+    def test_rejects_model_trained_on_another_schema(self):
+        registry = ModelRegistry(self.path, check_interval=0)
+        first = registry.get()
+        narrow = RandomForestClassifier(n_estimators=3, random_state=0).fit(self.X[:, :4], self.X[:, 0] > 4)
+        joblib.dump(narrow, self.path)
+        with self.assertLogs('api.model_registry', level='ERROR'):
+            self.assertIs(registry.get(), first)
+
+    def test_backs_off_while_no_model_loads(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'truncated')
+        registry = ModelRegistry(self.path, check_interval=5)
+        with self.assertLogs('api.model_registry', level='ERROR') as logs:
+            self.assertIsNone(registry.get())
+        with mock.patch('api.model_registry.file_sha256') as sha256:
+            # Within the backoff window nothing is stat'ed, hashed or loaded
+            self.assertIsNone(registry.get())
+            # Past it, the unchanged broken file is only stat'ed
+            registry._retry_at = 0
+            self.assertIsNone(registry.get())
+        sha256.assert_not_called()
+        self.assertEqual(len(logs.output), 1)
+        self.assertEqual(registry._failures, 2)
+        self.assertEqual(registry._retry_at - registry._last_check, 10)
+
+        # A replaced file is loaded on the next check, and the backoff resets
+        joblib.dump(self.forest, self.path)
+        registry._retry_at = 0
+        self.assertIsNotNone(registry.get())
+        self.assertEqual(registry._failures, 0)
+
+    def test_compiled_engine_maps_cached_arrays(self):
+        registry = ModelRegistry(self.path, engine='compiled', cache_dir=os.path.join(self.tmp.name, 'cache'))
+        model = registry.get_model()
+        self.assertIsInstance(model, CompiledForest)
+        # Read-only views over the mapped cache file, not private copies
+        self.assertFalse(model.threshold.flags.writeable)
+        self.assertFalse(model.threshold.flags.owndata)
+        np.testing.assert_allclose(model.predict_proba(self.X), self.forest.predict_proba(self.X), atol=1e-12)
+
+
+class PredictionCacheTests(SimpleTestCase):
+    class CountingModel:
+        def __init__(self):
+            self.rows_scored = 0
+
+        def predict_proba(self, X):
+            self.rows_scored += len(X)
+            return np.column_stack([1 - X[:, 0] / 100, X[:, 0] / 100])
+
+    def loaded(self, version='v1'):
+        return SimpleNamespace(model=self.CountingModel(), version=version)
+
+    def test_hits_skip_the_model(self):
+        cache = PredictionCache(maxsize=10, ttl=60)
+        loaded = self.loaded()
+        first = cache.predict_proba(loaded, np.array([[30.0, 1.0], [40.0, np.nan]]))
+        second = cache.predict_proba(loaded, np.array([[40.0, np.nan], [30.0, 1.0], [50.0, 0.0]]))
+        self.assertEqual(loaded.model.rows_scored, 3)
+        np.testing.assert_allclose(second[:2], first[::-1])
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+    def test_keys_include_model_version(self):
+        cache = PredictionCache(maxsize=10, ttl=60)
+        cache.predict_proba(self.loaded('v1'), np.array([[30.0]]))
+        retrained = self.loaded('v2')
+        cache.predict_proba(retrained, np.array([[30.0]]))
+        self.assertEqual(retrained.model.rows_scored, 1)
+
+    def test_evicts_least_recently_used_and_expired_entries(self):
+        cache = PredictionCache(maxsize=2, ttl=60)
+        loaded = self.loaded()
+        for value in (1.0, 2.0, 1.0, 3.0):
+            cache.predict_proba(loaded, np.array([[value]]))
+        self.assertEqual(cache.stats()['size'], 2)
+        cache.predict_proba(loaded, np.array([[2.0]]))
+        self.assertEqual(loaded.model.rows_scored, 4)
+
+        expiring = PredictionCache(maxsize=2, ttl=0)
+        expiring.predict_proba(loaded, np.array([[1.0]]))
+        expiring.predict_proba(loaded, np.array([[1.0]]))
+        self.assertEqual(expiring.hits, 0)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_coalesces_concurrent_rows_into_batches(self):
+        calls = []
+
+        def score_batch(loaded, matrix):
+            calls.append(len(matrix))
+            return np.column_stack([-matrix[:, 0], matrix[:, 0]])
+
+        batcher = MicroBatcher(score_batch, max_wait_ms=50, max_batch_size=8)
+        loaded = SimpleNamespace(version='v1')
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(lambda i: batcher.predict_proba(loaded, [float(i)]), range(20)))
+        self.assertEqual([float(proba[1]) for proba in results], [float(i) for i in range(20)])
+        self.assertEqual(sum(calls), 20)
+        self.assertLess(len(calls), 20)
+        self.assertLessEqual(max(calls), 8)
+
+    def test_propagates_scoring_errors(self):
+        def score_batch(loaded, matrix):
+            raise ValueError('bad input')
+
+        batcher = MicroBatcher(score_batch, max_wait_ms=1)
+        with self.assertLogs('api.coalescer', level='ERROR'), self.assertRaises(ValueError):
+            batcher.predict_proba(SimpleNamespace(version='v1'), [1.0])
+
+    def test_malformed_results_fail_every_caller(self):
+        # A result that does not line up with the batch must fail the callers, not leave them waiting
+        batcher = MicroBatcher(lambda loaded, matrix: np.zeros((len(matrix) + 1, 2)), max_wait_ms=50, max_batch_size=4, timeout=5)
+        loaded = SimpleNamespace(version='v1')
+        with self.assertLogs('api.coalescer', level='ERROR'), ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(batcher.predict_proba, loaded, [float(i)]) for i in range(4)]
+            errors = [future.exception(timeout=2) for future in futures]
+        self.assertTrue(all(isinstance(error, ValueError) for error in errors))
+
+    def test_scores_batches_concurrently(self):
+        # Each batch holds until a second one is being scored alongside it
+        barrier = threading.Barrier(2, timeout=5)
+
+        def score_batch(loaded, matrix):
+            barrier.wait()
+            return np.column_stack([-matrix[:, 0], matrix[:, 0]])
+
+        batcher = MicroBatcher(score_batch, max_wait_ms=1, max_batch_size=1, max_concurrent_batches=2)
+        loaded = SimpleNamespace(version='v1')
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(lambda i: batcher.predict_proba(loaded, [float(i)]), range(2)))
+        self.assertEqual([float(proba[1]) for proba in results], [0.0, 1.0])
+        self.assertEqual(batcher.stats()['batches'], 2)
+
+    def test_times_out_instead_of_waiting_forever(self):
+        release = threading.Event()
+
+        def score_batch(loaded, matrix):
+            release.wait(5)
+            return np.column_stack([1 - matrix[:, 0], matrix[:, 0]])
+
+        batcher = MicroBatcher(score_batch, max_wait_ms=1, timeout=0.1)
+        try:
+            with self.assertRaises(InferenceUnavailable):
+                batcher.predict_proba(SimpleNamespace(version='v1'), [1.0])
+        finally:
+            release.set()
+
+
+class FeaturePipelineTests(SimpleTestCase):
+    def test_completes_derived_columns(self):
+        matrix = to_matrix([
+            [30, 5, 16, None, 1, 0, 1, 0, 1, None],
+            [25, 1, 20, 4, 0, 0, 0, 0, 0, 2],
+        ])
+        # years = age - first_sexual_age; total = hpv + smoking + many partners + early debut
+        np.testing.assert_array_equal(matrix[:, 3], [14, 4])
+        np.testing.assert_array_equal(matrix[:, 9], [4, 2])
+
+    def test_rejects_rows_outside_the_schema(self):
+        with self.assertRaises(FeatureSchemaError):
+            to_matrix([[30, 5, 16]])
+
+    def test_row_values_must_fit_their_column_kind(self):
+        row = [30, 2, 17, 13, 1, 0, 0, 0, 1, None]
+
+        def error(index, value):
+            return feature_row_error(row[:index] + [value] + row[index + 1:])
+
+        self.assertIsNone(feature_row_error(row))
+        self.assertIsNone(error(0, '30'))
+        self.assertIsNone(error(0, 30.0))
+        self.assertIsNone(error(4, True))
+        self.assertEqual(error(0, -3), 'age must be a non-negative integer.')
+        self.assertEqual(error(0, 30.3), 'age must be a non-negative integer.')
+        self.assertEqual(error(0, '30.5'), 'age must be a non-negative integer.')
+        self.assertEqual(error(4, 5), 'hpv_positive must be 0 or 1.')
+        self.assertEqual(error(4, '1.0'), 'hpv_positive must be 0 or 1.')
+        self.assertEqual(error(4, 'yes'), 'hpv_positive must be a number.')
+
+
+def _slow_predict_proba(version, matrix):
+    time.sleep(1)
+
+
+class InferenceExecutorTests(SimpleTestCase):
+    def test_scores_in_worker_processes(self):
+        loaded = registry.get()
+        if loaded is None:
+            self.skipTest('random_forest_model.pkl not available')
+        executor = InferenceExecutor(workers=1, timeout=60)
+        self.addCleanup(executor.shutdown)
+        executor.warm()
+        X = to_matrix([[30, 2, 17, 13, 1, 0, 0, 0, 1, None], [45, 6, 15, 30, 1, 1, 1, 1, 0, 5]])
+        np.testing.assert_allclose(executor.predict_proba(loaded, X), loaded.model.predict_proba(X))
+
+    def test_warm_starts_every_worker(self):
+        executor = InferenceExecutor(workers=2, timeout=60)
+        self.addCleanup(executor.shutdown)
+        self.assertEqual(len(executor.warm()), 2)
+
+    def test_timed_out_call_keeps_its_slot_until_done(self):
+        executor = InferenceExecutor(workers=1, timeout=0.2, max_pending=1, queue_timeout=0)
+        self.addCleanup(executor.shutdown)
+        executor.warm()
+        matrix = np.zeros((1, len(FEATURE_COLUMNS)))
+        with mock.patch('api.executor._predict_proba', _slow_predict_proba):
+            with self.assertRaisesRegex(InferenceUnavailable, 'timed out'):
+                executor.predict_proba(SimpleNamespace(version='v1'), matrix)
+        # The worker is still busy with the abandoned call
+        with self.assertRaisesRegex(InferenceUnavailable, 'capacity'):
+            executor.predict_proba(SimpleNamespace(version='v1'), matrix)
+        self.assertTrue(executor._slots.acquire(timeout=5))
+
+    def test_sheds_load_when_saturated(self):
+        executor = InferenceExecutor(workers=1, max_pending=1, queue_timeout=0)
+        executor._slots.acquire()
+        with self.assertRaises(InferenceUnavailable):
+            executor.predict_proba(SimpleNamespace(version='v1'), np.zeros((1, len(FEATURE_COLUMNS))))
+
+
+class CompactModelFormatTests(SimpleTestCase):
+    def test_round_trip_preserves_predictions(self):
+        rng = np.random.default_rng(3)
+        X = rng.integers(0, 40, size=(400, len(FEATURE_COLUMNS))).astype(float)
+        forest = RandomForestClassifier(n_estimators=15, random_state=0).fit(X, X[:, 0] + X[:, 1] > 40)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.mrf')
+            write_compact(CompiledForest.from_sklearn(forest), path)
+            compact = load_compact(path)
+            # Non-integral inputs too: they must fall on the same side of every split
+            X_test = rng.integers(0, 40, size=(300, len(FEATURE_COLUMNS))) + rng.choice([0, 0.3, 0.5, 0.7], size=(300, 1))
+            np.testing.assert_allclose(compact.predict_proba(X_test), forest.predict_proba(X_test), atol=1e-6)
+            np.testing.assert_array_equal(compact.predict(X_test), forest.predict(X_test))
+            self.assertFalse(compact.threshold.flags.writeable)
+            self.assertEqual(ModelRegistry(path).get_model().n_features_in_, len(FEATURE_COLUMNS))
+
+    def test_float_thresholds_round_down(self):
+        compiled = SimpleNamespace(threshold=np.array([0.1, 2.5, 1 / 3]), feature=np.array([1, 0, 1]))
+        quantized = quantize_thresholds(compiled)
+        self.assertTrue(np.all(quantized.astype(np.float64) <= compiled.threshold))
+        # Exactly representable thresholds are kept as they are, never floored
+        self.assertEqual(quantized[1], 2.5)
+        # Nothing representable in float32 lies between the stored and original threshold
+        above = np.nextafter(quantized, np.float32(np.inf)).astype(np.float64)
+        self.assertTrue(np.all(above > compiled.threshold))
+
+
+class ResourceUtilizationTests(TestCase):
+    def setUp(self):
+        self.inventory = Inventory.objects.create(
+            name='Speculum', category='Equipment', region='Nairobi', available_stock=40, total_stock=100, unit='pcs'
+        )
+
+    def test_usage_rollup_tracks_writes(self):
+        InventoryUsage.objects.create(inventory=self.inventory, used=3)
+        usage = InventoryUsage.objects.create(inventory=self.inventory, used=5)
+        InventoryUsage.objects.create(inventory=self.inventory, used=-20, reason='Restock')
+        daily = InventoryUsageDaily.objects.get(inventory=self.inventory, date=timezone.localdate())
+        self.assertEqual(daily.used, 8)
+        usage.delete()
+        daily.refresh_from_db()
+        self.assertEqual(daily.used, 3)
+
+    def test_usage_rollup_follows_edits_and_rebuilds(self):
+        other = Inventory.objects.create(name='Gloves', category='Supplies', region='Nairobi', available_stock=10)
+        usage = InventoryUsage.objects.create(inventory=self.inventory, used=4)
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+
+        def rollup():
+            rows = InventoryUsageDaily.objects.exclude(used=0).values_list('inventory_id', 'date', 'used')
+            return {(inventory_id, day): used for inventory_id, day, used in rows}
+
+        usage.used = 6
+        usage.save()
+        self.assertEqual(rollup(), {(self.inventory.id, today): 6})
+        usage.inventory = other
+        usage.timestamp -= timedelta(days=1)
+        usage.save()
+        self.assertEqual(rollup(), {(other.id, yesterday): 6})
+        usage.used = -6
+        usage.save(update_fields=['used'])
+        self.assertEqual(rollup(), {})
+
+        # Writes that skip signals drift until reconciled
+        InventoryUsage.objects.filter(pk=usage.pk).update(used=2)
+        self.assertEqual(reconcile_usage_rollup(), {(other.id, yesterday): (0, 2)})
+        self.assertEqual(rollup(), {(other.id, yesterday): 2})
+        self.assertEqual(reconcile_usage_rollup(), {})
+
+    def test_analytics_query_count_is_constant(self):
+        for i in range(5):
+            item = Inventory.objects.create(name=f'Item {i}', category='Supplies', region='Kisumu', available_stock=1)
+            InventoryUsage.objects.create(inventory=item, used=i + 1)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/resource-utilization-analytics/', {'days': 30})
+        self.assertEqual(response.status_code, 200)
+        trends = {row['name']: row['trend'] for row in response.json()}
+        self.assertEqual(len(trends['Item 4']), 30)
+        self.assertEqual(trends['Item 4'][-1], {'date': str(timezone.localdate()), 'used': 5})
+        self.assertEqual(self.client.get('/api/resource-utilization-analytics/', {'days': 0}).status_code, 400)
+
+
+class CostTrendsTests(TestCase):
+    def add_cost(self, amount, days_ago, **fields):
+        cost = Cost.objects.create(treatment='Pap smear', cost=amount, **fields)
+        Cost.objects.filter(pk=cost.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+    def test_series_is_dense_and_single_query(self):
+        self.add_cost(100, 0)
+        self.add_cost(50, 0)
+        self.add_cost(30, 400)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/cost-trends/', {'days': 365})
+        series = response.json()
+        self.assertEqual(len(series), 365)
+        self.assertEqual(series[-1], {'date': str(timezone.localdate()), 'total': 150.0})
+        self.assertEqual(sum(point['total'] for point in series), 150.0)
+
+    def test_grouped_by_region_per_month(self):
+        self.add_cost(100, 0, region='Nairobi')
+        self.add_cost(40, 0, region='Kisumu')
+        self.add_cost(10, 0)
+        # Imports store a missing region as '' rather than NULL
+        self.add_cost(5, 0, region='')
+        series = self.client.get('/api/cost-trends/', {'days': 90, 'granularity': 'month', 'group_by': 'region'}).json()
+        self.assertEqual(series[-1]['date'], str(timezone.localdate().replace(day=1)))
+        self.assertEqual(series[-1]['groups'], {'Kisumu': 40.0, 'Nairobi': 100.0, 'Unspecified': 15.0})
+        self.assertEqual(series[-1]['total'], 155.0)
+        self.assertEqual(self.client.get('/api/cost-trends/', {'group_by': 'treatment'}).status_code, 400)
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def add_patient(self, appointment=''):
+        return Patient.objects.create(name='Jane', age=30, condition='Screening', appointment=appointment, contact='')
+
+    def test_counters_follow_writes(self):
+        today = timezone.localdate()
+        patient = self.add_patient(f'{today} 09:00')
+        counter_values(['patients'])
+        self.add_patient()
+        history = RiskAssessmentHistory.objects.create(patient=patient, risk_score=0.9, recommended_action='')
+        self.assertEqual(counter_values(['patients', 'high_risk_assessments', f'appointments:{today}']), {
+            'patients': 2, 'high_risk_assessments': 1, f'appointments:{today}': 1,
+        })
+        history.risk_score = 0.2
+        history.save()
+        patient = Patient.objects.get(pk=patient.pk)
+        patient.appointment = f'{today + timedelta(days=1)} 09:00'
+        patient.save()
+        Patient.objects.only('id').get(pk=patient.pk).save()
+        self.assertEqual(counter_values(['patients', 'high_risk_assessments', f'appointments:{today}']), {
+            'patients': 2, 'high_risk_assessments': 0, f'appointments:{today}': 0,
+        })
+        patient.delete()
+        self.assertEqual(counter_values(['patients', 'high_risk_assessments']), {'patients': 1, 'high_risk_assessments': 0})
+
+    def test_saves_compare_with_the_stored_row(self):
+        patient = self.add_patient()
+        history = RiskAssessmentHistory.objects.create(patient=patient, risk_score=0.9, recommended_action='')
+        counter_values(['high_risk_assessments'])
+        stale = RiskAssessmentHistory.objects.get(pk=history.pk)
+        history.risk_score = 0.2
+        history.save()
+        stale.risk_score = 0.95
+        stale.save()
+        self.assertEqual(counter_values(['high_risk_assessments'])['high_risk_assessments'], 1)
+        # Saves that leave the tracked fields alone skip the lookup and the adjustment:
+        # only the row update and the version bump (in its savepoint) remain
+        with self.assertNumQueries(4):
+            history.save(update_fields=['recommended_action'])
+
+    def test_reconcile_corrects_bulk_writes(self):
+        counter_values(['inventory_items'])
+        Inventory.objects.bulk_create([
+            Inventory(name=f'Item {i}', category='Supplies', region='Kisumu', available_stock=i) for i in range(3)
+        ])
+        self.assertEqual(counter_values(['inventory_items'])['inventory_items'], 0)
+        self.assertEqual(reconcile_counters()['inventory_items'], (0, 3))
+        self.assertEqual(counter_values(['inventory_items', 'inventory_exhausted']), {
+            'inventory_items': 3, 'inventory_exhausted': 1,
+        })
+        call_command('reconcile_dashboard_counters', stdout=open(os.devnull, 'w'))
+        self.assertEqual(DashboardCounterSnapshot.objects.filter(date=timezone.localdate()).count(), 4)
+
+    def test_stats_report_week_over_week_change(self):
+        for _ in range(3):
+            self.add_patient()
+        week_ago = timezone.localdate() - timedelta(days=7)
+        DashboardCounterSnapshot.objects.create(name='patients', date=week_ago, value=2)
+        self.client.get('/api/dashboard-stats/')
+        with self.assertNumQueries(3):
+            stats = {stat['title']: stat for stat in self.client.get('/api/dashboard-stats/').json()}
+        self.assertEqual(stats['Total Patients']['value'], 3)
+        self.assertEqual(stats['Total Patients']['change'], '+50%')
+        self.assertIsNone(stats['High Risk Cases']['change'])
+        self.assertTrue(DashboardCounter.objects.filter(name='patients').exists())
+
+
+class RiskHistogramTests(TestCase):
+    def setUp(self):
+        patient = Patient.objects.create(name='Jane', age=30, condition='Screening', appointment='', contact='')
+        for score, region in [(0.1, 'Nairobi'), (0.4, 'Nairobi'), (0.55, 'Kisumu'), (0.7, 'Nairobi'), (0.95, 'Kisumu')]:
+            RiskAssessmentHistory.objects.create(patient=patient, risk_score=score, region=region, recommended_action='')
+
+    def test_bins_in_one_query(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/risk-histogram/', {'edges': '0,0.25,0.5,0.75,1'})
+        body = response.json()
+        self.assertEqual([b['count'] for b in body['bins']], [1, 1, 2, 1])
+        self.assertEqual(body['total'], 5)
+        filtered = self.client.get('/api/risk-histogram/', {'region': 'Kisumu', 'start': str(timezone.localdate())})
+        self.assertEqual([b['count'] for b in filtered.json()['bins']], [0, 1, 1])
+        self.assertEqual(self.client.get('/api/risk-histogram/', {'edges': '0.5,0.2'}).status_code, 400)
+        for edges in ('nan,0.5', '0,inf', '-inf,1'):
+            self.assertEqual(self.client.get('/api/risk-histogram/', {'edges': edges}).status_code, 400)
+        self.assertEqual(self.client.get('/api/risk-histogram/', {'end': 'yesterday'}).status_code, 400)
+
+    def test_distribution_keeps_band_boundaries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/risk-distribution/')
+        self.assertEqual(response.json(), {'high': 1, 'medium': 2, 'low': 2})
+
+
+class ScheduleTests(TestCase):
+    def add_patient(self, name, appointment):
+        return Patient.objects.create(name=name, age=30, condition='Screening', appointment=appointment, contact='')
+
+    def test_appointment_strings_are_parsed(self):
+        self.assertEqual(parse_appointment('2025-07-02T17:17'), timezone.make_aware(datetime(2025, 7, 2, 17, 17)))
+        self.assertEqual(parse_appointment('02/07/2025 09:30'), timezone.make_aware(datetime(2025, 7, 2, 9, 30)))
+        self.assertEqual(parse_appointment('2025-07-02'), timezone.make_aware(datetime(2025, 7, 2)))
+        self.assertIsNone(parse_appointment('next week'))
+        self.assertIsNone(parse_appointment('2025-02-30'))
+        patient = self.add_patient('Jane', '2025-07-02T17:17')
+        self.assertEqual(patient.appointment_at, timezone.make_aware(datetime(2025, 7, 2, 17, 17)))
+        patient.appointment = ''
+        patient.save()
+        self.assertIsNone(Patient.objects.get(pk=patient.pk).appointment_at)
+
+    def test_schedule_window_is_sorted(self):
+        self.add_patient('Late', '2025-07-02T17:00')
+        self.add_patient('Early', '2025-07-02T08:00')
+        self.add_patient('Next day', '2025-07-03T08:00')
+        self.add_patient('Unscheduled', '')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/schedule/', {'start': '2025-07-02', 'end': '2025-07-02'})
+        self.assertEqual([p['name'] for p in response.json()['appointments']], ['Early', 'Late'])
+        response = self.client.get('/api/schedule/', {'start': '2025-07-02T12:00', 'end': '2025-07-04'})
+        self.assertEqual([p['name'] for p in response.json()['appointments']], ['Late', 'Next day'])
+        self.assertEqual(self.client.get('/api/schedule/', {'start': '2025-07-03', 'end': '2025-07-01'}).status_code, 400)
+
+
+class ListPaginationTests(TestCase):
+    def setUp(self):
+        scores = [0.9, 0.5, None, 0.5, 0.1, None, 0.5, 0.8]
+        self.patients = [
+            Patient.objects.create(
+                name=f'Patient {i}', age=30, condition='Screening', appointment='', contact='', risk_score=score,
+                risk_level='high' if score and score > 0.7 else 'low', location='Nairobi' if i % 2 else 'Kisumu',
+            )
+            for i, score in enumerate(scores)
+        ]
+
+    def walk(self, url, params, max_pages=20):
+        names, pages = [], 0
+        response = self.client.get(url, params)
+        while pages < max_pages:
+            body = response.json()
+            names += [row.get('name') or row['id'] for row in body['results']]
+            pages += 1
+            if not body['next']:
+                return names, pages
+            response = self.client.get(body['next'])
+        self.fail(f'Pagination did not end after {max_pages} pages.')
+
+    def test_pages_cover_ordering_with_ties_and_nulls(self):
+        expected = [p['name'] for p in self.client.get('/api/patients/', {'ordering': '-risk_score'}).json()]
+        self.assertEqual(expected[:2], ['Patient 0', 'Patient 7'])
+        self.assertEqual(expected[-2:], ['Patient 5', 'Patient 2'])
+        for ordering in ('-risk_score', 'risk_score', 'name', '-id'):
+            full = [p['name'] for p in self.client.get('/api/patients/', {'ordering': ordering}).json()]
+            names, pages = self.walk('/api/patients/', {'ordering': ordering, 'page_size': 3})
+            self.assertEqual(names, full)
+            self.assertEqual(pages, 3)
+
+    def test_filters_and_errors(self):
+        response = self.client.get('/api/patients/', {'location': 'Nairobi', 'min_risk_score': 0.5})
+        self.assertEqual({p['name'] for p in response.json()}, {'Patient 1', 'Patient 3', 'Patient 7'})
+        self.assertEqual(len(self.client.get('/api/patients/', {'risk_level': 'high'}).json()), 2)
+        self.assertEqual(self.client.get('/api/patients/', {'ordering': 'contact'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/patients/', {'cursor': 'bogus'}).status_code, 400)
+        page = self.client.get('/api/patients/', {'page_size': 2, 'ordering': 'name'}).json()
+        self.assertEqual(self.client.get(page['next'].replace('ordering=name', 'ordering=-name')).status_code, 400)
+
+    def test_history_filters_by_band_and_pages_by_timestamp(self):
+        patient = self.patients[0]
+        for score in (0.2, 0.5, 0.75, 0.95):
+            RiskAssessmentHistory.objects.create(patient=patient, risk_score=score, recommended_action='')
+        response = self.client.get('/api/risk-assessment-history/', {'risk_level': 'high'})
+        self.assertEqual(sorted(h['risk_score'] for h in response.json()), [0.75, 0.95])
+        ids, pages = self.walk('/api/risk-assessment-history/', {'page_size': 3})
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(pages, 2)
+
+    def test_history_pages_through_sub_millisecond_timestamps(self):
+        patient = self.patients[0]
+        RiskAssessmentHistory.objects.bulk_create([
+            RiskAssessmentHistory(patient=patient, risk_score=0.5, recommended_action='') for _ in range(10)
+        ])
+        base = timezone.now()
+        for i, history in enumerate(RiskAssessmentHistory.objects.order_by('id')):
+            RiskAssessmentHistory.objects.filter(pk=history.pk).update(timestamp=base + timedelta(microseconds=i * 10))
+        expected = list(RiskAssessmentHistory.objects.order_by('id').values_list('id', flat=True))
+        for ordering in ('timestamp', '-timestamp'):
+            ids, pages = self.walk('/api/risk-assessment-history/', {'page_size': 3, 'ordering': ordering})
+            self.assertEqual(ids, expected if ordering == 'timestamp' else expected[::-1])
+            self.assertEqual(pages, 4)
+
+
+class ListQueryCountTests(TestCase):
+    def add_rows(self, n):
+        for _ in range(n):
+            i = Room.objects.count()
+            patient = Patient.objects.create(name=f'Patient {i}', age=30, condition='Screening', appointment='', contact='')
+            RiskAssessmentHistory.objects.create(patient=patient, risk_score=0.5, recommended_action='')
+            Room.objects.create(name=f'Room {i}', status='occupied', patient=patient)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        for n in (2, 25):
+            self.add_rows(n)
+            # The version stamp lookup for conditional GET, then the list itself
+            with self.assertNumQueries(2):
+                history = self.client.get('/api/risk-assessment-history/').json()
+            with self.assertNumQueries(2):
+                rooms = self.client.get('/api/rooms/').json()
+            with self.assertNumQueries(2):
+                self.client.get('/api/risk-assessment-history/', {'page_size': 5})
+        self.assertEqual(len(history), 27)
+        self.assertEqual(history[0]['patient_name'], 'Patient 26')
+        self.assertEqual(set(rooms[0]['patient']), {'id', 'name', 'age', 'condition', 'risk_level', 'risk_score'})
+
+
+class ConditionalGetTests(TestCase):
+    def add_patient(self, name='Jane'):
+        return Patient.objects.create(name=name, age=30, condition='Screening', appointment='', contact='')
+
+    def test_unchanged_list_answers_304_from_version_lookup(self):
+        patient = self.add_patient()
+        response = self.client.get('/api/patients/')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/patients/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.client.get('/api/patients/', {'location': 'Nairobi'})['ETag'], etag)
+
+        patient.name = 'Janet'
+        patient.save()
+        response = self.client.get('/api/patients/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Janet')
+
+    def test_dependent_resources_and_bulk_writes_change_etags(self):
+        room = Room.objects.create(name='Room 1', patient=self.add_patient())
+        rooms_etag = self.client.get('/api/rooms/')['ETag']
+        self.add_patient('Other')
+        self.assertEqual(self.client.get('/api/rooms/', HTTP_IF_NONE_MATCH=rooms_etag).status_code, 200)
+
+        history_etag = self.client.get('/api/risk-assessment-history/')['ETag']
+        RiskAssessmentHistory.objects.bulk_create([RiskAssessmentHistory(patient=room.patient, risk_score=0.5)])
+        self.assertEqual(self.client.get('/api/risk-assessment-history/', HTTP_IF_NONE_MATCH=history_etag).status_code, 304)
+        bump_versions(RiskAssessmentHistory)
+        self.assertEqual(self.client.get('/api/risk-assessment-history/', HTTP_IF_NONE_MATCH=history_etag).status_code, 200)
+
+    def test_reconcile_changes_etags_of_drifted_resources(self):
+        reconcile_counters()
+        stats_etag = self.client.get('/api/dashboard-stats/')['ETag']
+        Patient.objects.bulk_create([
+            Patient(name=f'Bulk {i}', age=30, condition='Screening', appointment='', contact='') for i in range(3)
+        ])
+        self.assertEqual(self.client.get('/api/dashboard-stats/', HTTP_IF_NONE_MATCH=stats_etag).status_code, 304)
+        reconcile_counters()
+        self.assertEqual(self.client.get('/api/dashboard-stats/', HTTP_IF_NONE_MATCH=stats_etag).status_code, 200)
+        # Nothing drifted, so nothing is bumped
+        stats_etag = self.client.get('/api/dashboard-stats/')['ETag']
+        reconcile_counters()
+        self.assertEqual(self.client.get('/api/dashboard-stats/', HTTP_IF_NONE_MATCH=stats_etag).status_code, 304)
+
+        item = Inventory.objects.create(name='Gloves', category='Supplies', region='Kisumu', available_stock=5)
+        analytics_etag = self.client.get('/api/resource-utilization-analytics/')['ETag']
+        InventoryUsage.objects.bulk_create([InventoryUsage(inventory=item, used=2)])
+        reconcile_usage_rollup()
+        self.assertEqual(
+            self.client.get('/api/resource-utilization-analytics/', HTTP_IF_NONE_MATCH=analytics_etag).status_code, 200
+        )
+
+
+class DashboardBundleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i, score in enumerate([0.95, 0.2, 0.8, None]):
+            Patient.objects.create(
+                name=f'Patient {i}', age=30, condition='Screening', appointment='', contact='', risk_score=score
+            )
+        Inventory.objects.create(name='Speculum', category='Equipment', region='Nairobi', available_stock=5, total_stock=10)
+
+    def test_bundle_is_cached_until_a_write(self):
+        bundle = self.client.get('/api/dashboard/').json()
+        self.assertEqual(bundle['stats'][0]['value'], 4)
+        self.assertEqual([p['name'] for p in bundle['recent_patients']], ['Patient 3', 'Patient 2', 'Patient 1'])
+        self.assertEqual(set(bundle), {'stats', 'risk_distribution', 'resources', 'recent_patients'})
+        self.assertEqual(bundle['resources'][0]['percent_used'], 50.0)
+        self.assertNotIn('trend', bundle['resources'][0])
+        with self.assertNumQueries(1):
+            self.client.get('/api/dashboard/')
+        Patient.objects.create(name='Patient 4', age=30, condition='Screening', appointment='', contact='')
+        self.assertEqual(self.client.get('/api/dashboard/').json()['stats'][0]['value'], 5)
+
+
+class BulkImportTests(TestCase):
+    def inventory_sheet(self, stock):
+        return pd.DataFrame({
+            'Facility': ['Pumwani', 'Kakamega', 'Pumwani', None],
+            'Region': ['Pumwani', 'Kakamega', ' Pumwani ', 'Nairobi'],
+            'Category': ['Medications'] * 4,
+            'Item': ['Ibuprofen 400mg', 'Ibuprofen 400mg', 'Ibuprofen 400mg', None],
+            'Cost (KES)': [1935.254, 4758.5, 'n/a', 10],
+            'Available Stock': [stock, 28, stock + 1, 5],
+        })
+
+    def test_inventory_upsert_counts_and_normalization(self):
+        result = import_inventory_sheet(self.inventory_sheet(94))
+        self.assertEqual((result['created'], result['updated'], result['rows']), (2, 0, 2))
+        self.assertIn('rows_per_sec', result)
+        item = Inventory.objects.get(name='Ibuprofen 400mg', region='Pumwani')
+        # The later duplicate row wins; unparseable cost becomes 0
+        self.assertEqual((item.available_stock, item.total_stock, float(item.cost)), (95, 95, 0.0))
+
+        Inventory.objects.filter(pk=item.pk).update(category='Old')
+        result = import_inventory_sheet(self.inventory_sheet(10))
+        self.assertEqual((result['created'], result['updated']), (0, 2))
+        item.refresh_from_db()
+        self.assertEqual((item.available_stock, item.category), (11, 'Medications'))
+        self.assertEqual(Inventory.objects.count(), 2)
+        self.assertEqual(counter_values(['inventory_items'])['inventory_items'], 2)
+
+    def test_cost_upsert_keys_on_treatment_and_facility(self):
+        sheet = pd.DataFrame({
+            'Facility': ['Pumwani', 'Kakamega', 'Pumwani'],
+            'Service': ['Pap smear', 'Pap smear', ''],
+            'Treatment': [None, None, 'Colposcopy'],
+            'Base Cost (KES)': [1000, 1200, 5000],
+            'NHIF Covered': ['Yes', 'No', 'Yes'],
+        })
+        result = import_cost_sheet(sheet)
+        self.assertEqual((result['created'], result['updated']), (3, 0))
+        sheet.loc[0, 'Base Cost (KES)'] = 1100
+        result = import_cost_sheet(sheet)
+        self.assertEqual((result['created'], result['updated']), (0, 3))
+        self.assertEqual(float(Cost.objects.get(treatment='Pap smear', facility='Pumwani').cost), 1100.0)
+        self.assertTrue(Cost.objects.filter(treatment='Colposcopy').exists())
+
+
+class InventorySyncTests(TestCase):
+    def test_sync_applies_only_the_diff(self):
+        sheet = pd.DataFrame({
+            'Region': ['Pumwani', 'Kakamega', 'Nairobi'],
+            'Item': ['Ibuprofen 400mg', 'Gloves', 'Speculum'],
+            'Available Stock': [10, 20, 30],
+        })
+        result = sync_inventory(sheet)
+        self.assertEqual((result['inserted'], result['updated'], result['deleted'], result['unchanged']), (3, 0, 0, 0))
+        gloves = Inventory.objects.get(name='Gloves')
+        InventoryUsage.objects.create(inventory=gloves, used=5)
+        Inventory.objects.filter(pk=gloves.pk).update(available_stock=15)
+
+        result = sync_inventory(sheet)
+        self.assertEqual((result['inserted'], result['updated'], result['deleted'], result['unchanged']), (0, 0, 0, 3))
+        # An unchanged sheet row is left alone, so local changes since the last sync stand
+        self.assertEqual(Inventory.objects.get(pk=gloves.pk).available_stock, 15)
+
+        sheet = pd.DataFrame({
+            'Region': ['Pumwani', 'Kakamega', 'Kisumu'],
+            'Item': ['Ibuprofen 400mg', 'Gloves', 'Speculum'],
+            'Available Stock': [10, 40, 30],
+        })
+        result = sync_inventory(sheet)
+        self.assertEqual((result['inserted'], result['updated'], result['deleted'], result['unchanged']), (1, 1, 1, 1))
+        gloves.refresh_from_db()
+        self.assertEqual(gloves.available_stock, 40)
+        self.assertEqual(gloves.usages.count(), 1)
+        self.assertEqual(sorted(Inventory.objects.values_list('region', flat=True)), ['Kakamega', 'Kisumu', 'Pumwani'])
+        self.assertEqual(counter_values(['inventory_items'])['inventory_items'], 3)
+
+    def test_deletes_stale_items_in_bulk(self):
+        items = Inventory.objects.bulk_create([
+            Inventory(name=f'Item {i}', category='Supplies', region='Kisumu', available_stock=i) for i in range(50)
+        ])
+        for item in items[:5]:
+            InventoryUsage.objects.create(inventory=item, used=2)
+        sheet = pd.DataFrame({'Region': ['Kisumu'], 'Item': ['Gloves'], 'Available Stock': [1]})
+        # Lookup, insert, three deletes per chunk, version bumps and counter reset: not one query per row
+        with self.assertNumQueries(18):
+            result = sync_inventory(sheet, chunk_size=25)
+        self.assertEqual(result['deleted'], 50)
+        self.assertEqual(list(Inventory.objects.values_list('name', flat=True)), ['Gloves'])
+        self.assertFalse(InventoryUsage.objects.exists())
+        self.assertFalse(InventoryUsageDaily.objects.exists())
+        self.assertEqual(counter_values(['inventory_items'])['inventory_items'], 1)
+
+    def test_empty_sheet_is_refused(self):
+        Inventory.objects.create(name='Gloves', category='Supplies', region='Kisumu', available_stock=1)
+        empty = pd.DataFrame({'Region': [], 'Item': [], 'Available Stock': []})
+        with self.assertRaises(SheetError):
+            sync_inventory(empty)
+        self.assertEqual(Inventory.objects.count(), 1)
+        self.assertEqual(sync_inventory(empty, allow_empty=True)['deleted'], 1)
+        self.assertFalse(Inventory.objects.exists())
+
+    def test_fill_inventory_modes(self):
+        with self.settings(DATASET_CACHE_DIR=None):
+            response = self.client.post('/api/inventory/fill/')
+            self.assertEqual(response.json()['mode'], 'sync')
+            self.assertGreater(response.json()['inserted'], 0)
+            self.assertEqual(self.client.post('/api/inventory/fill/').json()['inserted'], 0)
+            count = Inventory.objects.count()
+            response = self.client.post('/api/inventory/fill/?mode=replace')
+            self.assertEqual(response.json()['count'], count)
+            self.assertEqual(self.client.post('/api/inventory/fill/?mode=merge').status_code, 400)
+
+
+@override_settings(IMPORT_CHUNK_SIZE=2)
+class ImportJobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = self.settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def upload(self, content, name='inventory.csv', kind='inventory'):
+        upload = SimpleUploadedFile(name, content.encode(), content_type='text/csv')
+        return self.client.post('/api/imports/', {'file': upload, 'kind': kind})
+
+    def test_upload_is_queued_then_run_with_progress(self):
+        response = self.upload(
+            "Region,Category,Item,Cost (KES),Available Stock\n"
+            "Pumwani,Medications,Ibuprofen,10,5\n"
+            "Kakamega,Medications,Ibuprofen,12,0\n"
+            "Nairobi,Supplies,,1,1\n"
+            "Nairobi,Supplies,Gloves,1,40\n"
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(Inventory.objects.count(), 0)
+
+        self.assertTrue(run_import_job(job_id))
+        self.assertFalse(run_import_job(job_id))
+        job = self.client.get(f'/api/imports/{job_id}/').json()
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual((job['rows_total'], job['rows_processed']), (4, 4))
+        self.assertEqual((job['created'], job['updated'], job['skipped']), (3, 0, 1))
+        self.assertEqual(job['errors'], [{'row': 4, 'error': 'Missing Item.'}])
+        self.assertIsNotNone(job['rows_per_sec'])
+        self.assertEqual(Inventory.objects.count(), 3)
+
+    def test_uploads_are_deleted_when_jobs_finish(self):
+        def stored(job_id):
+            job = ImportJob.objects.get(pk=job_id)
+            return job.file.name, job.file.storage
+
+        done, failed, stalled, leftover = (self.upload('Item\nGloves\n').json()['id'] for _ in range(4))
+        paths = {job_id: stored(job_id) for job_id in (done, failed, stalled, leftover)}
+        self.assertTrue(all(storage.exists(name) for name, storage in paths.values()))
+
+        run_import_job(done)
+        with mock.patch('api.import_jobs.read_sheet', side_effect=RuntimeError('boom')), \
+                self.assertLogs('api.import_jobs', level='ERROR'):
+            run_import_job(failed)
+        ImportJob.objects.filter(pk=stalled).update(
+            status='running', started_at=timezone.now() - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT + 1)
+        )
+        fail_stalled_jobs()
+        # A finished job whose cleanup never ran is caught by the worker's purge
+        ImportJob.objects.filter(pk=leftover).update(status='failed')
+        self.assertEqual(purge_finished_uploads(), 1)
+
+        for job_id, (name, storage) in paths.items():
+            self.assertFalse(storage.exists(name), job_id)
+            self.assertFalse(ImportJob.objects.get(pk=job_id).file)
+
+    def test_bad_uploads(self):
+        self.assertEqual(self.upload('a,b\n', name='sheet.txt').status_code, 400)
+        self.assertEqual(self.upload('a,b\n', kind='patients').status_code, 400)
+        job_id = self.upload('Region,Stock\nPumwani,1\n').json()['id']
+        run_import_job(job_id)
+        job = ImportJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.errors, [{'row': None, 'error': 'Missing column: Item.'}])
+
+    def test_stalled_jobs_fail(self):
+        job_id = self.upload('Item\nGloves\n').json()['id']
+        ImportJob.objects.filter(pk=job_id).update(
+            status='running', started_at=timezone.now() - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT + 1)
+        )
+        self.assertEqual(fail_stalled_jobs(), 1)
+        self.assertEqual(ImportJob.objects.get(pk=job_id).status, 'failed')
+
+    def test_worker_picks_up_jobs_queued_while_it_was_down(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            first = self.upload('Item,Available Stock\nGloves,1\n').json()['id']
+            second = self.upload('Item,Available Stock\nMasks,2\n').json()['id']
+        # Nothing runs in the web process by default
+        self.assertEqual(callbacks, [])
+        out = io.StringIO()
+        call_command('run_import_jobs', '--once', stdout=out)
+        self.assertIn('Ran 2 import job(s)', out.getvalue())
+        self.assertEqual(
+            set(ImportJob.objects.filter(pk__in=[first, second]).values_list('status', flat=True)), {'succeeded'}
+        )
+
+
+class DatasetCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'sheet.xlsx')
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+
+    def write_sheet(self, stock):
+        pd.DataFrame({'Item': ['Gloves', None], 'Available Stock': [stock, 3], 'Cost (KES)': [1.5, 2.0]}).to_excel(
+            self.path, index=False
+        )
+
+    def test_columns_are_cached_and_memory_mapped(self):
+        self.write_sheet(10)
+        with self.settings(DATASET_CACHE_DIR=self.cache_dir):
+            parsed = read_dataset(self.path)
+            cached = read_dataset(self.path)
+            self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+            self.assertIsInstance(cached['Available Stock'].values, np.memmap)
+            self.assertEqual(cached['Item'].tolist(), parsed['Item'].tolist())
+            self.assertTrue(pd.isna(cached.loc[1, 'Item']))
+            self.assertEqual(cached['Cost (KES)'].tolist(), [1.5, 2.0])
+
+            # A changed file is a new version, and replaces the old one
+            old_entry = os.listdir(self.cache_dir)
+            self.write_sheet(20)
+            os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 10 ** 9))
+            self.assertEqual(read_dataset(self.path).loc[0, 'Available Stock'], 20)
+            self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+            self.assertNotEqual(os.listdir(self.cache_dir), old_entry)
+
+    def test_mixed_columns_read_the_same_cold_and_warm(self):
+        pd.DataFrame({'Code': [1, 'A2', None], 'Stock': [1, 2, 3], 2024: [4, 5, 6]}).to_excel(self.path, index=False)
+        with self.settings(DATASET_CACHE_DIR=self.cache_dir):
+            cold = read_dataset(self.path)
+            warm = read_dataset(self.path)
+        pd.testing.assert_frame_equal(cold, warm)
+        self.assertEqual(cold['Code'].tolist()[:2], ['1', 'A2'])
+        # Header labels keep their type, as with an uncached read
+        pd.testing.assert_index_equal(warm.columns, pd.read_excel(self.path).columns)
+        self.assertEqual(warm[2024].tolist(), [4, 5, 6])
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class HistoryExportTests(TestCase):
+    def setUp(self):
+        patient = Patient.objects.create(name='Amina', age=40, condition='Screening', appointment='', contact='')
+        for i, region in enumerate(['Nairobi', 'Kisumu', 'Nairobi', 'Nairobi', 'Kisumu']):
+            RiskAssessmentHistory.objects.create(
+                patient=patient, risk_score=i / 10, recommended_action='Routine', region=region, cost='12.50'
+            )
+
+    def test_csv_streams_every_row(self):
+        response = self.client.get('/api/risk-assessment-history/export.csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['patient_name'], 'Amina')
+        self.assertEqual([row['risk_score'] for row in rows], ['0.0', '0.1', '0.2', '0.3', '0.4'])
+        self.assertEqual(rows[0]['cost'], '12.50')
+
+    def test_ndjson_with_filters(self):
+        today = timezone.localdate()
+        response = self.client.get('/api/risk-assessment-history/export.ndjson', {'region': 'Nairobi', 'start': str(today)})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['region'] for row in rows], ['Nairobi'] * 3)
+        response = self.client.get('/api/risk-assessment-history/export.ndjson', {'start': str(today + timedelta(days=1))})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+        self.assertEqual(self.client.get('/api/risk-assessment-history/export.csv', {'end': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/risk-assessment-history/export.xml').status_code, 404)
+
+
+class PatientBulkTests(TestCase):
+    def patient(self, name, **fields):
+        return {'name': name, 'age': 35, 'condition': 'Screening', 'appointment': '05/11/2026 10:00', 'contact': '0700', **fields}
+
+    def test_creates_and_updates_with_per_row_errors(self):
+        existing = Patient.objects.create(name='Wanjiru', age=50, condition='Follow-up', appointment='', contact='0711')
+        counter_values(['patients'])
+        response = self.client.post('/api/patients/bulk/', {'patients': [
+            self.patient('Amina', appointment='03/11/2026 09:00'),
+            {'name': 'No age'},
+            self.patient('Wanjiru', id=existing.pk, location='Kisumu'),
+            self.patient('Ghost', id=existing.pk + 100),
+            self.patient('Zawadi'),
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['updated'], body['scored']), (2, 1, 0))
+        self.assertEqual([error['index'] for error in body['errors']], [1, 3])
+        self.assertIn('age', body['errors'][0]['errors'])
+        self.assertEqual([row['status'] for row in body['results']], ['created', 'updated', 'created'])
+
+        amina = Patient.objects.get(name='Amina')
+        self.assertEqual(amina.appointment_at, parse_appointment('03/11/2026 09:00'))
+        existing.refresh_from_db()
+        self.assertEqual((existing.location, existing.age, existing.condition), ('Kisumu', 35, 'Screening'))
+        self.assertEqual(counter_values(['patients'])['patients'], 3)
+
+    def test_scores_rows_with_features_in_one_batch(self):
+        if registry.get() is None:
+            self.skipTest('random_forest_model.pkl not available')
+        features = [[30, 2, 17, 13, 1, 0, 0, 0, 1, None], [45, 6, 15, 30, 1, 1, 1, 1, 0, 5]]
+        response = self.client.post('/api/patients/bulk/', {'score': True, 'patients': [
+            self.patient('Amina', features=features[0], region='Nairobi'),
+            self.patient('Zawadi', features=features[1]),
+            self.patient('Unscored'),
+            self.patient('Short', features=[1, 2]),
+        ]}, content_type='application/json')
+        body = response.json()
+        self.assertEqual((body['created'], body['scored']), (3, 2))
+        self.assertEqual(body['errors'][0]['index'], 3)
+        expected = predict_risk_scores(registry.get(), features)
+        amina = Patient.objects.get(name='Amina')
+        self.assertAlmostEqual(amina.risk_score, float(expected[0]))
+        self.assertEqual(amina.risk_assessments.get().region, 'Nairobi')
+        self.assertIsNone(Patient.objects.get(name='Unscored').risk_score)
+
+    def test_malformed_rows_are_reported_without_failing_the_batch(self):
+        existing = Patient.objects.create(name='Wanjiru', age=50, condition='Follow-up', appointment='', contact='0711')
+        other = Patient.objects.create(name='Akinyi', age=41, condition='Follow-up', appointment='', contact='0712')
+        response = self.client.post('/api/patients/bulk/', {'score': True, 'patients': [
+            self.patient('Bad features', features=['x'] * len(FEATURE_COLUMNS)),
+            self.patient('Infinite', features=['inf'] + [0] * (len(FEATURE_COLUMNS) - 1)),
+            self.patient('Bad id', id='abc'),
+            self.patient('String id', id=str(existing.pk), location='Kisumu'),
+            self.patient('Twice', id=other.pk),
+            self.patient('Twice again', id=other.pk),
+            'not an object',
+            self.patient('Valid'),
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual([error['index'] for error in body['errors']], [0, 1, 2, 4, 5, 6])
+        self.assertIn('features', body['errors'][0]['errors'])
+        self.assertIn('id', body['errors'][2]['errors'])
+        self.assertEqual(body['errors'][3]['errors'], {'id': ['Duplicate id in this batch.']})
+        self.assertEqual([(row['index'], row['status']) for row in body['results']], [(3, 'updated'), (7, 'created')])
+        existing.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((existing.name, existing.location), ('String id', 'Kisumu'))
+        self.assertEqual(other.name, 'Akinyi')
+
+    def test_out_of_domain_features_fail_only_their_row(self):
+        if registry.get() is None:
+            self.skipTest('random_forest_model.pkl not available')
+        valid = [30, 2, 17, 13, 1, 0, 0, 0, 1, None]
+        response = self.client.post('/api/patients/bulk/', {'score': True, 'patients': [
+            self.patient('HPV five', features=valid[:4] + [5] + valid[5:]),
+            self.patient('Negative age', features=[-3] + valid[1:]),
+            self.patient('Fractional age', features=['30.5'] + valid[1:]),
+            self.patient('Valid', features=valid),
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual([error['index'] for error in body['errors']], [0, 1, 2])
+        self.assertEqual(body['errors'][0]['errors'], {'features': ['hpv_positive must be 0 or 1.']})
+        self.assertEqual((body['created'], body['scored']), (1, 1))
+        self.assertEqual(RiskAssessmentHistory.objects.get().age, 30)
+
+    def test_rejects_non_list(self):
+        response = self.client.post('/api/patients/bulk/', {'patients': {}}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchScoringTests(TestCase):
+    features = [[30, 2, 17, 13, 1, 0, 0, 0, 1, None], [45, 6, 15, 30, 1, 1, 1, 1, 0, 5]]
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('nurse', password='x'))
+        self.patients = [
+            Patient.objects.create(name=name, age=35, condition='Screening', appointment='', contact='')
+            for name in ('Amina', 'Zawadi')
+        ]
+
+    def post(self, url, payload):
+        return self.client.post(url, payload, content_type='application/json')
+
+    def require_model(self):
+        if registry.get() is None:
+            self.skipTest('random_forest_model.pkl not available')
+
+    def test_assessment_batch_scores_and_records_history(self):
+        self.require_model()
+        response = self.post('/api/risk_assessment/batch/', {'assessments': [
+            {'patient_id': self.patients[0].pk, 'features': self.features[0], 'region': 'Nairobi'},
+            {'patient_id': str(self.patients[1].pk), 'features': self.features[1]},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        expected = predict_risk_scores(registry.get(), self.features)
+        self.assertEqual([row['risk_score'] for row in response.json()], [float(score) for score in expected])
+        self.assertEqual(RiskAssessmentHistory.objects.count(), 2)
+        # Without features, a patient is rescored on the latest assessment
+        response = self.post('/api/risk_assessment/batch/', {'assessments': [{'patient_id': self.patients[0].pk}]})
+        self.assertAlmostEqual(response.json()[0]['risk_score'], float(expected[0]))
+
+    def test_assessment_batch_reports_malformed_items(self):
+        response = self.post('/api/risk_assessment/batch/', {'assessments': [
+            'not an object',
+            {'patient_id': 'abc', 'features': self.features[0]},
+            {'patient_id': self.patients[0].pk + 100, 'features': self.features[0]},
+            {'patient_id': self.patients[0].pk, 'features': 5},
+            {'patient_id': self.patients[0].pk, 'features': ['x'] * len(FEATURE_COLUMNS)},
+            {'patient_id': self.patients[1].pk},
+            {'features': self.features[0]},
+            {'patient_id': self.patients[0].pk, 'features': [-3] + self.features[0][1:]},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        errors = [error['error'] for error in response.json()['errors']]
+        self.assertEqual(errors[:3], ['Each assessment must be an object.', 'patient_id must be an integer.', 'Patient not found.'])
+        self.assertEqual([error['index'] for error in response.json()['errors']], list(range(8)))
+        self.assertEqual(RiskAssessmentHistory.objects.count(), 0)
+
+    def test_single_assessment_rejects_malformed_input(self):
+        patient_id = self.patients[0].pk
+        cases = [
+            ({'patient_id': 'abc', 'features': self.features[0]}, 'patient_id must be an integer.'),
+            ({'patient_id': patient_id, 'features': self.features[0][:4]}, f'Expected a list of {len(FEATURE_COLUMNS)} features.'),
+            ({'patient_id': patient_id, 'features': 5}, f'Expected a list of {len(FEATURE_COLUMNS)} features.'),
+            ({'patient_id': patient_id, 'features': ['x'] * len(FEATURE_COLUMNS)}, f'{FEATURE_COLUMNS[0]} must be a number.'),
+            ({'patient_id': patient_id, 'features': [-3] + self.features[0][1:]}, 'age must be a non-negative integer.'),
+            ({'patient_id': patient_id, 'features': self.features[0][:4] + [3] + self.features[0][5:]}, 'hpv_positive must be 0 or 1.'),
+        ]
+        for payload, error in cases:
+            response = self.post('/api/risk_assessment/', payload)
+            self.assertEqual(response.status_code, 400, payload)
+            self.assertEqual(response.json(), {'error': error})
+        self.assertEqual(RiskAssessmentHistory.objects.count(), 0)
+        self.patients[0].refresh_from_db()
+        self.assertIsNone(self.patients[0].risk_score)
+
+    def test_predict_rejects_malformed_features(self):
+        response = self.post('/api/predict/', {'features': [1, 2]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': f'Expected a list of {len(FEATURE_COLUMNS)} features.'})
+        response = self.post('/api/predict/', {'features': self.features[0][:4] + [3] + self.features[0][5:]})
+        self.assertEqual(response.json(), {'error': 'hpv_positive must be 0 or 1.'})
+
+    def test_predict_batch(self):
+        self.require_model()
+        response = self.post('/api/predict/batch/', {'features': self.features})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['predictions']), 2)
+        RiskAssessmentHistory.objects.create(
+            patient=self.patients[0], risk_score=0.5, recommended_action='', **dict(zip(FEATURE_COLUMNS, self.features[0]))
+        )
+        response = self.post('/api/predict/batch/', {'patient_ids': [str(self.patients[0].pk)]})
+        self.assertEqual(response.json()['predictions'][0]['patient_id'], self.patients[0].pk)
+
+    def test_predict_batch_rejects_malformed_payloads(self):
+        cases = [
+            {'patient_ids': ['abc']},
+            {'patient_ids': [self.patients[1].pk]},
+            {'features': self.features[0]},
+            {'features': [['x'] * len(FEATURE_COLUMNS)]},
+            {'features': self.features, 'patient_ids': [self.patients[0].pk]},
+        ]
+        for payload in cases:
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post('/api/predict/batch/', payload).status_code, 400)
+
+
+class RescorePatientsCommandTests(TransactionTestCase):
+    # Transactional so the --workers threads, on their own connections, see the rows
+    features = [[30, 2, 17, 13, 1, 0, 0, 0, 1, None], [45, 6, 15, 30, 1, 1, 1, 1, 0, 5], [25, 1, 19, 6, 0, 0, 0, 0, 1, 0]]
+
+    def setUp(self):
+        if registry.get() is None:
+            self.skipTest('random_forest_model.pkl not available')
+        self.patients = []
+        for i, features in enumerate(self.features):
+            patient = Patient.objects.create(name=f'Patient {i}', age=30, condition='Screening', appointment='', contact='')
+            # An older assessment the rescore must ignore
+            RiskAssessmentHistory.objects.create(
+                patient=patient, risk_score=0.01, recommended_action='', **dict(zip(FEATURE_COLUMNS, self.features[-1 - i]))
+            )
+            RiskAssessmentHistory.objects.create(
+                patient=patient, risk_score=0.01, recommended_action='', **dict(zip(FEATURE_COLUMNS, features))
+            )
+            self.patients.append(patient)
+        self.unassessed = Patient.objects.create(name='New', age=30, condition='Screening', appointment='', contact='')
+
+    def assert_rescored(self, *args):
+        out = io.StringIO()
+        call_command('rescore_patients', *args, stdout=out)
+        self.assertIn('Rescored 3 patients', out.getvalue())
+        expected = predict_risk_scores(registry.get(), self.features)
+        for patient, risk_score in zip(self.patients, expected):
+            patient.refresh_from_db()
+            self.assertAlmostEqual(patient.risk_score, float(risk_score))
+            self.assertEqual(patient.risk_level, risk_band(float(risk_score))[0])
+        self.unassessed.refresh_from_db()
+        self.assertIsNone(self.unassessed.risk_score)
+        # Scores are written to the patients only; the history is left as it was
+        self.assertEqual(RiskAssessmentHistory.objects.count(), 6)
+        self.assertEqual(set(RiskAssessmentHistory.objects.values_list('risk_score', flat=True)), {0.01})
+        Patient.objects.update(risk_score=None, risk_level=None)
+
+    def test_serial(self):
+        self.assert_rescored()
+
+    def test_with_workers(self):
+        self.assert_rescored('--workers', '3', '--chunk-size', '1')
+
+    def test_dry_run_writes_nothing(self):
+        call_command('rescore_patients', '--dry-run', stdout=io.StringIO())
+        self.assertFalse(Patient.objects.filter(risk_score__isnull=False).exists())
@@ -0,0 +1,96 @@
+import numpy as np
+
+
+class CompiledForest:
+    """
+    Array-backed evaluator for a fitted scikit-learn random forest.
+
+    Every tree is flattened once into shared contiguous arrays (split feature,
+    threshold, left/right child and per-leaf class probabilities), so a
+    prediction is a handful of vectorized NumPy steps over all trees at once
+    instead of a trip through the estimator's per-call validation and
+    per-tree dispatch. predict/predict_proba mirror the sklearn signatures,
+    so an instance can stand in for the loaded model.
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, max_depth, classes, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features
+
+    def __setstate__(self, state):
+        # Arrays loaded with joblib's mmap_mode come back as np.memmap; plain
+        # ndarray views over the same mapped pages skip the subclass overhead
+        # on every indexing step of the traversal
+        self.__dict__.update({
+            name: value.view(np.ndarray) if isinstance(value, np.memmap) else value
+            for name, value in state.items()
+        })
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(offset, offset + n_nodes)
+            is_leaf = tree.children_left == -1
+            # Leaves point at themselves so rows that reach a leaf early stay put
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            missing_go_to_left = getattr(tree, 'missing_go_to_left', None)
+            if missing_go_to_left is None:
+                missing_go_to_left = np.zeros(n_nodes, dtype=bool)
+            missing.append(np.asarray(missing_go_to_left, dtype=bool))
+            # Normalize counts/weights to the per-tree class probabilities sklearn averages
+            value = tree.value[:, 0, :]
+            totals = value.sum(axis=1, keepdims=True)
+            values.append(np.divide(value, totals, out=np.zeros_like(value), where=totals > 0))
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            missing_left=np.ascontiguousarray(np.concatenate(missing)),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=np.asarray(forest.classes_),
+            n_features=forest.n_features_in_,
+        )
+
+    def apply(self, X):
+        """Leaf index reached in every tree, shape (n_rows, n_trees)."""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features_in_} features.")
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.roots.shape[0])).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = np.where(np.isnan(x), self.missing_left[nodes], x <= self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
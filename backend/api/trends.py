@@ -0,0 +1,101 @@
+"""
+Time-bucketed totals computed in a single GROUP BY.
+
+The database truncates timestamps to day, week (Monday) or month and sums per
+bucket (and optionally per group); the buckets with no rows are filled with
+zeros here, so the series is dense however long the window is.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import DateField, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+GRANULARITIES = ('day', 'week', 'month')
+UNSPECIFIED_GROUP = 'Unspecified'
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day, granularity):
+    if granularity == 'week':
+        return day + timedelta(days=7)
+    if granularity == 'month':
+        return (day + timedelta(days=32)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def bucket_range(start, end, granularity):
+    """Every bucket start from the one containing `start` to the one containing `end`."""
+    day = bucket_start(start, granularity)
+    buckets = []
+    while day <= end:
+        buckets.append(day)
+        day = next_bucket(day, granularity)
+    return buckets
+
+
+def day_start(day):
+    """Aware datetime at local midnight starting `day`."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _truncate(field, granularity):
+    if granularity == 'week':
+        return TruncWeek(field, output_field=DateField())
+    if granularity == 'month':
+        return TruncMonth(field, output_field=DateField())
+    return TruncDate(field)
+
+
+def time_series(queryset, date_field, value_field, days, granularity='day', group_by=None, today=None):
+    """
+    Dense series of {'date', 'total'} for the last `days` days ending today,
+    bucketed by `granularity`. With `group_by`, each point also carries
+    'groups': {group value: total} covering every group seen in the window.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}.")
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    # A plain timestamp range (rather than __date lookups) lets the index on date_field apply
+    queryset = queryset.filter(**{
+        f'{date_field}__gte': day_start(start),
+        f'{date_field}__lt': day_start(today + timedelta(days=1)),
+    })
+    queryset = queryset.annotate(bucket=_truncate(date_field, granularity))
+    keys = ['bucket']
+    if group_by:
+        # Older rows leave the group NULL where imports store '': both are one "Unspecified" group
+        queryset = queryset.annotate(group=Coalesce(group_by, Value('')))
+        keys.append('group')
+    rows = (
+        queryset
+        .values(*keys)
+        .annotate(total=Sum(value_field))
+        .order_by()
+    )
+
+    totals = {}
+    groups = set()
+    for row in rows:
+        group = (row['group'] or UNSPECIFIED_GROUP) if group_by else None
+        groups.add(group)
+        totals[(row['bucket'], group)] = float(row['total'] or 0)
+
+    series = []
+    for bucket in bucket_range(start, today, granularity):
+        point = {'date': str(bucket)}
+        if group_by:
+            point['groups'] = {group: totals.get((bucket, group), 0.0) for group in sorted(groups)}
+            point['total'] = sum(point['groups'].values())
+        else:
+            point['total'] = totals.get((bucket, None), 0.0)
+        series.append(point)
+    return series
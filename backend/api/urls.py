@@ -1,14 +1,20 @@
 from django.urls import path
-from .views import PredictView, PatientListCreateView, DashboardStatsView, PatientRetrieveUpdateDestroyView, RiskDistributionView, ResourceUtilizationView, ResourceUtilizationAnalyticsView, UserRegistrationView, RoomListCreateView, RoomRetrieveUpdateDestroyView, InventoryListCreateView, InventoryRetrieveUpdateDestroyView, CostListCreateView, CostRetrieveUpdateDestroyView, RiskAssessmentHistoryListCreateView, RiskAssessmentHistoryRetrieveView, fill_inventory, risk_assessment, import_resources, import_costs, CostTrendsView, chatbot
+from .views import PredictView, PredictBatchView, ModelStatusView, PatientListCreateView, PatientBulkView, DashboardStatsView, DashboardView, PatientRetrieveUpdateDestroyView, RiskDistributionView, RiskHistogramView, ScheduleView, ResourceUtilizationView, ResourceUtilizationAnalyticsView, UserRegistrationView, RoomListCreateView, RoomRetrieveUpdateDestroyView, InventoryListCreateView, InventoryRetrieveUpdateDestroyView, CostListCreateView, CostRetrieveUpdateDestroyView, RiskAssessmentHistoryListCreateView, RiskAssessmentHistoryRetrieveView, RiskAssessmentHistoryExportView, fill_inventory, risk_assessment, risk_assessment_batch, import_resources, import_costs, ImportJobListCreateView, ImportJobRetrieveView, CostTrendsView, chatbot
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 urlpatterns = [
     path('predict/', PredictView.as_view(), name='predict'),
+    path('predict/batch/', PredictBatchView.as_view(), name='predict-batch'),
+    path('model-status/', ModelStatusView.as_view(), name='model-status'),
     path('patients/', PatientListCreateView.as_view(), name='patients'),
+    path('patients/bulk/', PatientBulkView.as_view(), name='patients-bulk'),
     path('patients/<int:pk>/', PatientRetrieveUpdateDestroyView.as_view(), name='patient-detail'),
     path('dashboard-stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
     path('risk-distribution/', RiskDistributionView.as_view(), name='risk-distribution'),
+    path('risk-histogram/', RiskHistogramView.as_view(), name='risk-histogram'),
+    path('schedule/', ScheduleView.as_view(), name='schedule'),
     path('resource-utilization/', ResourceUtilizationView.as_view(), name='resource-utilization'),
     path('resource-utilization-analytics/', ResourceUtilizationAnalyticsView.as_view(), name='resource-utilization-analytics'),
     path('register/', UserRegistrationView.as_view(), name='register'),
@@ -22,11 +28,15 @@ urlpatterns = [
     path('costs/', CostListCreateView.as_view(), name='cost-list-create'),
     path('costs/<int:pk>/', CostRetrieveUpdateDestroyView.as_view(), name='cost-detail'),
     path('risk-assessment-history/', RiskAssessmentHistoryListCreateView.as_view(), name='risk-assessment-history-list-create'),
+    path('risk-assessment-history/export.<slug:file_format>', RiskAssessmentHistoryExportView.as_view(), name='risk-assessment-history-export'),
     path('risk-assessment-history/<int:pk>/', RiskAssessmentHistoryRetrieveView.as_view(), name='risk-assessment-history-detail'),
     path('inventory/fill/', fill_inventory, name='inventory-fill'),
     path('risk_assessment/', risk_assessment, name='risk_assessment'),
+    path('risk_assessment/batch/', risk_assessment_batch, name='risk_assessment_batch'),
     path('import-resources/', import_resources, name='import-resources'),
     path('import-costs/', import_costs, name='import-costs'),
+    path('imports/', ImportJobListCreateView.as_view(), name='import-job-list-create'),
+    path('imports/<int:pk>/', ImportJobRetrieveView.as_view(), name='import-job-detail'),
     path('cost-trends/', CostTrendsView.as_view(), name='cost-trends'),
     path('chatbot/', chatbot, name='chatbot'),
 ] 
\ No newline at end of file
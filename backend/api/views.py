@@ -1,62 +1,273 @@
+import logging
+from collections import Counter
+
 from django.shortcuts import render
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-import joblib
 import os
 from django.conf import settings
-import numpy as np
-from .models import Patient, Room, Inventory, Cost, RiskAssessmentHistory
-from .serializers import PatientSerializer, RoomSerializer, UserRegistrationSerializer, InventorySerializer, CostSerializer, RiskAssessmentHistorySerializer
+from .models import Patient, Room, Inventory, Cost, RiskAssessmentHistory, InventoryUsageDaily, ImportJob
+from .serializers import PatientSerializer, PatientSummarySerializer, RoomPatientSerializer, RoomSerializer, UserRegistrationSerializer, PatientBulkSerializer, InventorySerializer, CostSerializer, RiskAssessmentHistorySerializer, ImportJobSerializer
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
-import pandas as pd
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
-from django.db.models import Sum
+from django.db import transaction
+from django.core.cache import cache
+from django.utils.decorators import method_decorator
 from rest_framework_simplejwt.tokens import RefreshToken
-
-MODEL_PATH = os.path.join(settings.BASE_DIR, '../src/Code Her Care Datasets /random_forest_model.pkl')
-
-# Load the model once at startup
-try:
-    model = joblib.load(MODEL_PATH)
-except Exception as e:
-    model = None
-    print(f"Error loading model: {e}")
+from .model_registry import registry as model_registry
+from .features import FEATURE_COLUMNS, feature_row_error, latest_patient_features, latest_patient_matrix
+from .executor import InferenceUnavailable
+from .trends import GRANULARITIES, time_series
+from .scheduling import day_window, parse_appointment, parse_window_bound
+from .distribution import RISK_BAND_EDGES, filter_assessments, parse_edges, risk_band_counts, risk_histogram, risk_level_filter
+from .pagination import KeysetOrderingMixin, KeysetPagination
+from .versioning import bump_versions, conditional_get
+from .importers import IMPORTERS, SheetError, import_cost_sheet, import_inventory_sheet, normalize_inventory_sheet, sync_inventory
+from .import_jobs import enqueue, fail_stalled_jobs
+from .dataset_cache import read_dataset
+from .exports import EXPORT_CONTENT_TYPES, EXPORT_STREAMS
+from .counters import SNAPSHOT_COUNTERS, adjust_counters, appointments_counter, counter_values, ensure_daily_snapshot, forget_counters, snapshot_values
+from .inference import HIGH_RISK_THRESHOLD, micro_batcher, predict_risk_levels, predict_risk_scores, prediction_action, prediction_cache, risk_band
+
+logger = logging.getLogger(__name__)
 
 class PredictView(APIView):
     def post(self, request):
-        # Expecting JSON with patient features as a list or dict
+        # Expecting JSON with patient features as a list in model order
         data = request.data.get('features')
         if not data:
             return Response({'error': 'No features provided.'}, status=status.HTTP_400_BAD_REQUEST)
+        if feature_row_error(data):
+            return Response({'error': feature_row_error(data)}, status=status.HTTP_400_BAD_REQUEST)
+        loaded = model_registry.get()
+        if loaded is None:
+            return Response({'error': 'Risk model is not available.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         try:
-            # Convert to numpy array and reshape for single prediction
-            features = np.array(data).reshape(1, -1)
-            prediction = model.predict(features)
-            risk_level = int(prediction[0])
-            # Map risk level to recommended action (customize as needed)
-            if risk_level == 2:
-                recommended_action = "HPV DNA"
-            elif risk_level == 1:
-                recommended_action = "PAP SMEAR"
-            else:
-                recommended_action = "Routine Follow-up"
+            risk_level = int(predict_risk_levels(loaded, [data])[0])
             return Response({
                 'prediction': risk_level,
-                'recommended_action': recommended_action
+                'recommended_action': prediction_action(risk_level)
             })
+        except InferenceUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class PatientListCreateView(ListCreateAPIView):
+class PredictBatchView(APIView):
+    """
+    Expects JSON with either "features": [[...], [...]] or "patient_ids": [...].
+    Patient IDs are scored on the features of their latest risk assessment.
+    All rows are predicted in a single model call.
+    """
+    def post(self, request):
+        features = request.data.get('features')
+        patient_ids = request.data.get('patient_ids')
+        if not features and not patient_ids:
+            return Response({'error': 'features or patient_ids must be provided.'}, status=status.HTTP_400_BAD_REQUEST)
+        if features and patient_ids:
+            return Response({'error': 'Send either features or patient_ids, not both.'}, status=status.HTTP_400_BAD_REQUEST)
+        rows = features or patient_ids
+        if not isinstance(rows, list):
+            return Response({'error': 'features and patient_ids must be lists.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.RISK_BATCH_MAX_SIZE:
+            return Response({'error': f'At most {settings.RISK_BATCH_MAX_SIZE} rows per batch.'}, status=status.HTTP_400_BAD_REQUEST)
+        if features:
+            errors = [{'index': i, 'error': error} for i, error in enumerate(map(feature_row_error, features)) if error]
+            if errors:
+                return Response({'error': 'Invalid feature rows.', 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            patient_ids = [parse_pk(pid) for pid in rows]
+            invalid = [pid for pid, parsed in zip(rows, patient_ids) if parsed is None]
+            if invalid:
+                return Response({'error': 'patient_ids must be integers.', 'patient_ids': invalid}, status=status.HTTP_400_BAD_REQUEST)
+            ids, matrix = latest_patient_matrix(patient_ids)
+            index = {pid: i for i, pid in enumerate(ids)}
+            missing = [pid for pid in patient_ids if pid not in index]
+            if missing:
+                return Response({'error': 'No risk assessment found for patients.', 'patient_ids': missing}, status=status.HTTP_400_BAD_REQUEST)
+            rows = matrix[[index[pid] for pid in patient_ids]]
+        loaded = model_registry.get()
+        if loaded is None:
+            return Response({'error': 'Risk model is not available.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        try:
+            levels = predict_risk_levels(loaded, rows)
+        except InferenceUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        predictions = []
+        for i, risk_level in enumerate(levels):
+            item = {'prediction': int(risk_level), 'recommended_action': prediction_action(risk_level)}
+            if patient_ids:
+                item['patient_id'] = patient_ids[i]
+            predictions.append(item)
+        return Response({'predictions': predictions})
+
+class ModelStatusView(APIView):
+    def get(self, request):
+        loaded = model_registry.get()
+        if loaded is None:
+            return Response({'error': 'Risk model is not available.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        data = {**loaded.as_dict(), 'prediction_cache': prediction_cache.stats()}
+        if micro_batcher is not None:
+            data['micro_batcher'] = micro_batcher.stats()
+        return Response(data)
+
+def score_range(params):
+    """min_risk_score / max_risk_score query params as a filter dict; raises ValueError."""
+    filters = {}
+    for param, lookup in (('min_risk_score', 'risk_score__gte'), ('max_risk_score', 'risk_score__lte')):
+        if params.get(param):
+            try:
+                filters[lookup] = float(params[param])
+            except ValueError:
+                raise ValueError(f"{param} must be a number.")
+    return filters
+
+@method_decorator(conditional_get('patient'), name='dispatch')
+class PatientListCreateView(KeysetOrderingMixin, ListCreateAPIView):
+    """
+    Filters: risk_level, location, min_risk_score, max_risk_score. Ordering:
+    ?ordering= id, name, risk_score or appointment_at. Send ?page_size= or
+    ?cursor= for keyset pages ({'next', 'results'}); otherwise the full list.
+    """
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
+    pagination_class = KeysetPagination
+    ordering_fields = ('id', 'name', 'risk_score', 'appointment_at')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        for field in ('risk_level', 'location'):
+            if params.get(field):
+                queryset = queryset.filter(**{field: params[field]})
+        try:
+            queryset = queryset.filter(**score_range(params))
+        except ValueError as e:
+            raise ValidationError({'error': str(e)})
+        return self.order_queryset(queryset)
 
+class PatientBulkView(APIView):
+    """
+    Expects JSON: {
+        "patients": [
+            {
+                ...patient fields,
+                "id": int (optional; updates that patient instead of creating one),
+                "features": [list of risk factor values in model order] (optional),
+                "region": str (optional),
+                "screening_type": str (optional)
+            },
+            ...
+        ],
+        "score": bool (optional)
+    }
+    Valid rows are written with bulk_create/bulk_update in one transaction;
+    invalid rows are reported by index and skipped. With "score", rows that
+    carry features are scored in one predict_proba call and get their
+    initial risk assessment.
+    """
+    def post(self, request):
+        rows = request.data.get('patients')
+        if not rows or not isinstance(rows, list):
+            return Response({'error': 'patients must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.PATIENT_BULK_MAX_SIZE:
+            return Response({'error': f'At most {settings.PATIENT_BULK_MAX_SIZE} patients per request.'}, status=status.HTTP_400_BAD_REQUEST)
+        score = bool(request.data.get('score'))
+        serializer = PatientBulkSerializer(data=rows, many=True)
+        serializer.is_valid(raise_exception=True)
+        errors = serializer.row_errors
+        ids = Counter(data['id'] for _, data in serializer.validated_data if data.get('id'))
+        existing = Patient.objects.in_bulk(list(ids))
+
+        accepted = []
+        for index, data in serializer.validated_data:
+            patient_id = data.pop('id', None)
+            extra = {field: data.pop(field, None) for field in ('features', 'region', 'screening_type')}
+            if patient_id and ids[patient_id] > 1:
+                # Which of the rows was meant to win is anyone's guess; apply none of them
+                errors.append({'index': index, 'errors': {'id': ['Duplicate id in this batch.']}})
+            elif patient_id and patient_id not in existing:
+                errors.append({'index': index, 'errors': {'id': ['Patient not found.']}})
+            else:
+                accepted.append((index, patient_id, data, extra if score else {**extra, 'features': None}))
+
+        risk_scores = {}
+        scored = [(index, extra['features']) for index, _, _, extra in accepted if extra['features'] is not None]
+        if scored:
+            loaded = model_registry.get()
+            if loaded is None:
+                return Response({'error': 'Risk model is not available.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            try:
+                predictions = predict_risk_scores(loaded, [features for _, features in scored])
+            except InferenceUnavailable as e:
+                return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            risk_scores = {index: float(risk_score) for (index, _), risk_score in zip(scored, predictions)}
+
+        creates, updates, histories = [], {}, []
+        update_fields = {'appointment_at'}
+        results = []
+        for index, patient_id, data, extra in accepted:
+            patient = existing[patient_id] if patient_id else Patient()
+            for field, value in data.items():
+                setattr(patient, field, value)
+            # bulk writes skip the pre_save signal that derives this
+            patient.appointment_at = parse_appointment(patient.appointment)
+            if index in risk_scores:
+                patient.risk_score = risk_scores[index]
+                patient.risk_level, recommended_action = risk_band(patient.risk_score)
+                histories.append((patient, RiskAssessmentHistory(
+                    **dict(zip(FEATURE_COLUMNS, extra['features'])),
+                    region=extra['region'],
+                    screening_type=extra['screening_type'],
+                    risk_score=patient.risk_score,
+                    recommended_action=recommended_action,
+                )))
+            if patient_id:
+                updates[patient_id] = patient
+                update_fields.update(data)
+                if index in risk_scores:
+                    update_fields.update(('risk_score', 'risk_level'))
+            else:
+                creates.append(patient)
+            results.append((index, patient, 'updated' if patient_id else 'created'))
+
+        with transaction.atomic():
+            Patient.objects.bulk_create(creates, batch_size=settings.IMPORT_CHUNK_SIZE)
+            Patient.objects.bulk_update(updates.values(), sorted(update_fields), batch_size=settings.IMPORT_CHUNK_SIZE)
+            for patient, history in histories:
+                history.patient = patient
+            RiskAssessmentHistory.objects.bulk_create([history for _, history in histories], batch_size=settings.IMPORT_CHUNK_SIZE)
+            # None of the bulk writes send the signals that maintain counters and versions
+            forget_counters(Patient)
+            bump_versions(Patient)
+            if histories:
+                adjust_counters({
+                    'high_risk_assessments': sum(1 for _, history in histories if history.risk_score > HIGH_RISK_THRESHOLD),
+                })
+                bump_versions(RiskAssessmentHistory)
+        return Response({
+            'created': len(creates),
+            'updated': len(updates),
+            'scored': len(histories),
+            'results': [
+                {'index': index, 'id': patient.pk, 'status': outcome, 'risk_score': patient.risk_score}
+                for index, patient, outcome in results
+            ],
+            'errors': sorted(errors, key=lambda error: error['index']),
+        }, status=status.HTTP_201_CREATED if creates else status.HTTP_200_OK)
+
+@method_decorator(conditional_get('patient'), name='dispatch')
 class PatientRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
@@ -66,92 +277,197 @@ class PatientRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
         self.calculate_and_save_risk_score(instance)
 
     def calculate_and_save_risk_score(self, patient):
-        global model
-        if model is None:
+        loaded = model_registry.get()
+        if loaded is None:
+            return
+        # Patients carry no risk factors themselves; score on their latest assessment
+        features = latest_patient_features([patient.id]).get(patient.id)
+        if features is None:
             return
-        features = self.get_patient_features(patient)
         try:
-            risk_score = float(model.predict_proba(np.array(features).reshape(1, -1))[0][1])
+            risk_score = float(predict_risk_scores(loaded, [features])[0])
             patient.risk_score = risk_score
             patient.save(update_fields=["risk_score"])
-        except Exception as e:
-            print(f"Risk score calculation error: {e}")
-
-    def get_patient_features(self, patient):
-        return [
-            patient.age or 0,
-            patient.sexual_partners or 0,
-            patient.first_sexual_age or 0,
-            (patient.age or 0) - (patient.first_sexual_age or 0),
-            int(patient.hpv_positive) if patient.hpv_positive is not None else 0,
-            int(patient.abnormal_pap) if patient.abnormal_pap is not None else 0,
-            int(patient.smoking) if patient.smoking is not None else 0,
-            int(patient.stds_history) if patient.stds_history is not None else 0,
-            int(patient.insurance) if patient.insurance is not None else 0,
-        ]
+        except Exception:
+            logger.exception("Risk score calculation failed for patient %s", patient.pk)
 
+def parse_pk(value):
+    """A primary key from a JSON value (an integer or a numeric string), or None."""
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        return None
+    try:
+        pk = int(value)
+    except (TypeError, ValueError):
+        return None
+    return pk if pk > 0 else None
+
+def percent_change(current, previous):
+    if previous is None:
+        return None
+    if not previous:
+        return '+0%' if not current else '+100%'
+    return f"{round((current - previous) / previous * 100):+d}%"
+
+def change_type(change):
+    return 'negative' if change and change.startswith('-') else 'positive'
+
+def efficiency(values):
+    items = values.get('inventory_items')
+    if items is None:
+        return None
+    return int((values['inventory_exhausted'] / items) * 100) if items else 0
+
+def dashboard_stats():
+    """The four dashboard cards, from the counters and last week's snapshot."""
+    today = timezone.localdate()
+    week_ago = today - timedelta(days=7)
+    ensure_daily_snapshot()
+    values = counter_values(SNAPSHOT_COUNTERS + (appointments_counter(today), appointments_counter(week_ago)))
+    previous = snapshot_values(week_ago)
+    # Appointments are per-day counters already, so last week's figure needs no snapshot
+    appointments_change = percent_change(values[appointments_counter(today)], values[appointments_counter(week_ago)])
+    current_efficiency = efficiency(values)
+    previous_efficiency = efficiency(previous)
+    efficiency_change = None
+    if previous_efficiency is not None:
+        # Percentage points, since the value is itself a percentage
+        efficiency_change = f"{current_efficiency - previous_efficiency:+d}%"
+    patients_change = percent_change(values['patients'], previous.get('patients'))
+    high_risk_change = percent_change(values['high_risk_assessments'], previous.get('high_risk_assessments'))
+    stats = [
+        {
+            "title": "Total Patients",
+            "value": values['patients'],
+            "change": patients_change,
+            "changeType": change_type(patients_change),
+            "icon": "Users",
+            "color": "blue",
+            "description": "Active in system"
+        },
+        {
+            "title": "High Risk Cases",
+            "value": values['high_risk_assessments'],
+            "change": high_risk_change,
+            "changeType": change_type(high_risk_change),
+            "icon": "AlertTriangle",
+            "color": "red",
+            "description": "Requiring immediate attention"
+        },
+        {
+            "title": "Appointments Today",
+            "value": values[appointments_counter(today)],
+            "change": appointments_change,
+            "changeType": change_type(appointments_change),
+            "icon": "Calendar",
+            "color": "green",
+            "description": "Scheduled consultations"
+        },
+        {
+            "title": "Resource Efficiency",
+            "value": f"{current_efficiency}%",
+            "change": efficiency_change,
+            "changeType": change_type(efficiency_change),
+            "icon": "TrendingUp",
+            "color": "purple",
+            "description": "Overall utilization"
+        }
+    ]
+    return stats
+
+@method_decorator(conditional_get('patient', 'riskassessmenthistory', 'inventory', daily=True), name='dispatch')
 class DashboardStatsView(APIView):
+    """
+    Reads the incrementally maintained counters (api.counters) instead of
+    counting tables, and compares them with the snapshot from a week ago.
+    """
     def get(self, request):
-        total_patients = Patient.objects.count()
-        # High risk cases: count risk assessments with risk_score > 0.7
-        high_risk_cases = RiskAssessmentHistory.objects.filter(risk_score__gt=0.7).count()
-        # Appointments Today: count patients whose appointment is today
-        today = timezone.now().date()
-        appointments_today = Patient.objects.filter(
-            appointment__startswith=today.strftime('%Y-%m-%d')
-        ).count()
-        # Resource Efficiency: percent of inventory used (simple example)
-        total_inventory = Inventory.objects.count()
-        used_inventory = Inventory.objects.filter(available_stock=0).count()
-        resource_efficiency = f"{int((used_inventory/total_inventory)*100) if total_inventory else 0}%"
-        stats = [
-            {
-                "title": "Total Patients",
-                "value": total_patients,
-                "change": "+0%",  # Placeholder
-                "changeType": "positive",
-                "icon": "Users",
-                "color": "blue",
-                "description": "Active in system"
-            },
-            {
-                "title": "High Risk Cases",
-                "value": high_risk_cases,
-                "change": "+0%",  # Placeholder
-                "changeType": "positive",
-                "icon": "AlertTriangle",
-                "color": "red",
-                "description": "Requiring immediate attention"
-            },
-            {
-                "title": "Appointments Today",
-                "value": appointments_today,
-                "change": "+0%",
-                "changeType": "positive",
-                "icon": "Calendar",
-                "color": "green",
-                "description": "Scheduled consultations"
-            },
-            {
-                "title": "Resource Efficiency",
-                "value": resource_efficiency,
-                "change": "+0%",
-                "changeType": "positive",
-                "icon": "TrendingUp",
-                "color": "purple",
-                "description": "Overall utilization"
-            }
-        ]
-        return Response(stats)
+        return Response(dashboard_stats())
 
+@method_decorator(conditional_get('patient', 'riskassessmenthistory', 'inventory', daily=True), name='dispatch')
+class DashboardView(APIView):
+    """
+    Everything the dashboard page renders, in one response: the stat cards,
+    the risk bands, stock levels (no usage trend) and the most recent
+    patients. Cached per version stamp, so a write
+    invalidates it at once and DASHBOARD_CACHE_TTL only bounds its lifetime.
+    """
+    def get(self, request):
+        cache_key = f'dashboard:{request.resource_etag}'
+        bundle = cache.get(cache_key)
+        if bundle is None:
+            bundle = {
+                'stats': dashboard_stats(),
+                'risk_distribution': risk_band_counts(),
+                'resources': [inventory_utilization(inv) for inv in Inventory.objects.all()],
+                'recent_patients': PatientSummarySerializer(
+                    Patient.objects.only(*PatientSummarySerializer.Meta.fields)
+                    .order_by('-id')[:settings.DASHBOARD_RECENT_PATIENTS], many=True
+                ).data,
+            }
+            cache.set(cache_key, bundle, settings.DASHBOARD_CACHE_TTL)
+        return Response(bundle)
+
+def assessment_filters(params):
+    """region, screening_type, start and end (YYYY-MM-DD) query params; raises ValueError."""
+    filters = {'region': params.get('region'), 'screening_type': params.get('screening_type')}
+    for name in ('start', 'end'):
+        value = params.get(name)
+        filters[name] = parse_date(value) if value else None
+        if value and filters[name] is None:
+            raise ValueError(f"{name} must be a date (YYYY-MM-DD).")
+    return filters
+
+@method_decorator(conditional_get('riskassessmenthistory'), name='dispatch')
 class RiskDistributionView(APIView):
     def get(self, request):
-        # Count risk assessments in history by risk_score
-        high = RiskAssessmentHistory.objects.filter(risk_score__gt=0.7).count()
-        medium = RiskAssessmentHistory.objects.filter(risk_score__gt=0.4, risk_score__lte=0.7).count()
-        low = RiskAssessmentHistory.objects.filter(risk_score__lte=0.4).count()
-        data = {'high': high, 'medium': medium, 'low': low}
-        return Response(data)
+        try:
+            filters = assessment_filters(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(risk_band_counts(filter_assessments(RiskAssessmentHistory.objects.all(), **filters)))
+
+@method_decorator(conditional_get('riskassessmenthistory'), name='dispatch')
+class RiskHistogramView(APIView):
+    """
+    Risk score histogram over RiskAssessmentHistory. ?edges= takes comma-separated
+    bin edges (default: the low/medium/high bands); region, screening_type,
+    start and end narrow the assessments. Every bin comes from one query.
+    """
+    def get(self, request):
+        try:
+            edges = parse_edges(request.query_params['edges']) if 'edges' in request.query_params else RISK_BAND_EDGES
+            filters = assessment_filters(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        bins = risk_histogram(edges, filter_assessments(RiskAssessmentHistory.objects.all(), **filters))
+        return Response({
+            'edges': list(edges),
+            'bins': bins,
+            'total': sum(b['count'] for b in bins),
+        })
+
+@method_decorator(conditional_get('patient', daily=True), name='dispatch')
+class ScheduleView(APIView):
+    """
+    Patients with an appointment in [?start, ?end), soonest first. Bounds are
+    ISO dates or datetimes; a date as ?end includes that whole day. Defaults to
+    today. Served by a range scan on the appointment_at index.
+    """
+    def get(self, request):
+        default_start, default_end = day_window(timezone.localdate())
+        try:
+            start = parse_window_bound(request.query_params['start']) if 'start' in request.query_params else default_start
+            end = parse_window_bound(request.query_params['end'], end=True) if 'end' in request.query_params else default_end
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if end <= start:
+            return Response({'error': 'end must be after start.'}, status=status.HTTP_400_BAD_REQUEST)
+        patients = Patient.objects.filter(appointment_at__gte=start, appointment_at__lt=end).order_by('appointment_at', 'id')
+        return Response({
+            'start': start,
+            'end': end,
+            'appointments': PatientSerializer(patients, many=True).data,
+        })
 
 class ResourceUtilizationView(APIView):
     def get(self, request):
@@ -164,40 +480,59 @@ class ResourceUtilizationView(APIView):
         ]
         return Response(resources)
 
+def inventory_utilization(inv):
+    total = inv.total_stock or inv.available_stock or 1
+    used = total - inv.available_stock
+    percent_used = (used / total) * 100 if total else 0
+    stock_status = 'adequate'
+    if percent_used > 80:
+        stock_status = 'critical'
+    elif percent_used > 50:
+        stock_status = 'low'
+    return {
+        'id': inv.id,
+        'name': inv.name,
+        'category': inv.category,
+        'region': inv.region,
+        'available': inv.available_stock,
+        'total': total,
+        'status': stock_status,
+        'percent_used': percent_used,
+        'cost': float(inv.cost) if inv.cost else None,
+        'unit': inv.unit,
+    }
+
+@method_decorator(conditional_get('inventory', 'inventoryusage', daily=True), name='dispatch')
 class ResourceUtilizationAnalyticsView(APIView):
+    """
+    Stock levels plus a daily usage trend per inventory item. The trend comes
+    from the InventoryUsageDaily rollup in one query for all items, so the
+    endpoint costs two queries however many items or days are requested.
+    """
     def get(self, request):
+        try:
+            days = int(request.query_params.get('days', settings.UTILIZATION_DEFAULT_DAYS))
+        except ValueError:
+            return Response({'error': 'days must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= settings.UTILIZATION_MAX_DAYS:
+            return Response(
+                {'error': f'days must be between 1 and {settings.UTILIZATION_MAX_DAYS}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        today = timezone.localdate()
+        start = today - timedelta(days=days - 1)
+        window = [start + timedelta(days=i) for i in range(days)]
+
+        usage = {}
+        rollup = InventoryUsageDaily.objects.filter(date__gte=start, date__lte=today)
+        for inventory_id, day, used in rollup.values_list('inventory_id', 'date', 'used'):
+            usage[inventory_id, day] = used
+
         resources = []
-        days = 7  # trend window
-        today = timezone.now().date()
         for inv in Inventory.objects.all():
-            total = inv.total_stock or inv.available_stock or 1
-            used = total - inv.available_stock
-            percent_used = (used / total) * 100 if total else 0
-            status = 'adequate'
-            if percent_used > 80:
-                status = 'critical'
-            elif percent_used > 50:
-                status = 'low'
-            # Build daily usage trend for the last N days
-            trend = []
-            for i in range(days):
-                day = today - timedelta(days=days - i - 1)
-                day_usages = inv.usages.filter(timestamp__date=day)
-                used_today = sum([u.used for u in day_usages if u.used > 0])
-                trend.append({'date': str(day), 'used': used_today})
-            resources.append({
-                'id': inv.id,
-                'name': inv.name,
-                'category': inv.category,
-                'region': inv.region,
-                'available': inv.available_stock,
-                'total': total,
-                'status': status,
-                'percent_used': percent_used,
-                'cost': float(inv.cost) if inv.cost else None,
-                'unit': inv.unit,
-                'trend': trend,
-            })
+            resource = inventory_utilization(inv)
+            resource['trend'] = [{'date': str(day), 'used': usage.get((inv.id, day), 0)} for day in window]
+            resources.append(resource)
         return Response(resources)
 
 class UserRegistrationView(APIView):
@@ -213,64 +548,132 @@ class UserRegistrationView(APIView):
             })
         return Response(serializer.errors, status=400)
 
+# Rooms and their patient in one query, loading only what RoomSerializer renders
+ROOM_QUERYSET = Room.objects.select_related('patient').only(
+    'name', 'status', 'type', 'patient', *(f'patient__{field}' for field in RoomPatientSerializer.Meta.fields)
+)
+
+@method_decorator(conditional_get('room', 'patient'), name='dispatch')
 class RoomListCreateView(ListCreateAPIView):
-    queryset = Room.objects.all()
+    queryset = ROOM_QUERYSET
     serializer_class = RoomSerializer
 
+@method_decorator(conditional_get('room', 'patient'), name='dispatch')
 class RoomRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
-    queryset = Room.objects.all()
+    queryset = ROOM_QUERYSET
     serializer_class = RoomSerializer
 
+@method_decorator(conditional_get('inventory'), name='dispatch')
 class InventoryListCreateView(ListCreateAPIView):
     queryset = Inventory.objects.all()
     serializer_class = InventorySerializer
 
+@method_decorator(conditional_get('inventory'), name='dispatch')
 class InventoryRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
     queryset = Inventory.objects.all()
     serializer_class = InventorySerializer
 
+@method_decorator(conditional_get('cost'), name='dispatch')
 class CostListCreateView(ListCreateAPIView):
     queryset = Cost.objects.all()
     serializer_class = CostSerializer
 
+@method_decorator(conditional_get('cost'), name='dispatch')
 class CostRetrieveUpdateDestroyView(RetrieveUpdateDestroyAPIView):
     queryset = Cost.objects.all()
     serializer_class = CostSerializer
 
-class RiskAssessmentHistoryListCreateView(ListCreateAPIView):
-    queryset = RiskAssessmentHistory.objects.all().order_by('-timestamp')
+# patient_name comes from the joined patient row instead of one query per assessment
+HISTORY_QUERYSET = RiskAssessmentHistory.objects.select_related('patient').only(
+    *(field.name for field in RiskAssessmentHistory._meta.concrete_fields), 'patient__name'
+)
+
+@method_decorator(conditional_get('riskassessmenthistory', 'patient'), name='dispatch')
+class RiskAssessmentHistoryListCreateView(KeysetOrderingMixin, ListCreateAPIView):
+    """
+    Filters: patient, risk_level (the score band), min_risk_score,
+    max_risk_score, region, screening_type, start and end (dates). Ordering:
+    ?ordering= timestamp or risk_score, newest first by default. Paginated
+    like the patient list.
+    """
+    queryset = HISTORY_QUERYSET
     serializer_class = RiskAssessmentHistorySerializer
+    pagination_class = KeysetPagination
+    ordering_fields = ('id', 'timestamp', 'risk_score')
+    default_ordering = '-timestamp'
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        patient_id = self.request.query_params.get('patient')
+        params = self.request.query_params
+        patient_id = params.get('patient')
         if patient_id:
             queryset = queryset.filter(patient_id=patient_id)
-        return queryset
-
+        try:
+            queryset = filter_assessments(queryset, **assessment_filters(params))
+            queryset = queryset.filter(**score_range(params))
+            if params.get('risk_level'):
+                queryset = queryset.filter(risk_level_filter(params['risk_level']))
+        except ValueError as e:
+            raise ValidationError({'error': str(e)})
+        return self.order_queryset(queryset)
+
+@method_decorator(conditional_get('riskassessmenthistory', 'patient'), name='dispatch')
 class RiskAssessmentHistoryRetrieveView(RetrieveUpdateDestroyAPIView):
-    queryset = RiskAssessmentHistory.objects.all()
+    queryset = HISTORY_QUERYSET
     serializer_class = RiskAssessmentHistorySerializer
 
+class RiskAssessmentHistoryExportView(APIView):
+    """
+    The risk assessment history as CSV or NDJSON (export.csv / export.ndjson),
+    streamed in id order. Filters: patient, region, screening_type, start and
+    end (dates).
+    """
+    def get(self, request, file_format):
+        if file_format not in EXPORT_STREAMS:
+            return Response({'error': f"Export format must be one of {', '.join(EXPORT_STREAMS)}."}, status=status.HTTP_404_NOT_FOUND)
+        params = request.query_params
+        queryset = RiskAssessmentHistory.objects.order_by('id')
+        if params.get('patient'):
+            queryset = queryset.filter(patient_id=params['patient'])
+        try:
+            queryset = filter_assessments(queryset, **assessment_filters(params))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(EXPORT_STREAMS[file_format](queryset), content_type=EXPORT_CONTENT_TYPES[file_format])
+        filename = f'risk-assessment-history-{timezone.localdate()}.{file_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 @api_view(['POST'])
 def fill_inventory(request):
+    """
+    Load the inventory sheet. By default (?mode=sync) only the difference is
+    applied and its size reported; ?mode=replace deletes every item (and its
+    usage history) and reloads the sheet.
+    """
+    mode = request.query_params.get('mode', 'sync')
+    if mode not in ('sync', 'replace'):
+        return Response({'error': 'mode must be sync or replace.'}, status=status.HTTP_400_BAD_REQUEST)
     # Path to the Excel file
-    excel_path = os.path.join(settings.BASE_DIR, '../src/Code Her Care Datasets /Resources Inventory Cost Sheet.xlsx')
-    df = pd.read_excel(excel_path)
-    # Clear existing inventory
-    Inventory.objects.all().delete()
-    # Create new inventory items
-    items = []
-    for _, row in df.iterrows():
-        items.append(Inventory(
-            name=row.get('name') or row.get('Name'),
-            category=row.get('category') or row.get('Category'),
-            region=row.get('region') or row.get('Region'),
-            available_stock=row.get('available_stock') or row.get('Available Stock'),
-            unit=row.get('unit') or row.get('Unit')
-        ))
-    Inventory.objects.bulk_create(items)
-    return Response({'status': 'success', 'count': len(items)})
+    excel_path = settings.DATASETS_DIR / 'Resources Inventory Cost Sheet.xlsx'
+    df = read_dataset(excel_path)
+    if mode == 'sync':
+        try:
+            return Response({'status': 'success', 'mode': mode, **sync_inventory(df)})
+        except SheetError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    items = [Inventory(**row) for row in normalize_inventory_sheet(df).to_dict('records')]
+    with transaction.atomic():
+        # Clear existing inventory
+        Inventory.objects.all().delete()
+        Inventory.objects.bulk_create(items)
+        # bulk_create skips the signals that keep the dashboard counters current
+        adjust_counters({
+            'inventory_items': len(items),
+            'inventory_exhausted': sum(1 for item in items if item.available_stock == 0),
+        })
+        bump_versions(Inventory)
+    return Response({'status': 'success', 'mode': mode, 'count': len(items)})
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -283,127 +686,218 @@ def risk_assessment(request):
         "screening_type": str (optional)
     }
     """
-    global model
     patient_id = request.data.get('patient_id')
     features = request.data.get('features')
     region = request.data.get('region')
     screening_type = request.data.get('screening_type')
     if not patient_id or features is None:
         return Response({'error': 'patient_id and features are required.'}, status=400)
+    if parse_pk(patient_id) is None:
+        return Response({'error': 'patient_id must be an integer.'}, status=400)
+    if feature_row_error(features):
+        return Response({'error': feature_row_error(features)}, status=400)
     try:
-        patient = Patient.objects.get(id=patient_id)
+        patient = Patient.objects.get(id=parse_pk(patient_id))
     except Patient.DoesNotExist:
         return Response({'error': 'Patient not found.'}, status=404)
+    loaded = model_registry.get()
+    if loaded is None:
+        return Response({'error': 'Risk model is not available.'}, status=503)
     try:
-        risk_score = float(model.predict_proba(np.array(features).reshape(1, -1))[0][1])
-        # Example logic for recommended action (customize as needed)
-        if risk_score > 0.7:
-            recommended_action = "Immediate follow-up and HPV DNA test"
-            risk_level = 'high'
-        elif risk_score > 0.4:
-            recommended_action = "Pap smear and close monitoring"
-            risk_level = 'medium'
+        risk_score = float(predict_risk_scores(loaded, [features])[0])
+        risk_level, recommended_action = risk_band(risk_score)
+        patient.risk_score = risk_score
+        patient.risk_level = risk_level
+        # The patient's new score and its assessment history are written together or not at all
+        with transaction.atomic():
+            patient.save(update_fields=["risk_score", "risk_level"])
+            history = RiskAssessmentHistory.objects.create(
+                patient=patient,
+                **dict(zip(FEATURE_COLUMNS, features)),
+                region=region,
+                screening_type=screening_type,
+                risk_score=risk_score,
+                recommended_action=recommended_action
+            )
+        return Response(RiskAssessmentHistorySerializer(history).data)
+    except InferenceUnavailable as e:
+        return Response({'error': str(e)}, status=503)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def risk_assessment_batch(request):
+    """
+    Expects JSON: {
+        "assessments": [
+            {
+                "patient_id": int,
+                "features": [list of risk factor values in model order] (optional),
+                "region": str (optional),
+                "screening_type": str (optional)
+            },
+            ...
+        ]
+    }
+    Items without features are rescored on the patient's latest assessment.
+    Every item is scored in one predict_proba call and the history rows are
+    written with a single bulk_create.
+    """
+    assessments = request.data.get('assessments')
+    if not assessments or not isinstance(assessments, list):
+        return Response({'error': 'assessments must be a non-empty list.'}, status=400)
+    if len(assessments) > settings.RISK_BATCH_MAX_SIZE:
+        return Response({'error': f'At most {settings.RISK_BATCH_MAX_SIZE} assessments per batch.'}, status=400)
+    patient_ids = [parse_pk(item.get('patient_id')) if isinstance(item, dict) else None for item in assessments]
+    patients = Patient.objects.in_bulk([pid for pid in patient_ids if pid])
+    stored_features = latest_patient_features([
+        pid for pid, item in zip(patient_ids, assessments) if pid and item.get('features') is None
+    ])
+    rows, errors = [], []
+    for i, (item, patient_id) in enumerate(zip(assessments, patient_ids)):
+        if not isinstance(item, dict):
+            errors.append({'index': i, 'error': 'Each assessment must be an object.'})
+            continue
+        features = item.get('features')
+        if not item.get('patient_id'):
+            errors.append({'index': i, 'error': 'patient_id is required.'})
+        elif patient_id is None:
+            errors.append({'index': i, 'error': 'patient_id must be an integer.'})
+        elif patient_id not in patients:
+            errors.append({'index': i, 'error': 'Patient not found.'})
+        elif features is None and patient_id not in stored_features:
+            errors.append({'index': i, 'error': 'features are required for patients without a previous assessment.'})
+        elif features is not None and feature_row_error(features):
+            errors.append({'index': i, 'error': feature_row_error(features)})
         else:
-            recommended_action = "Routine screening"
-            risk_level = 'low'
+            rows.append(features if features is not None else stored_features[patient_id])
+    if errors:
+        return Response({'errors': errors}, status=400)
+    loaded = model_registry.get()
+    if loaded is None:
+        return Response({'error': 'Risk model is not available.'}, status=503)
+    try:
+        risk_scores = predict_risk_scores(loaded, rows)
+    except InferenceUnavailable as e:
+        return Response({'error': str(e)}, status=503)
+    except Exception as e:
+        return Response({'error': str(e)}, status=500)
+    histories = []
+    updated_patients = {}
+    for item, patient_id, features, risk_score in zip(assessments, patient_ids, rows, risk_scores):
+        risk_score = float(risk_score)
+        risk_level, recommended_action = risk_band(risk_score)
+        patient = patients[patient_id]
         patient.risk_score = risk_score
         patient.risk_level = risk_level
-        patient.save(update_fields=["risk_score", "risk_level"])
-        # Save assessment history
-        history = RiskAssessmentHistory.objects.create(
+        updated_patients[patient.id] = patient
+        histories.append(RiskAssessmentHistory(
             patient=patient,
-            age=features[0],
-            sexual_partners=features[1],
-            first_sexual_age=features[2],
-            years_sexually_active=features[3],
-            hpv_positive=features[4],
-            abnormal_pap=features[5],
-            smoking=features[6],
-            stds_history=features[7],
-            insurance=features[8],
-            total_risk_score=features[9],
-            region=region,
-            screening_type=screening_type,
+            **dict(zip(FEATURE_COLUMNS, features)),
+            region=item.get('region'),
+            screening_type=item.get('screening_type'),
             risk_score=risk_score,
             recommended_action=recommended_action
-        )
-        return Response(RiskAssessmentHistorySerializer(history).data)
-    except Exception as e:
-        return Response({'error': str(e)}, status=500)
+        ))
+    with transaction.atomic():
+        Patient.objects.bulk_update(updated_patients.values(), ["risk_score", "risk_level"])
+        RiskAssessmentHistory.objects.bulk_create(histories)
+        adjust_counters({
+            'high_risk_assessments': sum(1 for history in histories if history.risk_score > HIGH_RISK_THRESHOLD),
+        })
+        bump_versions(Patient, RiskAssessmentHistory)
+    return Response(RiskAssessmentHistorySerializer(histories, many=True).data)
 
 @api_view(['POST'])
 def import_resources(request):
     # Path to your Excel file
-    excel_path = '/home/josh/Documents/project/src/Code Her Care Datasets /Resources Inventory Cost Sheet.xlsx'
+    excel_path = settings.DATASETS_DIR / 'Resources Inventory Cost Sheet.xlsx'
     if not os.path.exists(excel_path):
         return Response({'error': 'File not found'}, status=404)
-    df = pd.read_excel(excel_path)
-    from .models import Inventory
-    created, updated = 0, 0
-    for _, row in df.iterrows():
-        name = row.get('Item')
-        if not name or str(name).strip() == '':
-            continue  # Skip rows with no item name
-        inv, was_created = Inventory.objects.update_or_create(
-            name=name,
-            defaults={
-                'category': row.get('Category', ''),
-                'region': row.get('Region', ''),
-                'available_stock': row.get('Available Stock', 0),
-                'total_stock': row.get('Available Stock', 0),
-                'unit': '',
-                'status': '',
-                'cost': row.get('Cost (KES)', 0),
-            }
-        )
-        if was_created:
-            created += 1
-        else:
-            updated += 1
-    return Response({'created': created, 'updated': updated, 'message': 'Import complete.'})
+    df = read_dataset(excel_path)
+    result = import_inventory_sheet(df)
+    return Response({**result, 'skipped': len(df) - result['rows'], 'message': 'Import complete.'})
 
 @api_view(['POST'])
 def import_costs(request):
-    excel_path = '/home/josh/Documents/project/src/Code Her Care Datasets /Treatment Costs Sheet.xlsx'
+    excel_path = settings.DATASETS_DIR / 'Treatment Costs Sheet.xlsx'
     if not os.path.exists(excel_path):
         return Response({'error': 'File not found'}, status=404)
-    df = pd.read_excel(excel_path)
-    from .models import Cost
-    created, updated = 0, 0
-    for _, row in df.iterrows():
-        treatment = row.get('Service') or row.get('Treatment')
-        if not treatment or str(treatment).strip() == '':
-            continue
-        obj, was_created = Cost.objects.update_or_create(
-            treatment=treatment,
-            defaults={
-                'cost': row.get('Base Cost (KES)', 0),
-                'facility': row.get('Facility', ''),
-                'region': row.get('Region', ''),
-                'category': row.get('Category', ''),
-                'nhif_covered': row.get('NHIF Covered', ''),
-                'insurance_copay': row.get('Insurance Copay (KES)', 0),
-                'out_of_pocket': row.get('Out-of-Pocket (KES)', 0),
-                'notes': '',
-            }
-        )
-        if was_created:
-            created += 1
-        else:
-            updated += 1
-    return Response({'created': created, 'updated': updated, 'message': 'Import complete.'})
+    df = read_dataset(excel_path)
+    result = import_cost_sheet(df)
+    return Response({**result, 'skipped': len(df) - result['rows'], 'message': 'Import complete.'})
+
+IMPORT_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+class ImportJobListCreateView(APIView):
+    """
+    POST a multipart `file` (.xlsx, .xls or .csv) and `kind` (inventory or
+    costs) to queue an import; the response is 202 with the job, whose
+    progress can then be polled at /api/imports/<id>/. GET lists recent jobs.
+    """
+    def get(self, request):
+        fail_stalled_jobs()
+        jobs = ImportJob.objects.order_by('-created_at')[:50]
+        return Response(ImportJobSerializer(jobs, many=True).data)
 
+    def post(self, request):
+        upload = request.FILES.get('file')
+        kind = request.data.get('kind')
+        if upload is None:
+            return Response({'error': 'No file provided.'}, status=status.HTTP_400_BAD_REQUEST)
+        if kind not in IMPORTERS:
+            return Response({'error': f"kind must be one of {', '.join(IMPORTERS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if not upload.name.lower().endswith(IMPORT_EXTENSIONS):
+            return Response({'error': f"File must be one of {', '.join(IMPORT_EXTENSIONS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.size > settings.IMPORT_MAX_UPLOAD_BYTES:
+            return Response({'error': 'File is too large.'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        with transaction.atomic():
+            job = ImportJob.objects.create(kind=kind, file=upload, original_name=upload.name)
+            enqueue(job)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+class ImportJobRetrieveView(APIView):
+    def get(self, request, pk):
+        fail_stalled_jobs()
+        try:
+            job = ImportJob.objects.get(pk=pk)
+        except ImportJob.DoesNotExist:
+            return Response({'error': 'Import job not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ImportJobSerializer(job).data)
+
+COST_TREND_GROUPS = ('region', 'category', 'facility')
+
+@method_decorator(conditional_get('cost', daily=True), name='dispatch')
 class CostTrendsView(APIView):
+    """
+    Cost totals over the last ?days= days (default 30), bucketed by
+    ?granularity= day, week or month and optionally split by ?group_by=
+    region, category or facility. One grouped query for the whole window.
+    """
     def get(self, request):
-        days = int(request.query_params.get('days', 30))
-        today = timezone.now().date()
-        trend = []
-        for i in range(days):
-            day = today - timedelta(days=days - i - 1)
-            day_costs = Cost.objects.filter(created_at__date=day)
-            total = day_costs.aggregate(total=Sum('cost'))['total'] or 0
-            trend.append({'date': str(day), 'total': float(total)})
-        return Response(trend)
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response({'error': 'days must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= settings.COST_TRENDS_MAX_DAYS:
+            return Response(
+                {'error': f'days must be between 1 and {settings.COST_TRENDS_MAX_DAYS}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return Response(
+                {'error': f"granularity must be one of {', '.join(GRANULARITIES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        group_by = request.query_params.get('group_by') or None
+        if group_by is not None and group_by not in COST_TREND_GROUPS:
+            return Response(
+                {'error': f"group_by must be one of {', '.join(COST_TREND_GROUPS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(time_series(Cost.objects.all(), 'created_at', 'cost', days, granularity, group_by))
 
 @api_view(['POST'])
 def chatbot(request):
@@ -417,10 +911,8 @@ def chatbot(request):
 
     # Risk level distribution
     if "risk level" in message or "risk distribution" in message:
-        high = RiskAssessmentHistory.objects.filter(risk_score__gt=0.7).count()
-        medium = RiskAssessmentHistory.objects.filter(risk_score__gt=0.4, risk_score__lte=0.7).count()
-        low = RiskAssessmentHistory.objects.filter(risk_score__lte=0.4).count()
-        return Response({'response': f'Risk distribution: {high} high, {medium} medium, {low} low risk patients.'})
+        bands = risk_band_counts()
+        return Response({'response': f"Risk distribution: {bands['high']} high, {bands['medium']} medium, {bands['low']} low risk patients."})
 
     # Available rooms
     if "rooms available" in message or "available rooms" in message or "free rooms" in message:
@@ -444,10 +936,11 @@ def chatbot(request):
 
     # Today's schedule
     if 'today' in message and ('schedule' in message or 'appointment' in message):
-        patients = Patient.objects.filter(appointment__startswith=today.strftime('%Y-%m-%d'))
+        start, end = day_window(timezone.localdate())
+        patients = Patient.objects.filter(appointment_at__gte=start, appointment_at__lt=end).order_by('appointment_at')
         if not patients:
             return Response({'response': 'There are no appointments scheduled for today.'})
-        lines = [f"• {p.name} ({p.condition}) at {p.appointment}" for p in patients]
+        lines = [f"• {p.name} ({p.condition}) at {timezone.localtime(p.appointment_at):%H:%M}" for p in patients]
         return Response({'response': f"Today's appointments:\n" + '\n'.join(lines)})
 
     # Resource utilization
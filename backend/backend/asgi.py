@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Start the inference worker processes before the first request arrives
+from api.inference import inference_executor  # noqa: E402
+
+if inference_executor is not None:
+    inference_executor.warm()
@@ -126,3 +126,77 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Risk model inference
+# A joblib pickle, or a compact .mrf export (`manage.py export_model`) that loads with NumPy only
+RISK_MODEL_PATH = BASE_DIR.parent / 'src' / 'Code Her Care Datasets ' / 'random_forest_model.pkl'
+# Seconds between checks of the model file for a retrained version (hot reload)
+RISK_MODEL_CHECK_INTERVAL = 5
+# Where the compiled engine keeps its flattened arrays, memory-mapped by every worker
+RISK_MODEL_CACHE_DIR = BASE_DIR / '.model_cache'
+# LRU cache of predictions keyed on (model version, feature vector); size 0 disables it
+RISK_PREDICTION_CACHE_SIZE = 4096
+RISK_PREDICTION_CACHE_TTL = 300
+# Coalesce concurrent single-row requests into one model call, waiting at most
+# MAX_WAIT_MS for up to MAX_BATCH_SIZE rows. Up to MAX_CONCURRENT_BATCHES batches
+# are scored at once, and callers give up after RISK_EXECUTOR_TIMEOUT seconds
+RISK_COALESCE_ENABLED = False
+RISK_COALESCE_MAX_WAIT_MS = 5
+RISK_COALESCE_MAX_BATCH_SIZE = 64
+RISK_COALESCE_MAX_CONCURRENT_BATCHES = 4
+# Score in a pool of worker processes instead of on the request thread. Calls
+# beyond MAX_PENDING in flight, or slower than TIMEOUT seconds, get a 503
+RISK_EXECUTOR_ENABLED = False
+RISK_EXECUTOR_WORKERS = 2
+RISK_EXECUTOR_TIMEOUT = 10
+RISK_EXECUTOR_MAX_PENDING = 64
+# Upper bound on rows accepted by the batch prediction and risk assessment endpoints
+RISK_BATCH_MAX_SIZE = 1000
+# 'sklearn' calls the estimator directly; 'compiled' flattens the forest into
+# NumPy arrays at load time (api.tree_engine), which is much faster for single-row
+# and small-batch scoring (see `manage.py benchmark_tree_engine`). Only the compiled
+# engine and .mrf exports share the model's pages between worker processes; with
+# 'sklearn' every worker unpickles its own copy
+RISK_INFERENCE_ENGINE = 'sklearn'
+
+# Resource utilization analytics
+# Trend window in days for /api/resource-utilization-analytics/ when ?days= is not given (7, 30 and 90 are typical)
+UTILIZATION_DEFAULT_DAYS = 7
+UTILIZATION_MAX_DAYS = 366
+
+# Cost trends: longest window /api/cost-trends/ will aggregate (?days=)
+COST_TRENDS_MAX_DAYS = 3660
+
+# Keyset pagination for the patient and risk history lists (opt-in via ?page_size= or ?cursor=)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Dashboard bundle (/api/dashboard/): seconds a computed bundle is kept, and how many recent patients it lists
+DASHBOARD_CACHE_TTL = 30
+DASHBOARD_RECENT_PATIENTS = 3
+
+# Spreadsheet imports: rows per bulk upsert statement
+IMPORT_CHUNK_SIZE = 500
+
+# Bundled spreadsheets read by the legacy import endpoints
+DATASETS_DIR = BASE_DIR.parent / 'src' / 'Code Her Care Datasets '
+# Uploaded files (import jobs keep their source file here)
+MEDIA_ROOT = BASE_DIR / 'media'
+# Uploaded imports (/api/imports/) run in `manage.py run_import_jobs`, a separate
+# worker process ('command'), or for development in a thread pool of
+# IMPORT_JOB_WORKERS inside the web process ('thread'; jobs there share the GIL
+# with requests, can't be stopped, and are lost if the server restarts before
+# they start). A job still running after IMPORT_JOB_TIMEOUT seconds is marked failed
+IMPORT_JOB_RUNNER = 'command'
+IMPORT_JOB_WORKERS = 2
+IMPORT_JOB_TIMEOUT = 15 * 60
+IMPORT_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+# Parsed source workbooks are cached here as memory-mapped .npy columns
+# (api.dataset_cache); None parses the workbook on every read
+DATASET_CACHE_DIR = BASE_DIR / '.dataset_cache'
+
+# Rows fetched per round trip by the streaming risk history export
+EXPORT_CHUNK_SIZE = 2000
+
+# Upper bound on rows accepted by /api/patients/bulk/
+PATIENT_BULK_MAX_SIZE = 5000
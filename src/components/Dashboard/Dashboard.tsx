@@ -21,23 +21,21 @@ export const Dashboard: React.FC<{ onTabChange?: (tab: string) => void }> = ({ o
   const [stats, setStats] = useState<any[]>([]);
   const [riskDistribution, setRiskDistribution] = useState<any>({ high: 0, medium: 0, low: 0 });
   const [resources, setResources] = useState<any[]>([]);
-  const [patients, setPatients] = useState<any[]>([]);
+  const [recentPatients, setRecentPatients] = useState<any[]>([]);
+  const [totalPatients, setTotalPatients] = useState(0);
   const [loading, setLoading] = useState(true);
   const { username } = useContext(AuthContext);
 
   useEffect(() => {
     setLoading(true);
-    Promise.all([
-      axios.get(`${API_BASE_URL}/dashboard-stats/`),
-      axios.get(`${API_BASE_URL}/risk-distribution/`),
-      axios.get(`${API_BASE_URL}/resource-utilization-analytics/`),
-      axios.get(`${API_BASE_URL}/patients/`),
-    ])
-      .then(([statsRes, riskRes, resourceRes, patientsRes]) => {
-        setStats(statsRes.data);
-        setRiskDistribution(riskRes.data);
-        setResources(resourceRes.data);
-        setPatients(patientsRes.data);
+    axios.get(`${API_BASE_URL}/dashboard/`)
+      .then(res => {
+        setStats(res.data.stats);
+        setRiskDistribution(res.data.risk_distribution);
+        setResources(res.data.resources);
+        setRecentPatients(res.data.recent_patients);
+        const total = res.data.stats.find((stat: any) => stat.title === 'Total Patients');
+        setTotalPatients(total ? total.value : 0);
       })
       .finally(() => setLoading(false));
   }, []);
@@ -57,14 +55,10 @@ export const Dashboard: React.FC<{ onTabChange?: (tab: string) => void }> = ({ o
   });
 
   // Risk distribution values
-  const totalPatients = patients.length;
   const highRiskPatients = riskDistribution.high || 0;
   const mediumRiskPatients = riskDistribution.medium || 0;
   const lowRiskPatients = riskDistribution.low || 0;
 
-  // Recent patients (last 3 by id or created order)
-  const recentPatients = [...patients].sort((a, b) => (b.id || 0) - (a.id || 0)).slice(0, 3);
-
   return (
     <div className="space-y-6">
       {/* Welcome Header */}
@@ -166,7 +160,7 @@ export const Dashboard: React.FC<{ onTabChange?: (tab: string) => void }> = ({ o
                 <div className="text-right">
                   <Badge variant={patient.riskLevel || patient.risk_level}>{patient.riskLevel || patient.risk_level}</Badge>
                   <p className="text-xs text-gray-500 mt-1">
-                    {patient.appointmentTime ? new Date(patient.appointmentTime).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }) : ''}
+                    {patient.appointment_at ? new Date(patient.appointment_at).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }) : ''}
                   </p>
                 </div>
               </div>